@@ -0,0 +1,206 @@
+# actions/decimation.py
+"""
+Server-side decimation of routes and time series before they are sent to the browser.
+
+Routes are simplified with Douglas-Peucker (or Visvalingam-Whyatt) at the size
+of a screen pixel for the zoom the map is shown at, so the drawn line looks the
+same. Chart series are downsampled with Largest-Triangle-Three-Buckets (LTTB),
+which keeps the peaks and dips a plain stride would skip.
+"""
+import heapq
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_M = 6378137.0
+TILE_SIZE_PX = 256
+# Web Mercator metres per pixel at zoom 0 on the equator
+METERS_PER_PIXEL_ZOOM_0 = 2 * np.pi * EARTH_RADIUS_M / TILE_SIZE_PX
+MAX_ZOOM = 18
+
+# Point budgets
+MAP_MAX_POINTS = 2000
+CHART_MAX_POINTS = 1500  # a little over one point per pixel of a full-width chart
+# Routes stay smooth this many zoom levels past the framing zoom
+ZOOM_HEADROOM = 2
+
+
+def _project(latitudes, longitudes):
+    """Local equirectangular projection in metres, accurate at route scale."""
+    latitudes = np.asarray(latitudes, dtype="float64")
+    longitudes = np.asarray(longitudes, dtype="float64")
+    ref_lat = np.radians(np.nanmean(latitudes))
+    x = np.radians(longitudes) * np.cos(ref_lat) * EARTH_RADIUS_M
+    y = np.radians(latitudes) * EARTH_RADIUS_M
+    return x, y
+
+
+def meters_per_pixel(zoom, latitude):
+    return METERS_PER_PIXEL_ZOOM_0 * np.cos(np.radians(latitude)) / 2 ** zoom
+
+
+def fit_zoom(latitudes, longitudes, width_px=800, height_px=600):
+    """Highest zoom at which the route's bounding box fits a map of the given size."""
+    x, y = _project(latitudes, longitudes)
+    extent = max((np.nanmax(x) - np.nanmin(x)) / width_px, (np.nanmax(y) - np.nanmin(y)) / height_px, 1e-3)
+    zoom = np.log2(meters_per_pixel(0, np.nanmean(latitudes)) / extent)
+    return int(np.clip(np.floor(zoom), 0, MAX_ZOOM))
+
+
+def douglas_peucker(x, y, tolerance, max_points=None):
+    """
+    Indices of the points kept by Douglas-Peucker at `tolerance` (same unit as
+    x and y), or None as soon as more than `max_points` would be kept.
+    """
+    n = len(x)
+    if n < 3:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    # Only segments still farther than the tolerance get split, so the loop runs once per kept point
+    stack = [(0, n - 1)]
+    kept = 2
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        length = np.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(px * dy - py * dx) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            kept += 1
+            if max_points is not None and kept > max_points:
+                return None
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+def visvalingam(x, y, max_points):
+    """Indices of the `max_points` points left after Visvalingam-Whyatt removes the smallest triangles."""
+    n = len(x)
+    if n <= max_points or n < 3:
+        return np.arange(n)
+    previous = np.arange(-1, n - 1)
+    following = np.arange(1, n + 1)
+    removed = np.zeros(n, dtype=bool)
+
+    def area(i):
+        a, c = previous[i], following[i]
+        return abs((x[a] - x[i]) * (y[c] - y[i]) - (x[c] - x[i]) * (y[a] - y[i])) / 2
+
+    areas = np.zeros(n)
+    areas[1:-1] = np.abs((x[:-2] - x[1:-1]) * (y[2:] - y[1:-1]) - (x[2:] - x[1:-1]) * (y[:-2] - y[1:-1])) / 2
+    heap = [(areas[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    remaining = n
+    while remaining > max(max_points, 2):
+        point_area, i = heapq.heappop(heap)
+        # Entries left behind by a neighbour's removal are stale
+        if removed[i] or point_area != areas[i]:
+            continue
+        removed[i] = True
+        remaining -= 1
+        a, c = previous[i], following[i]
+        following[a], previous[c] = c, a
+        for neighbour in (a, c):
+            if 0 < neighbour < n - 1:
+                # A neighbour's area never drops below the removed point's (Visvalingam's monotonicity rule)
+                areas[neighbour] = max(area(neighbour), point_area)
+                heapq.heappush(heap, (areas[neighbour], neighbour))
+    return np.flatnonzero(~removed)
+
+
+def simplify_route(latitudes, longitudes, zoom=None, max_points=MAP_MAX_POINTS, method="douglas_peucker"):
+    """
+    Indices of the route points to draw at `zoom` (default: the zoom framing the
+    whole route, plus ZOOM_HEADROOM). Douglas-Peucker drops what is within half
+    a pixel; its tolerance doubles until at most `max_points` remain.
+    Visvalingam keeps exactly `max_points`.
+    """
+    latitudes = np.asarray(latitudes, dtype="float64")
+    longitudes = np.asarray(longitudes, dtype="float64")
+    valid = np.flatnonzero(np.isfinite(latitudes) & np.isfinite(longitudes))
+    if len(valid) <= 2:
+        return valid
+    x, y = _project(latitudes[valid], longitudes[valid])
+    if method == "visvalingam":
+        return valid[visvalingam(x, y, max_points)]
+    if method != "douglas_peucker":
+        raise ValueError(f"Unknown simplification method: {method}")
+    if zoom is None:
+        zoom = min(fit_zoom(latitudes[valid], longitudes[valid]) + ZOOM_HEADROOM, MAX_ZOOM)
+    tolerance = meters_per_pixel(zoom, np.mean(latitudes[valid])) / 2
+    kept = douglas_peucker(x, y, tolerance, max_points)
+    while kept is None:
+        tolerance *= 2
+        kept = douglas_peucker(x, y, tolerance, max_points)
+    return valid[kept]
+
+
+def lttb(x, y, max_points):
+    """Indices of the `max_points` points chosen by Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    # First and last points are kept, the others are split in max_points - 2 buckets
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    indices = np.empty(max_points, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = end, edges[bucket + 2]
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the area of the triangle (selected point, candidate, average of the next bucket)
+        areas = np.abs(
+            (x[selected] - next_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (next_y - y[selected])
+        )
+        selected = start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+    return indices
+
+
+def downsample_series(x, y, max_points=CHART_MAX_POINTS):
+    """
+    (x, y) of a chart trace reduced to about `max_points` with LTTB. Each run of
+    points between missing values is downsampled on its own, with a share of the
+    budget matching its length, and the first missing row of every gap is kept
+    so the chart still breaks the line there. Datetimes are measured in seconds
+    from the first one.
+    """
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.Series(y).reset_index(drop=True)
+    if len(x) <= max_points:
+        return x, y
+    if pd.api.types.is_datetime64_any_dtype(x):
+        x_values = (x - x.min()).dt.total_seconds().to_numpy()
+    else:
+        x_values = x.to_numpy(dtype="float64")
+    y_values = y.to_numpy(dtype="float64")
+    present = (x.notna() & y.notna()).to_numpy()
+    # Start and end of each run of present rows
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], present.astype(int), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+    nb_present = present.sum()
+    kept = []
+    for run, (start, end) in enumerate(zip(starts, ends)):
+        if run > 0:
+            kept.append([ends[run - 1]])
+        budget = max(max_points * (end - start) // nb_present, 3)
+        kept.append(start + lttb(x_values[start:end], y_values[start:end], budget))
+    indices = np.concatenate(kept) if kept else np.arange(0)
+    return x.iloc[indices], y.iloc[indices]
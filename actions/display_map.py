@@ -1,41 +1,42 @@
-import xml.etree.ElementTree as ET
-import folium
-from streamlit_folium import st_folium
+import numpy as np
 import streamlit as st
-
-def display_gpx_map(gpx_file_path):
-    # Parse the GPX file
-    namespace = {
-        'default': 'http://www.topografix.com/GPX/1/1',
-        'ns3': 'http://www.garmin.com/xmlschemas/TrackPointExtension/v1'
-    }
-    tree = ET.parse(gpx_file_path)
-    root = tree.getroot()
-
-    # Extract track points
-    track_points = []
-    for trk in root.findall('default:trk', namespace):
-        for trkseg in trk.findall('default:trkseg', namespace):
-            for trkpt in trkseg.findall('default:trkpt', namespace):
-                lat = float(trkpt.attrib['lat'])
-                lon = float(trkpt.attrib['lon'])
-                track_points.append((lat, lon))
+from actions.trackpoint_cache import load_gpx_track
+from actions.decimation import MAX_ZOOM, ZOOM_HEADROOM, fit_zoom, simplify_route
+from routes import summarize_route
+
+def display_gpx_map(gpx_file_path, route=None):
+    """
+    Draw the GPX track on a map. `route` is the activity's row of the route
+    table (see routes.py): when given, the map is framed from it instead of
+    from the track points.
+    """
+    # Imported here so the tabs only load folium once an activity map is shown
+    import folium
+    from streamlit_folium import st_folium
+
+    # Track points from the columnar cache, built from the GPX file on first view
+    latitudes, longitudes = load_gpx_track(gpx_file_path)
+    if route is None:
+        route = summarize_route(latitudes, longitudes)
 
     st.title("GPX Track Viewer")
 
-    if track_points:
-        # Center the map on the middle point of the track
-        mid_index = len(track_points) // 2
-        center_lat, center_lon = track_points[mid_index]
+    if route is not None and route["nb_points"]:
+        bounds = [[route["min_lat"], route["min_lon"]], [route["max_lat"], route["max_lon"]]]
+        zoom = fit_zoom([route["min_lat"], route["max_lat"]], [route["min_lon"], route["max_lon"]])
 
         # Use full width of the Streamlit container
-        m = folium.Map(location=(center_lat, center_lon), zoom_start=13, width='100%', height='600')
+        m = folium.Map(location=(route["centroid_lat"], route["centroid_lon"]), zoom_start=zoom, width='100%', height='600')
+
+        # Only the points further than half a pixel from the line at the framing zoom are sent to the browser
+        kept = simplify_route(latitudes, longitudes, zoom=min(zoom + ZOOM_HEADROOM, MAX_ZOOM))
+        track_points = np.column_stack([latitudes[kept], longitudes[kept]]).astype(float).tolist()
 
         # Add track to the map
         folium.PolyLine(track_points, color="blue", weight=2.5, opacity=1).add_to(m)
 
         # Fit the map to the track bounds
-        m.fit_bounds(track_points)
+        m.fit_bounds(bounds)
 
         # Display map
         st_folium(m, width="100%", height=600)
@@ -1,118 +1,93 @@
 # actions/parse_tcx.py
+import os
 import pandas as pd
 import xml.etree.ElementTree as ET
 import numpy as np
 
+TCX_NS = '{http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2}'
+TPX_NS = '{http://www.garmin.com/xmlschemas/ActivityExtension/v2}'
+
+GPX_NS = '{http://www.topografix.com/GPX/1/1}'
+
+LAP_TAG = TCX_NS + 'Lap'
+TRACKPOINT_TAG = TCX_NS + 'Trackpoint'
+TIME_TAG = TCX_NS + 'Time'
+GPX_TRACKPOINT_TAG = GPX_NS + 'trkpt'
+
+# Element inside a Trackpoint -> column of its numeric value
+TRACKPOINT_FIELDS = {
+    TCX_NS + 'LatitudeDegrees': 'Latitude',
+    TCX_NS + 'LongitudeDegrees': 'Longitude',
+    TCX_NS + 'AltitudeMeters': 'Altitude',
+    TCX_NS + 'DistanceMeters': 'Distance',
+    TCX_NS + 'Value': 'HeartRate',  # HeartRateBpm/Value
+    TPX_NS + 'Speed': 'Speed',  # Extensions/TPX/Speed
+    TPX_NS + 'RunCadence': 'Cadence',
+    TPX_NS + 'Watts': 'Watts',
+}
+# Whole numbers in the file, kept as integers when no trackpoint misses them
+INTEGER_COLUMNS = ['HeartRate', 'Cadence', 'Watts']
+
+# Rough size of a trackpoint in a TCX file, to size the arrays from the file size
+TRACKPOINT_BYTES_ESTIMATE = 300
+
+
+def format_pace(pace_seconds):
+    """Paces as mm:ss strings, "No Data" when missing."""
+    valid = pace_seconds.notna()
+    minutes = (pace_seconds[valid] // 60).astype('int64').astype(str).str.zfill(2)
+    seconds = (pace_seconds[valid] % 60).astype('int64').astype(str).str.zfill(2)
+    formatted = pd.Series("No Data", index=pace_seconds.index)
+    formatted[valid] = minutes + ":" + seconds
+    return formatted
+
+
 def parse_tcx_to_dataframe(tcx_file_path):
-    tree = ET.parse(tcx_file_path)
-    root = tree.getroot()
-
-    ns = {
-        'ns': 'http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2',
-        'ns3': 'http://www.garmin.com/xmlschemas/ActivityExtension/v2'
-    }
-
-    # Liste pour stocker les données de chaque Trackpoint
-    times = []
-    latitudes = []
-    longitudes = []
-    altitudes = []
-    distances = []
-    heart_rates = []
-    speeds = []
-    cadences = []
-    watts = []
-
-    # Liste pour stocker les données des Laps (splits)
-    laps = []
-
-    # Récupérer les Laps (splits)
-    for lap in root.findall('.//ns:Lap', ns):
-        lap_data = {}
-
-        # Récupérer StartTime
-        start_time_elem = lap.find('ns:StartTime', ns)
-        lap_data['StartTime'] = start_time_elem.text if start_time_elem is not None else None
-
-        # Récupérer TotalTimeSeconds
-        total_time_elem = lap.find('ns:TotalTimeSeconds', ns)
-        lap_data['TotalTimeSeconds'] = float(total_time_elem.text) if total_time_elem is not None else np.nan
-
-        # Récupérer DistanceMeters
-        distance_elem = lap.find('ns:DistanceMeters', ns)
-        lap_data['DistanceMeters'] = float(distance_elem.text) if distance_elem is not None else np.nan
-
-        # Récupérer AverageHeartRateBpm
-        avg_hr_elem = lap.find('.//ns:AverageHeartRateBpm/ns:Value', ns)
-        lap_data['AvgHeartRate'] = int(avg_hr_elem.text) if avg_hr_elem is not None else np.nan
-
-        # Récupérer MaximumHeartRateBpm
-        max_hr_elem = lap.find('.//ns:MaximumHeartRateBpm/ns:Value', ns)
-        lap_data['MaxHeartRate'] = int(max_hr_elem.text) if max_hr_elem is not None else np.nan
-
-        laps.append(lap_data)
-
-    # Récupérer les Trackpoints
-    for trackpoint in root.findall('.//ns:Trackpoint', ns):
-        # Récupérer Time
-        time_elem = trackpoint.find('ns:Time', ns)
-        times.append(time_elem.text if time_elem is not None else None)
-
-        # Récupérer Position (Latitude et Longitude)
-        position_elem = trackpoint.find('ns:Position', ns)
-        if position_elem is not None:
-            lat_elem = position_elem.find('ns:LatitudeDegrees', ns)
-            lon_elem = position_elem.find('ns:LongitudeDegrees', ns)
-            latitudes.append(float(lat_elem.text) if lat_elem is not None else np.nan)
-            longitudes.append(float(lon_elem.text) if lon_elem is not None else np.nan)
-        else:
-            latitudes.append(np.nan)
-            longitudes.append(np.nan)
-
-        # Récupérer AltitudeMeters
-        altitude_elem = trackpoint.find('ns:AltitudeMeters', ns)
-        altitudes.append(float(altitude_elem.text) if altitude_elem is not None else np.nan)
-
-        # Récupérer DistanceMeters
-        distance_elem = trackpoint.find('ns:DistanceMeters', ns)
-        distances.append(float(distance_elem.text) if distance_elem is not None else np.nan)
-
-        # Récupérer HeartRateBpm
-        heart_rate_elem = trackpoint.find('.//ns:HeartRateBpm/ns:Value', ns)
-        heart_rates.append(int(heart_rate_elem.text) if heart_rate_elem is not None else np.nan)
-
-        # Récupérer les Extensions (Speed, Cadence, Watts)
-        extensions_elem = trackpoint.find('.//ns3:TPX', ns)
-        if extensions_elem is not None:
-            speed_elem = extensions_elem.find('ns3:Speed', ns)
-            speeds.append(float(speed_elem.text) if speed_elem is not None else np.nan)
-
-            cadence_elem = extensions_elem.find('ns3:RunCadence', ns)
-            cadences.append(int(cadence_elem.text) if cadence_elem is not None else np.nan)
-
-            watt_elem = extensions_elem.find('ns3:Watts', ns)
-            watts.append(int(watt_elem.text) if watt_elem is not None else np.nan)
-        else:
-            speeds.append(np.nan)
-            cadences.append(np.nan)
-            watts.append(np.nan)
-
-    # Créer un DataFrame pour les Trackpoints
-    df = pd.DataFrame({
-        'Time': times,
-        'Latitude': latitudes,
-        'Longitude': longitudes,
-        'Altitude': altitudes,
-        'Distance': distances,
-        'HeartRate': heart_rates,
-        'Speed': speeds,
-        'Cadence': cadences,
-        'Watts': watts
-    })
+    """
+    Trackpoints of a TCX file, one row each. The file is streamed: every
+    trackpoint is read into preallocated arrays, then cleared from the tree.
+    """
+    capacity = max(1024, os.path.getsize(tcx_file_path) // TRACKPOINT_BYTES_ESTIMATE)
+    columns = {name: np.full(capacity, np.nan) for name in TRACKPOINT_FIELDS.values()}
+    times = np.full(capacity, None, dtype=object)
+    nb_points = 0
+
+    for _, elem in ET.iterparse(tcx_file_path):
+        tag = elem.tag
+        if tag == LAP_TAG:
+            # Drops the lap's cleared trackpoints
+            elem.clear()
+            continue
+        if tag != TRACKPOINT_TAG:
+            continue
+        if nb_points == capacity:
+            capacity *= 2
+            for name, values in columns.items():
+                columns[name] = np.concatenate([values, np.full(len(values), np.nan)])
+            times = np.concatenate([times, np.full(len(times), None, dtype=object)])
+        for node in elem.iter():
+            column = TRACKPOINT_FIELDS.get(node.tag)
+            if column is not None:
+                columns[column][nb_points] = float(node.text)
+            elif node.tag == TIME_TAG:
+                times[nb_points] = node.text
+        nb_points += 1
+        elem.clear()
+
+    df = pd.DataFrame({'Time': times[:nb_points]})
+    for name, values in columns.items():
+        values = values[:nb_points]
+        if name in INTEGER_COLUMNS and not np.isnan(values).any():
+            values = values.astype('int64')
+        df[name] = values
 
     # Convertir le temps en datetime
     df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
+    return add_pace_columns(df)
 
+
+def add_pace_columns(df):
+    """Pace (timedelta per km), Pace_seconds and Pace_formatted from the Speed column."""
     # Remplacer les vitesses nulles par NaN
     df.loc[df['Speed'] == 0, 'Speed'] = np.nan
     df['Pace'] = pd.to_timedelta(
@@ -122,11 +97,25 @@ def parse_tcx_to_dataframe(tcx_file_path):
     ) 
 
     df['Pace_seconds'] = df['Pace'].dt.total_seconds()
-    # Create a new column for formatted Pace (mm:ss or "No Data")
-    df['Pace_formatted'] = df['Pace'].apply(
-        lambda x: f"{int(x.total_seconds() // 60):02d}:{int(x.total_seconds() % 60):02d}"
-                if pd.notna(x) else "No Data"
-    )
+    # Formatted Pace (mm:ss or "No Data")
+    df['Pace_formatted'] = format_pace(df['Pace_seconds'])
+    return df
+
+
+def parse_gpx_to_dataframe(gpx_file_path):
+    """Track points of a GPX file (trk/trkseg/trkpt), streamed like parse_tcx_to_dataframe."""
+    rows = {'Time': [], 'Latitude': [], 'Longitude': [], 'Altitude': []}
+    for _, elem in ET.iterparse(gpx_file_path):
+        if elem.tag != GPX_TRACKPOINT_TAG:
+            continue
+        rows['Latitude'].append(float(elem.attrib['lat']))
+        rows['Longitude'].append(float(elem.attrib['lon']))
+        rows['Time'].append(elem.findtext(GPX_NS + 'time'))
+        altitude = elem.findtext(GPX_NS + 'ele')
+        rows['Altitude'].append(float(altitude) if altitude is not None else np.nan)
+        elem.clear()
+    df = pd.DataFrame(rows)
+    df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
     return df
 
 
@@ -0,0 +1,233 @@
+# actions/trackpoint_cache.py
+"""
+Columnar cache of the trackpoints of TCX and GPX exports.
+
+Each source file gets a folder next to it (`<id>.tcx.cache/`, `<id>.gpx.cache/`)
+holding one .npy file per column, loaded memory-mapped, and `source.json` with
+the size, mtime and SHA-256 of the source it was built from. A cache whose
+source changed is rebuilt on the next load.
+
+Usage (backfill the activities downloaded before the cache existed):
+    python -m actions.trackpoint_cache data/raw
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from actions.parse_tcx_csv import parse_tcx_to_dataframe, parse_gpx_to_dataframe, add_pace_columns
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".cache"
+META_FILE = "source.json"
+
+# Source extension -> (parser, column -> stored dtype)
+CACHE_FORMATS = {
+    ".tcx": (parse_tcx_to_dataframe, {
+        "Time": "int64",  # epoch milliseconds, NaT stored as the int64 minimum
+        "Latitude": "float32",
+        "Longitude": "float32",
+        "Altitude": "float32",
+        "Distance": "float32",
+        "HeartRate": "int16",
+        "Speed": "float32",
+        "Cadence": "int16",
+        "Watts": "int16",
+    }),
+    ".gpx": (parse_gpx_to_dataframe, {
+        "Time": "int64",
+        "Latitude": "float32",
+        "Longitude": "float32",
+        "Altitude": "float32",
+    }),
+}
+
+# Missing values of the integer columns (heart rate, cadence and watts are never negative)
+INT16_MISSING = -1
+
+
+def cache_path(source_path):
+    return source_path + CACHE_SUFFIX
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(cache_dir, meta):
+    tmp_file = os.path.join(cache_dir, META_FILE + ".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_file, os.path.join(cache_dir, META_FILE))
+
+
+def is_cache_valid(source_path):
+    """
+    Whether the cache was built from the current source. A source whose mtime
+    or size changed is hashed: same content keeps the cache (its stamp is
+    refreshed), new content invalidates it.
+    """
+    meta = _read_meta(cache_path(source_path))
+    if meta is None or meta.get("version") != CACHE_VERSION:
+        return False
+    stat = os.stat(source_path)
+    if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    if meta["sha256"] != _file_hash(source_path):
+        return False
+    meta.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    try:
+        _write_meta(cache_path(source_path), meta)
+    except OSError:
+        pass
+    return True
+
+
+def _encode(df, columns):
+    """Columns of a parsed DataFrame in their stored dtypes, and whether times are UTC."""
+    times = df["Time"]
+    utc = times.dt.tz is not None
+    if utc:
+        times = times.dt.tz_convert("UTC").dt.tz_localize(None)
+    arrays = {"Time": times.to_numpy(dtype="datetime64[ms]").astype("int64")}
+    for name, dtype in columns.items():
+        if name == "Time":
+            continue
+        values = df[name].to_numpy(dtype="float64")
+        if dtype == "int16":
+            values = np.where(np.isnan(values), INT16_MISSING, values)
+        arrays[name] = values.astype(dtype)
+    return arrays, utc
+
+
+def _read_source(source_path):
+    """Parse a TCX or GPX file into its stored columns and cache metadata."""
+    parse, columns = CACHE_FORMATS[os.path.splitext(source_path)[1].lower()]
+    stat = os.stat(source_path)
+    sha256 = _file_hash(source_path)
+    arrays, utc = _encode(parse(source_path), columns)
+    meta = {
+        "version": CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256,
+        "points": len(arrays["Time"]),
+        "utc": utc,
+    }
+    return arrays, meta
+
+
+def _write_cache(source_path, arrays, meta):
+    # Written aside then renamed, so a reader never sees a partial cache
+    cache_dir = cache_path(source_path)
+    tmp_dir = f"{cache_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+    _write_meta(tmp_dir, meta)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.rename(tmp_dir, cache_dir)
+    return cache_dir
+
+
+def build_trackpoint_cache(source_path):
+    """Parse a TCX or GPX file and write its columns to the cache folder. Returns the folder."""
+    return _write_cache(source_path, *_read_source(source_path))
+
+
+def load_trackpoint_columns(source_path):
+    """
+    Memory-mapped columns of a TCX or GPX file, (re)building its cache when
+    missing or stale. Returns ({column: array in its stored dtype}, meta).
+    A cache that cannot be written (read-only folder) falls back to the parsed columns.
+    """
+    _, columns = CACHE_FORMATS[os.path.splitext(source_path)[1].lower()]
+    if not is_cache_valid(source_path):
+        arrays, meta = _read_source(source_path)
+        try:
+            _write_cache(source_path, arrays, meta)
+        except OSError as e:
+            logger.warning(f"Could not cache trackpoints of {source_path}: {e}")
+        return arrays, meta
+    cache_dir = cache_path(source_path)
+    arrays = {name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r") for name in columns}
+    return arrays, _read_meta(cache_dir)
+
+
+def _decode_times(values, utc):
+    times = pd.Series(np.asarray(values).astype("datetime64[ms]"))
+    return times.dt.tz_localize("UTC") if utc else times
+
+
+def _decode_int16(values):
+    """Integers as int64, or float64 with NaN when some are missing, like the parser returns them."""
+    missing = values == INT16_MISSING
+    if not missing.any():
+        return values.astype("int64")
+    return np.where(missing, np.nan, values.astype("float64"))
+
+
+def load_tcx_trackpoints(tcx_file_path):
+    """Trackpoints of a TCX file from its cache, as parse_tcx_to_dataframe returns them."""
+    arrays, meta = load_trackpoint_columns(tcx_file_path)
+    _, columns = CACHE_FORMATS[".tcx"]
+    df = pd.DataFrame({"Time": _decode_times(arrays["Time"], meta["utc"])})
+    for name, dtype in columns.items():
+        if name == "Time":
+            continue
+        df[name] = _decode_int16(arrays[name]) if dtype == "int16" else arrays[name].astype("float64")
+    return add_pace_columns(df)
+
+
+def load_gpx_track(gpx_file_path):
+    """Latitudes and longitudes of a GPX track, memory-mapped from its cache."""
+    arrays, _ = load_trackpoint_columns(gpx_file_path)
+    return arrays["Latitude"], arrays["Longitude"]
+
+
+def cache_activity_files(activity_dir):
+    """Build the missing or stale caches of the TCX and GPX files in an activity folder."""
+    for name in sorted(os.listdir(activity_dir)):
+        source_path = os.path.join(activity_dir, name)
+        if os.path.splitext(name)[1].lower() not in CACHE_FORMATS or not os.path.isfile(source_path):
+            continue
+        try:
+            if not is_cache_valid(source_path):
+                build_trackpoint_cache(source_path)
+        except Exception as e:
+            logger.warning(f"Could not cache trackpoints of {source_path}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the trackpoint caches of downloaded activities")
+    parser.add_argument("raw_dir", help="folder holding the <month>/<activity id>/ folders, e.g. data/raw")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    for root, _, files in os.walk(args.raw_dir):
+        if any(os.path.splitext(name)[1].lower() in CACHE_FORMATS for name in files):
+            cache_activity_files(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,78 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
+import importlib
 from datetime import timedelta
 import sql_queries as sql
-
-import plotly.express as px
-import tabs.tab_swimming as tab_swimming
-import tabs.tab_cycling as tab_cycling
-import tabs.tab_running as tab_running
-import tabs.tab_race as tab_race
-import tabs.tab_overview as tab_overview
-import tabs.tab_stats as tab_stats
-import tabs.tab_races_results as tab_races_results
+from db_pool import ConnectionPool
 
 import os
 import sys
 
+# Sidebar tab -> module rendering it. Only the selected tab is imported, with
+# its plotting dependencies, so a run doesn't pay for the other tabs.
+TAB_MODULES = {
+    "Stats": "tabs.tab_stats",
+    "Overview": "tabs.tab_overview",
+    "Running": "tabs.tab_running",
+    "Swimming": "tabs.tab_swimming",
+    "Cycling": "tabs.tab_cycling",
+    "Race Training": "tabs.tab_race",
+    "Race Results": "tabs.tab_races_results",
+    "Heatmap": "tabs.tab_heatmap",
+}
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
 db_activities_path = os.path.join(script_dir, "activities.db")
-act_db_con = sqlite3.connect(db_activities_path)
 db_races_path = os.path.join(script_dir, "races.db")
-act_rac_con = sqlite3.connect(db_races_path)
 st.set_page_config(layout="wide")
 
+@st.cache_resource
+def get_connection_pools():
+    """Read-only connection pools, shared by every session of the server."""
+    # The activities database may predate the schema the tabs read: migrate it first
+    return ConnectionPool(db_activities_path, migrate_schema=True), ConnectionPool(db_races_path)
+
 # --- Helper Functions ---
 def format_duration(seconds):
     if seconds is None:
         return "N/A"
     return str(timedelta(seconds=seconds)).split(".")[0]
 
+def load_tab(tab):
+    """Module of a sidebar tab, imported on first use."""
+    return importlib.import_module(TAB_MODULES[tab])
+
 # --- Main App ---
 def main():
-    # Connect to SQLite DB
-    cursor = act_db_con.cursor()
+    activities_pool, races_pool = get_connection_pools()
+    # Connection checked out for this script run only
+    with activities_pool.connection() as act_db_con:
+        cursor = act_db_con.cursor()
 
-    # Get all table names
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
+        # Get all table names
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        tables = cursor.fetchall()
 
-    st.title("Garmin Activity Dashboard")
+        st.title("Garmin Activity Dashboard")
 
-    # Sidebar filters
-    st.sidebar.header("Filters")
-    filter_type = st.sidebar.selectbox(
-        "Filter by", ["week", "month", "year", "race"]
-    )
-    filter_value = st.sidebar.text_input(f"Enter {filter_type} (e.g., '2025-09-08' for week)")
+        # Sidebar filters
+        st.sidebar.header("Filters")
+        filter_type = st.sidebar.selectbox(
+            "Filter by", ["week", "month", "year", "race"]
+        )
+        filter_value = st.sidebar.text_input(f"Enter {filter_type} (e.g., '2025-09-08' for week)")
 
-    # Apply filter condition for SQL
-    filter_condition = f"{filter_type} = '{filter_value}'" if filter_value else "1=1"
+        # Apply filter condition for SQL, the value is bound rather than pasted in the query
+        filter_condition = sql.get_filter_condition(filter_type, filter_value)
 
-    # Sidebar tabs
-    st.sidebar.header("Tabs")
-    tab = st.sidebar.radio("Select Tab", ["Stats", "Overview","Running", "Swimming", "Cycling", "Race Training", "Race Results"])
+        # Sidebar tabs
+        st.sidebar.header("Tabs")
+        tab = st.sidebar.radio("Select Tab", list(TAB_MODULES))
 
-    if tab == "Overview":
-        tab_overview.show(act_db_con)
-    elif tab == "Swimming":
-        tab_swimming.show(act_db_con)
-    elif tab == "Cycling":
-        tab_cycling.show(act_db_con)
-    elif tab == "Running":
-        tab_running.show(act_db_con)
-    elif tab == "Race Training":
-        tab_race.show(act_db_con)
-    elif tab == "Stats":
-        tab_stats.show(act_db_con)
-    elif tab == "Race Results":
-        tab_races_results.show(act_rac_con)
+        if tab == "Race Results":
+            with races_pool.connection() as act_rac_con:
+                load_tab(tab).show(act_rac_con)
+        else:
+            load_tab(tab).show(act_db_con)
 
 if __name__ == "__main__":
     main()
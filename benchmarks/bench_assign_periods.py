@@ -0,0 +1,55 @@
+"""
+Compare the row-wise `assign_periods` with the vectorized `assign_periods_batch`
+on synthetic activities, and check that both give the same output.
+The row-wise version is timed on the first `--sample` rows only and its
+time is scaled up to the full size, since it takes minutes on 100k rows.
+
+Usage:
+    python benchmarks/bench_assign_periods.py --rows 10000 100000 --sample 2000
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess_activities import assign_periods, assign_periods_batch
+
+
+def synthetic_activities(nb_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2022-01-01").value
+    end = pd.Timestamp("2026-01-01").value
+    start_times = pd.to_datetime(rng.integers(start, end, nb_rows)).floor("s")
+    return pd.DataFrame({"startTimeLocal": start_times})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark row-wise vs vectorized period assignment")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--sample", type=int, default=2000, help="Rows timed with the row-wise version")
+    args = parser.parse_args()
+
+    for nb_rows in args.rows:
+        df = synthetic_activities(nb_rows)
+        sample = df.iloc[:args.sample]
+
+        start = time.perf_counter()
+        expected = sample.apply(assign_periods, axis=1)
+        row_wise = (time.perf_counter() - start) * nb_rows / len(sample)
+
+        start = time.perf_counter()
+        result = assign_periods_batch(df)
+        vectorized = time.perf_counter() - start
+
+        assert result['trainingRace'].iloc[:len(sample)].tolist() == expected['trainingRace'].tolist()
+        assert result['offSeason'].iloc[:len(sample)].tolist() == expected['offSeason'].tolist()
+        print(f"{nb_rows:>7} rows: row-wise {row_wise:8.3f}s (scaled from {len(sample)} rows) | vectorized {vectorized:8.4f}s | x{row_wise / vectorized:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Time concurrent dashboard viewers on one shared connection and on the pool.
+
+Each viewer thread renders sessions of the sport and race tabs (see
+bench_query_registry) with the result cache disabled, so every render reaches
+SQLite. The former module-level connection is run behind a lock, which is the
+best a single sqlite3 connection allows across threads. The pool gives each
+render its own read-only WAL connection. An ingest-like writer commits between
+renders to check that readers are not blocked by it.
+
+Usage:
+    python benchmarks/bench_connection_pool.py --activities 20000 --viewers 4 --sessions 5
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sql_queries as sql
+from db_pool import ConnectionPool
+from bench_sql_queries import build_database
+from bench_query_registry import session_queries
+
+
+def render(conn, queries):
+    return [sql.read_query(conn, query, cache=None) for query in queries]
+
+
+def run_shared(db_path, queries, viewers, sessions):
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=sql.STATEMENT_CACHE_SIZE)
+    lock = threading.Lock()
+
+    def viewer():
+        for _ in range(sessions):
+            with lock:
+                results = render(conn, queries)
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(viewers) as executor:
+        results = [f.result() for f in [executor.submit(viewer) for _ in range(viewers)]]
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return results, elapsed
+
+
+def run_pooled(pool, queries, viewers, sessions):
+    def viewer():
+        for _ in range(sessions):
+            with pool.connection() as conn:
+                results = render(conn, queries)
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(viewers) as executor:
+        results = [f.result() for f in [executor.submit(viewer) for _ in range(viewers)]]
+    return results, time.perf_counter() - start
+
+
+def write_while_reading(db_path, pool, queries):
+    """Commit from a writer while a pooled reader holds a read transaction."""
+    writer = sqlite3.connect(db_path)
+    with pool.connection() as conn:
+        conn.execute("BEGIN")
+        count = conn.execute("SELECT count(*) FROM activities").fetchone()[0]
+        writer.execute("UPDATE activities SET distance = distance WHERE activityId = 0")
+        writer.commit()
+        render(conn, queries)
+        assert conn.execute("SELECT count(*) FROM activities").fetchone()[0] == count
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent viewers on a shared connection and on the pool")
+    parser.add_argument("--activities", type=int, default=20000)
+    parser.add_argument("--viewers", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=5)
+    args = parser.parse_args()
+
+    queries = session_queries()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "activities.db")
+        build_database(db_path, args.activities).close()
+        pool = ConnectionPool(db_path, size=args.viewers)
+        journal_mode = sqlite3.connect(db_path).execute("PRAGMA journal_mode").fetchone()[0]
+
+        expected, shared = run_shared(db_path, queries, args.viewers, args.sessions)
+        results, pooled = run_pooled(pool, queries, args.viewers, args.sessions)
+        for viewer_results, viewer_expected in zip(results, expected):
+            for result, reference in zip(viewer_results, viewer_expected):
+                pd.testing.assert_frame_equal(result, reference)
+        write_while_reading(db_path, pool, queries)
+        pool.close()
+
+        renders = args.viewers * args.sessions
+        print(f"{args.viewers} viewers x {args.sessions} sessions of {len(queries)} queries on {args.activities} activities (journal_mode={journal_mode})")
+        print(f"{'shared connection':<18} {shared * 1000 / renders:8.1f} ms/render")
+        print(f"{'connection pool':<18} {pooled * 1000 / renders:8.1f} ms/render  x{shared / pooled:.2f}")
+        print("writer committed during a pooled read without blocking it")
+
+
+if __name__ == "__main__":
+    main()
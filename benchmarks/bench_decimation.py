@@ -0,0 +1,135 @@
+"""
+Measure how much route simplification and LTTB downsampling cut the map and
+chart payloads, and how far the drawn shapes move.
+
+Synthetic rides of 1 to 6 hours (one point per second, GPS jitter) are
+simplified for the map with Douglas-Peucker and Visvalingam, and their heart
+rate traces are downsampled with LTTB and with a plain stride of the same
+budget. Payloads are the JSON the browser receives. Route error is the largest
+distance from a dropped point to the drawn line, in pixels at the framing
+zoom; Douglas-Peucker must stay within half a pixel at the zoom it targets.
+Chart error is the mean gap, in pixels of a 1200x400 chart, between the
+per-column min/max envelopes of the full and reduced traces.
+
+Usage:
+    python benchmarks/bench_decimation.py --hours 1 3 6
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions.decimation import (
+    CHART_MAX_POINTS, ZOOM_HEADROOM, _project, fit_zoom, meters_per_pixel, simplify_route, downsample_series,
+)
+
+CHART_WIDTH_PX, CHART_HEIGHT_PX = 1200, 400
+
+
+def synthetic_ride(hours, seed=0):
+    rng = np.random.default_rng(seed)
+    n = hours * 3600
+    heading = np.cumsum(rng.normal(0, 0.03, n))
+    step = rng.uniform(5, 10, n)  # metres per second
+    latitudes = 45.5 + np.cumsum(np.cos(heading) * step) / 111320 + rng.normal(0, 2e-6, n)
+    longitudes = -73.6 + np.cumsum(np.sin(heading) * step) / 78000 + rng.normal(0, 2e-6, n)
+    times = pd.Series(pd.date_range("2024-06-01 08:00", periods=n, freq="s", tz="UTC"))
+    heart_rate = pd.Series(np.round(140 + 15 * np.sin(np.arange(n) / 600) + np.cumsum(rng.normal(0, 0.3, n)) % 20 + rng.normal(0, 2, n)))
+    return latitudes, longitudes, times, heart_rate
+
+
+def route_payload(latitudes, longitudes):
+    return json.dumps(np.column_stack([latitudes, longitudes]).round(7).tolist())
+
+
+def series_payload(x, y):
+    return json.dumps({"x": x.dt.strftime("%Y-%m-%dT%H:%M:%S").tolist(), "y": y.tolist()})
+
+
+def route_error_px(latitudes, longitudes, kept, zoom):
+    """Largest distance from a route point to the simplified line through `kept`, in pixels at `zoom`."""
+    x, y = _project(latitudes, longitudes)
+    segment = np.clip(np.searchsorted(kept, np.arange(len(x)), side="right") - 1, 0, len(kept) - 2)
+    ax, ay = x[kept[segment]], y[kept[segment]]
+    bx, by = x[kept[segment + 1]], y[kept[segment + 1]]
+    dx, dy = bx - ax, by - ay
+    length2 = np.maximum(dx * dx + dy * dy, 1e-12)
+    t = np.clip(((x - ax) * dx + (y - ay) * dy) / length2, 0, 1)
+    distances = np.hypot(x - (ax + t * dx), y - (ay + t * dy))
+    return distances.max() / meters_per_pixel(zoom, np.mean(latitudes))
+
+
+def envelope(x_seconds, y, y_range):
+    """Per-pixel-column min and max of a trace, in pixels."""
+    columns = np.minimum((x_seconds / x_seconds.max() * CHART_WIDTH_PX).astype(int), CHART_WIDTH_PX - 1)
+    pixels = (y - y_range[0]) / (y_range[1] - y_range[0]) * CHART_HEIGHT_PX
+    low = pd.Series(pixels).groupby(columns).min().reindex(range(CHART_WIDTH_PX)).interpolate().to_numpy()
+    high = pd.Series(pixels).groupby(columns).max().reindex(range(CHART_WIDTH_PX)).interpolate().to_numpy()
+    return low, high
+
+
+def chart_error_px(times, values, x, y):
+    start = times.iloc[0]
+    y_range = (values.min(), values.max())
+    full = envelope((times - start).dt.total_seconds().to_numpy(), values.to_numpy(), y_range)
+    reduced = envelope((x - start).dt.total_seconds().to_numpy(), y.to_numpy(), y_range)
+    return np.mean([np.abs(a - b).mean() for a, b in zip(full, reduced)])
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark route simplification and chart downsampling")
+    parser.add_argument("--hours", type=int, nargs="+", default=[1, 3, 6])
+    args = parser.parse_args()
+
+    failures = []
+    for hours in args.hours:
+        latitudes, longitudes, times, heart_rate = synthetic_ride(hours)
+        n = len(latitudes)
+        zoom = fit_zoom(latitudes, longitudes)
+        full_route = len(route_payload(latitudes, longitudes))
+        print(f"{hours} h ride, {n} points, framed at zoom {zoom} | route payload {full_route / 1e3:7.1f} kB")
+        for method in ["douglas_peucker", "visvalingam"]:
+            kept, elapsed = timed(simplify_route, latitudes, longitudes, method=method)
+            size = len(route_payload(latitudes[kept], longitudes[kept]))
+            error = route_error_px(latitudes, longitudes, kept, zoom)
+            target_error = route_error_px(latitudes, longitudes, kept, zoom + ZOOM_HEADROOM)
+            print(f"  map   {method:<16} {len(kept):>6} points {size / 1e3:7.1f} kB  x{full_route / size:5.1f}"
+                  f"  error {error:5.2f} px (zoom {zoom}) {target_error:5.2f} px (zoom {zoom + ZOOM_HEADROOM})  {elapsed * 1000:6.1f} ms")
+
+        # Without the point budget, Douglas-Peucker stays within half a pixel at the zoom it targets
+        kept = simplify_route(latitudes, longitudes, max_points=n)
+        target_error = route_error_px(latitudes, longitudes, kept, zoom + ZOOM_HEADROOM)
+        if target_error > 0.5 + 1e-9:
+            failures.append(f"{hours} h: {target_error:.2f} px at zoom {zoom + ZOOM_HEADROOM}")
+
+        full_chart = len(series_payload(times, heart_rate))
+        print(f"  chart {'full':<16} {n:>6} points {full_chart / 1e3:7.1f} kB")
+        (x, y), elapsed = timed(downsample_series, times, heart_rate)
+        stride = max(1, -(-n // CHART_MAX_POINTS))
+        reductions = {
+            "lttb": (x, y, elapsed),
+            "stride": (times.iloc[::stride], heart_rate.iloc[::stride], 0.0),
+        }
+        for name, (x, y, elapsed) in reductions.items():
+            size = len(series_payload(x, y))
+            error = chart_error_px(times, heart_rate, x, y)
+            print(f"  chart {name:<16} {len(x):>6} points {size / 1e3:7.1f} kB  x{full_chart / size:5.1f}"
+                  f"  envelope error {error:5.2f} px  {elapsed * 1000:6.1f} ms")
+    if failures:
+        sys.exit("Simplified routes moved by more than half a pixel:\n  " + "\n  ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
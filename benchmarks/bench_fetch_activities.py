@@ -0,0 +1,75 @@
+"""
+Benchmark the activity fetch stage against a local fake Garmin client.
+
+Usage:
+    python benchmarks/bench_fetch_activities.py --activities 200 --latency 0.05 --max_workers 8
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetch_activities import fetch_activities, RateLimiter
+
+
+class FakeGarminClient:
+    """Mimics the subset of `garminconnect.Garmin` used by the fetch stage, with a fixed network latency."""
+
+    class ActivityDownloadFormat:
+        GPX = "gpx"
+        TCX = "tcx"
+        CSV = "csv"
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+
+    def get_activity(self, activity_id):
+        time.sleep(self.latency)
+        return {
+            "activityId": activity_id,
+            "activityName": f"Activity {activity_id}",
+            "activityTypeDTO": {"typeKey": "running"},
+            "summaryDTO": {
+                "startTimeLocal": "2024-05-06T07:30:00.0",
+                "duration": 3600.0,
+                "distance": 10000.0,
+                "averageHR": 150.0,
+            },
+        }
+
+    def download_activity(self, activity_id, dl_fmt=None):
+        time.sleep(self.latency)
+        return f"<{dl_fmt} activity='{activity_id}'/>".encode()
+
+
+def run(client, nb_activities, max_workers, rate_limit, output_root):
+    jobs = [(activity_id, os.path.join(output_root, str(activity_id))) for activity_id in range(nb_activities)]
+    start = time.perf_counter()
+    results = fetch_activities(client, jobs, max_workers=max_workers, rate_limiter=RateLimiter(rate_limit))
+    elapsed = time.perf_counter() - start
+    assert all(result is not None for result in results)
+    return nb_activities / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial vs concurrent activity fetching")
+    parser.add_argument("--activities", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per Garmin request")
+    parser.add_argument("--max_workers", type=int, default=8)
+    parser.add_argument("--rate_limit", type=float, default=0, help="Requests per second (0 disables the limit)")
+    args = parser.parse_args()
+
+    client = FakeGarminClient(args.latency)
+    with tempfile.TemporaryDirectory() as output_root:
+        serial = run(client, args.activities, 1, args.rate_limit, os.path.join(output_root, "serial"))
+        concurrent = run(client, args.activities, args.max_workers, args.rate_limit, os.path.join(output_root, "concurrent"))
+
+    print(f"Serial:     {serial:8.2f} activities/s")
+    print(f"Concurrent: {concurrent:8.2f} activities/s ({args.max_workers} workers, x{concurrent / serial:.1f})")
+
+
+if __name__ == "__main__":
+    main()
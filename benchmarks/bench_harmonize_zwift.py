@@ -0,0 +1,70 @@
+"""
+Time the former per-day loop of `harmonize_zwift_activities` against the
+groupby version on synthetic multi-year data. That both give the same output
+is checked by tests/test_harmonize_zwift.py.
+
+Usage:
+    python benchmarks/bench_harmonize_zwift.py --years 1 5
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess_activities import harmonize_zwift_activities
+
+
+def harmonize_zwift_activities_loop(df):
+    """Reference: the per-day loop used before the groupby version."""
+    unique_days = df['Day'].unique()
+    for day in unique_days:
+        max_avg_hr = df.loc[(df['Day'] == day) & (df['activityName'] == "Cardio Zwift"), 'averageHR'].max()
+        max_max_hr = df.loc[(df['Day'] == day) & (df['activityName'] == "Cardio Zwift"), 'maxHR'].max()
+        df.loc[(df['Day'] == day) & (df['activityName'].str.startswith('Zwift', na=False)), 'averageHR'] = max_avg_hr
+        df.loc[(df['Day'] == day) & (df['activityName'].str.startswith('Zwift', na=False)), 'maxHR'] = max_max_hr
+    return df.loc[df['activityName'] != "Cardio Zwift"]
+
+
+def synthetic_activities(nb_years, per_day=2, seed=0):
+    rng = np.random.default_rng(seed)
+    nb_rows = int(nb_years * 365 * per_day)
+    start = pd.Timestamp("2016-01-01").value
+    end = (pd.Timestamp("2016-01-01") + pd.DateOffset(years=nb_years)).value
+    start_times = pd.to_datetime(np.sort(rng.integers(start, end, nb_rows))).floor("s")
+    names = rng.choice(["Zwift - Watopia", "Cardio Zwift", "Morning Run", "Lap Swimming", None], nb_rows,
+                       p=[0.25, 0.2, 0.35, 0.15, 0.05])
+    return pd.DataFrame({
+        "activityName": names,
+        "startTimeLocal": start_times,
+        "Day": start_times.date,
+        "averageHR": rng.integers(90, 170, nb_rows).astype(float),
+        "maxHR": rng.integers(150, 200, nb_rows).astype(float),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-day loop vs groupby Zwift harmonization")
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5])
+    args = parser.parse_args()
+
+    for nb_years in args.years:
+        df = synthetic_activities(nb_years)
+
+        start = time.perf_counter()
+        harmonize_zwift_activities_loop(df.copy())
+        loop = time.perf_counter() - start
+
+        start = time.perf_counter()
+        harmonize_zwift_activities(df.copy())
+        grouped = time.perf_counter() - start
+
+        print(f"{nb_years:>3} years ({len(df):>6} rows): loop {loop:8.3f}s | groupby {grouped:8.4f}s | x{loop / grouped:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Time the heatmap tile pyramid: full render, incremental update, and worker count.
+
+Synthetic GPX tracks around Montreal are laid out like the downloads. The whole
+archive is rendered once per worker count, then new tracks are added and
+rendered incrementally. The incremental pyramid must hold the same counts as
+a full rebuild of the grown archive, while re-rendering only the tiles the new
+tracks touch. Tile bytes are compared with the JSON of every point that
+folium PolyLines would send.
+
+Usage:
+    python benchmarks/bench_heatmap.py --tracks 300 --new-tracks 10 --points 3600 --workers 1 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from heatmap import MAX_ZOOM, MIN_ZOOM, find_gpx_files, update_heatmap
+from actions.trackpoint_cache import load_gpx_track
+from bench_trackpoint_cache import write_gpx
+
+
+def write_tracks(raw_dir, first, count, nb_points, seed=0):
+    rng = np.random.default_rng(seed + first)
+    for activity_id in range(first, first + count):
+        path = os.path.join(raw_dir, "2024-06", str(activity_id), f"{activity_id}.gpx")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        origin = (45.5 + rng.uniform(-0.1, 0.1), -73.6 + rng.uniform(-0.15, 0.15))
+        write_gpx(path, nb_points, seed=activity_id, origin=origin)
+
+
+def tree_files(root, suffix):
+    return {
+        os.path.relpath(os.path.join(folder, name), root)
+        for folder, _, files in os.walk(root) for name in files if name.endswith(suffix)
+    }
+
+
+def assert_same_counts(dir_a, dir_b):
+    files = tree_files(dir_a, ".npz")
+    assert files == tree_files(dir_b, ".npz"), "different tiles"
+    for name in files:
+        with np.load(os.path.join(dir_a, name)) as a, np.load(os.path.join(dir_b, name)) as b:
+            np.testing.assert_array_equal(a["counts"], b["counts"], err_msg=name)
+
+
+def render(raw_dir, out_dir, **kwargs):
+    dirs = {"counts_dir": os.path.join(out_dir, "counts"), "tiles_dir": os.path.join(out_dir, "tiles")}
+    start = time.perf_counter()
+    written = update_heatmap(raw_dir, **dirs, **kwargs)
+    return written, time.perf_counter() - start, dirs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the heatmap tile pyramid")
+    parser.add_argument("--tracks", type=int, default=300)
+    parser.add_argument("--new-tracks", type=int, default=10)
+    parser.add_argument("--points", type=int, default=3600)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_dir = os.path.join(tmp_dir, "raw")
+        write_tracks(raw_dir, 1, args.tracks, args.points)
+        # Build the trackpoint caches up front, as ingest does
+        polyline_bytes = sum(
+            len(json.dumps(np.column_stack(load_gpx_track(path)).round(7).tolist())) for path in find_gpx_files(raw_dir)
+        )
+        print(f"{args.tracks} tracks of {args.points} points, zooms {MIN_ZOOM}-{MAX_ZOOM}, {os.cpu_count()} CPU(s)"
+              f" | PolyLine payload {polyline_bytes / 1e6:.1f} MB")
+
+        for workers in args.workers:
+            written, elapsed, dirs = render(raw_dir, os.path.join(tmp_dir, f"full_{workers}"), workers=workers)
+            png_bytes = sum(os.path.getsize(os.path.join(dirs["tiles_dir"], name)) for name in tree_files(dirs["tiles_dir"], ".png"))
+            print(f"full render      {workers} worker(s) {elapsed:7.2f} s  {sum(written.values()):>6} tiles  {png_bytes / 1e6:6.1f} MB of PNG"
+                  f"  (zoom {MAX_ZOOM}: {written[MAX_ZOOM]} tiles)")
+
+        incremental_dir = os.path.join(tmp_dir, f"full_{args.workers[0]}")
+        write_tracks(raw_dir, args.tracks + 1, args.new_tracks, args.points, seed=1)
+        written, incremental_time, dirs = render(raw_dir, incremental_dir, workers=args.workers[-1])
+        nb_new = sum(written.values())
+        rebuilt, rebuild_time, rebuild_dirs = render(raw_dir, os.path.join(tmp_dir, "rebuild"), workers=args.workers[-1])
+        assert_same_counts(dirs["counts_dir"], rebuild_dirs["counts_dir"])
+        assert tree_files(dirs["tiles_dir"], ".png") == tree_files(rebuild_dirs["tiles_dir"], ".png")
+        print(f"+{args.new_tracks} tracks     incremental {incremental_time:7.2f} s  {nb_new:>6} tiles re-rendered"
+              f" | full rebuild {rebuild_time:7.2f} s  {sum(rebuilt.values()):>6} tiles  x{rebuild_time / incremental_time:.1f}")
+        print("incremental counts match a full rebuild")
+
+        unchanged, elapsed, _ = render(raw_dir, incremental_dir, workers=args.workers[-1])
+        assert not unchanged
+        print(f"no new tracks    {elapsed:7.2f} s, nothing re-rendered")
+
+
+if __name__ == "__main__":
+    main()
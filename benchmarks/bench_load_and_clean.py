@@ -0,0 +1,79 @@
+"""
+Compare the former string round-trip of `load_and_clean_data` with the typed
+parser on a synthetic multi-year backlog, and check that both give the same
+values. Raw cells mix numbers, numeric strings, decimal commas and '--'.
+
+Usage:
+    python benchmarks/bench_load_and_clean.py --rows 10000 100000
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess_activities import NUMERIC_COLUMNS, load_and_clean_data
+
+
+def load_and_clean_data_strings(df):
+    """Reference: the str/replace/to_numeric round-trip and per-row Week used before."""
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.replace(',', '.').str.replace('--', '0')
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['distance'] = df['distance'] / 1000
+    df['startTimeLocal'] = pd.to_datetime(df['startTimeLocal'])
+    df['Day'] = df['startTimeLocal'].dt.date
+    df['Week'] = df['startTimeLocal'].apply(lambda x: (x - timedelta(days=x.dayofweek))).dt.date
+    df['Month'] = df['startTimeLocal'].to_numpy().astype('datetime64[M]')
+    df['durationFormatted'] = df['duration'].apply(
+        lambda x: f"{int(x // 3600):02d}:{int((x % 3600) // 60):02d}:{int(x % 60):02d}"
+    )
+    return df
+
+
+def synthetic_raw_activities(nb_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2016-01-01").value
+    end = pd.Timestamp("2026-01-01").value
+    data = {
+        "startTimeLocal": pd.to_datetime(rng.integers(start, end, nb_rows)).strftime("%Y-%m-%d %H:%M:%S"),
+        "duration": rng.uniform(600, 20000, nb_rows),
+    }
+    for col in NUMERIC_COLUMNS:
+        values = np.round(rng.uniform(0, 5000, nb_rows), 2).astype(object)
+        # Like Garmin CSV exports: a few decimal commas and '--' placeholders
+        as_comma = rng.random(nb_rows) < 0.05
+        values[as_comma] = [f"{v}".replace('.', ',') for v in values[as_comma]]
+        values[rng.random(nb_rows) < 0.05] = '--'
+        data[col] = values
+    return pd.DataFrame(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark string round-trip vs typed load_and_clean_data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    for nb_rows in args.rows:
+        df = synthetic_raw_activities(nb_rows)
+
+        start = time.perf_counter()
+        expected = load_and_clean_data_strings(df.copy())
+        strings = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = load_and_clean_data(df.copy())
+        typed = time.perf_counter() - start
+
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        print(f"{nb_rows:>7} rows: string round-trip {strings:8.3f}s | typed {typed:8.4f}s | x{strings / typed:.0f}")
+
+
+if __name__ == "__main__":
+    main()
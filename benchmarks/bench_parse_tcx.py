@@ -0,0 +1,240 @@
+"""
+Time the TCX trackpoint parser and measure its peak memory on synthetic files.
+
+Files of 5k, 50k and 200k trackpoints (laps every 1000 points, a few points
+without position, heart rate or speed) are parsed by the streaming parser and
+by the former one, which loaded the whole tree and formatted paces row by row.
+Both must return the same DataFrame. Each parse runs in a fresh process, which
+reports the time taken and how much parsing raised its peak resident memory.
+
+Usage:
+    python benchmarks/bench_parse_tcx.py --points 5000 50000 200000
+"""
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions.parse_tcx_csv import parse_tcx_to_dataframe
+
+POINTS_PER_LAP = 1000
+
+
+def former_parse_tcx_to_dataframe(tcx_file_path):
+    """The former parser: whole tree in memory, find() per field, row-wise pace formatting."""
+    tree = ET.parse(tcx_file_path)
+    root = tree.getroot()
+
+    ns = {
+        'ns': 'http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2',
+        'ns3': 'http://www.garmin.com/xmlschemas/ActivityExtension/v2'
+    }
+
+    # Liste pour stocker les données de chaque Trackpoint
+    times = []
+    latitudes = []
+    longitudes = []
+    altitudes = []
+    distances = []
+    heart_rates = []
+    speeds = []
+    cadences = []
+    watts = []
+
+    # Liste pour stocker les données des Laps (splits)
+    laps = []
+
+    # Récupérer les Laps (splits)
+    for lap in root.findall('.//ns:Lap', ns):
+        lap_data = {}
+
+        # Récupérer StartTime
+        start_time_elem = lap.find('ns:StartTime', ns)
+        lap_data['StartTime'] = start_time_elem.text if start_time_elem is not None else None
+
+        # Récupérer TotalTimeSeconds
+        total_time_elem = lap.find('ns:TotalTimeSeconds', ns)
+        lap_data['TotalTimeSeconds'] = float(total_time_elem.text) if total_time_elem is not None else np.nan
+
+        # Récupérer DistanceMeters
+        distance_elem = lap.find('ns:DistanceMeters', ns)
+        lap_data['DistanceMeters'] = float(distance_elem.text) if distance_elem is not None else np.nan
+
+        # Récupérer AverageHeartRateBpm
+        avg_hr_elem = lap.find('.//ns:AverageHeartRateBpm/ns:Value', ns)
+        lap_data['AvgHeartRate'] = int(avg_hr_elem.text) if avg_hr_elem is not None else np.nan
+
+        # Récupérer MaximumHeartRateBpm
+        max_hr_elem = lap.find('.//ns:MaximumHeartRateBpm/ns:Value', ns)
+        lap_data['MaxHeartRate'] = int(max_hr_elem.text) if max_hr_elem is not None else np.nan
+
+        laps.append(lap_data)
+
+    # Récupérer les Trackpoints
+    for trackpoint in root.findall('.//ns:Trackpoint', ns):
+        # Récupérer Time
+        time_elem = trackpoint.find('ns:Time', ns)
+        times.append(time_elem.text if time_elem is not None else None)
+
+        # Récupérer Position (Latitude et Longitude)
+        position_elem = trackpoint.find('ns:Position', ns)
+        if position_elem is not None:
+            lat_elem = position_elem.find('ns:LatitudeDegrees', ns)
+            lon_elem = position_elem.find('ns:LongitudeDegrees', ns)
+            latitudes.append(float(lat_elem.text) if lat_elem is not None else np.nan)
+            longitudes.append(float(lon_elem.text) if lon_elem is not None else np.nan)
+        else:
+            latitudes.append(np.nan)
+            longitudes.append(np.nan)
+
+        # Récupérer AltitudeMeters
+        altitude_elem = trackpoint.find('ns:AltitudeMeters', ns)
+        altitudes.append(float(altitude_elem.text) if altitude_elem is not None else np.nan)
+
+        # Récupérer DistanceMeters
+        distance_elem = trackpoint.find('ns:DistanceMeters', ns)
+        distances.append(float(distance_elem.text) if distance_elem is not None else np.nan)
+
+        # Récupérer HeartRateBpm
+        heart_rate_elem = trackpoint.find('.//ns:HeartRateBpm/ns:Value', ns)
+        heart_rates.append(int(heart_rate_elem.text) if heart_rate_elem is not None else np.nan)
+
+        # Récupérer les Extensions (Speed, Cadence, Watts)
+        extensions_elem = trackpoint.find('.//ns3:TPX', ns)
+        if extensions_elem is not None:
+            speed_elem = extensions_elem.find('ns3:Speed', ns)
+            speeds.append(float(speed_elem.text) if speed_elem is not None else np.nan)
+
+            cadence_elem = extensions_elem.find('ns3:RunCadence', ns)
+            cadences.append(int(cadence_elem.text) if cadence_elem is not None else np.nan)
+
+            watt_elem = extensions_elem.find('ns3:Watts', ns)
+            watts.append(int(watt_elem.text) if watt_elem is not None else np.nan)
+        else:
+            speeds.append(np.nan)
+            cadences.append(np.nan)
+            watts.append(np.nan)
+
+    # Créer un DataFrame pour les Trackpoints
+    df = pd.DataFrame({
+        'Time': times,
+        'Latitude': latitudes,
+        'Longitude': longitudes,
+        'Altitude': altitudes,
+        'Distance': distances,
+        'HeartRate': heart_rates,
+        'Speed': speeds,
+        'Cadence': cadences,
+        'Watts': watts
+    })
+
+    # Convertir le temps en datetime
+    df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
+
+    # Remplacer les vitesses nulles par NaN
+    df.loc[df['Speed'] == 0, 'Speed'] = np.nan
+    df['Pace'] = pd.to_timedelta(
+        1000 / df['Speed'],
+        unit='s',
+        errors='coerce'  # This will set invalid values (e.g., division by zero) to NaT
+    ) 
+
+    df['Pace_seconds'] = df['Pace'].dt.total_seconds()
+    # Create a new column for formatted Pace (mm:ss or "No Data")
+    df['Pace_formatted'] = df['Pace'].apply(
+        lambda x: f"{int(x.total_seconds() // 60):02d}:{int(x.total_seconds() % 60):02d}"
+                if pd.notna(x) else "No Data"
+    )
+    return df
+
+
+def write_tcx(path, nb_points, seed=0):
+    """Synthetic ride of `nb_points` one-second trackpoints."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-06-01T08:00:00Z")
+    speeds = np.round(rng.uniform(0, 12, nb_points), 3)
+    speeds[rng.random(nb_points) < 0.01] = 0
+    distances = np.round(np.cumsum(speeds), 2)
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2" '
+                'xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2">\n'
+                '<Activities><Activity Sport="Biking"><Id>2024-06-01T08:00:00.000Z</Id>\n')
+        for lap_start in range(0, nb_points, POINTS_PER_LAP):
+            lap_end = min(lap_start + POINTS_PER_LAP, nb_points)
+            f.write(f'<Lap StartTime="{(start + pd.Timedelta(seconds=lap_start)).strftime("%Y-%m-%dT%H:%M:%S.000Z")}">'
+                    f'<TotalTimeSeconds>{lap_end - lap_start}.0</TotalTimeSeconds>'
+                    f'<DistanceMeters>{distances[lap_end - 1] - (distances[lap_start - 1] if lap_start else 0):.2f}</DistanceMeters>'
+                    '<AverageHeartRateBpm><Value>140</Value></AverageHeartRateBpm>'
+                    '<MaximumHeartRateBpm><Value>170</Value></MaximumHeartRateBpm>'
+                    '<Intensity>Active</Intensity><TriggerMethod>Manual</TriggerMethod><Track>\n')
+            for i in range(lap_start, lap_end):
+                time_text = (start + pd.Timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+                position = "" if i % 500 == 7 else (
+                    f"<Position><LatitudeDegrees>{45.5 + i * 1e-5:.7f}</LatitudeDegrees>"
+                    f"<LongitudeDegrees>{-73.6 + i * 1e-5:.7f}</LongitudeDegrees></Position>"
+                )
+                heart_rate = "" if i % 700 == 3 else f"<HeartRateBpm><Value>{120 + i % 50}</Value></HeartRateBpm>"
+                extensions = "" if i % 900 == 5 else (
+                    f"<Extensions><ns3:TPX><ns3:Speed>{speeds[i]}</ns3:Speed>"
+                    f"<ns3:RunCadence>{80 + i % 15}</ns3:RunCadence><ns3:Watts>{150 + i % 120}</ns3:Watts></ns3:TPX></Extensions>"
+                )
+                f.write(f"<Trackpoint><Time>{time_text}</Time>{position}"
+                        f"<AltitudeMeters>{100 + (i % 300) * 0.2:.1f}</AltitudeMeters>"
+                        f"<DistanceMeters>{distances[i]}</DistanceMeters>{heart_rate}{extensions}</Trackpoint>\n")
+            f.write('</Track></Lap>\n')
+        f.write('</Activity></Activities></TrainingCenterDatabase>\n')
+
+
+def run_parser(name, path):
+    """Parse `path` with the named parser, returning the DataFrame, the seconds taken and the peak memory growth in bytes."""
+    parse = PARSERS[name]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    df = parse(path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return df, elapsed, (peak - baseline) * 1024  # ru_maxrss is in KiB on Linux
+
+
+def measure(name, path):
+    """run_parser in a fresh process, so peak memory is the parser's own."""
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_parser, name, path).result()
+
+
+PARSERS = {
+    "former": former_parse_tcx_to_dataframe,
+    "streaming": parse_tcx_to_dataframe,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the TCX trackpoint parser")
+    parser.add_argument("--points", type=int, nargs="+", default=[5000, 50000, 200000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for nb_points in args.points:
+            path = os.path.join(tmp_dir, f"activity_{nb_points}.tcx")
+            write_tcx(path, nb_points)
+            size_mb = os.path.getsize(path) / 1e6
+            expected, former, former_peak = measure("former", path)
+            result, elapsed, peak = measure("streaming", path)
+            pd.testing.assert_frame_equal(result, expected)
+            print(f"{nb_points:>7} points ({size_mb:5.1f} MB) | former {former:6.2f} s {former_peak / 1e6:7.1f} MB peak"
+                  f" | streaming {elapsed:6.2f} s {peak / 1e6:7.1f} MB peak  x{former / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
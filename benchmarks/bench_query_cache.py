@@ -0,0 +1,104 @@
+"""
+Time tab renders with and without the query result cache, and check that an
+ingest invalidates it.
+
+Sessions walk through the Running, Cycling and Swimming tabs and the Race
+Training tab (see bench_query_registry). The first session fills the cache and
+the following ones are served from memory. A new activity is then ingested like
+`save_processed_data` does; the next render must see it.
+
+Usage:
+    python benchmarks/bench_query_cache.py --activities 5000 --sessions 20
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sql_queries as sql
+from db_schema import bump_data_version, get_data_version
+from query_cache import QueryCache
+from rollups import refresh_rollups
+from preprocess_activities import upsert_activities
+from bench_sql_queries import build_database
+from bench_query_registry import session_queries
+
+
+def render_sessions(conn, queries, sessions, cache):
+    start = time.perf_counter()
+    for _ in range(sessions):
+        results = [sql.read_query(conn, query, cache=cache) for query in queries]
+    return results, (time.perf_counter() - start) / sessions
+
+
+def ingest_activity(conn):
+    """Upsert one running activity in the current week, as an ingest would."""
+    now = pd.Timestamp.now().floor("s")
+    week_start = (now.normalize() - pd.Timedelta(days=now.dayofweek)).strftime("%Y-%m-%d")
+    activity = pd.DataFrame({
+        "activityId": [conn.execute("SELECT max(activityId) + 1 FROM activities").fetchone()[0]],
+        "activityType": ["synthetic"],
+        "activityTypeGrouped": ["running"],
+        "startTimeLocal": [now.strftime("%Y-%m-%d %H:%M:%S")],
+        "Day": [now.strftime("%Y-%m-%d")],
+        "Week": [week_start],
+        "week_start": [week_start],
+        "month_start": [now.strftime("%Y-%m-01")],
+        "duration": [3600.0],
+        "distance": [10.0],
+        "averageHR": [150.0],
+    })
+    upsert_activities(conn, activity)
+    refresh_rollups(conn, {week_start}, {now.strftime("%Y-%m-01")})
+    bump_data_version(conn)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the query result cache across tab renders")
+    parser.add_argument("--activities", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=20)
+    args = parser.parse_args()
+
+    queries = session_queries()
+    cache = QueryCache()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "activities.db")
+        build_database(db_path, args.activities).close()
+        conn = sqlite3.connect(db_path, cached_statements=sql.STATEMENT_CACHE_SIZE)
+
+        expected, uncached = render_sessions(conn, queries, args.sessions, None)
+        results, first = render_sessions(conn, queries, 1, cache)
+        results, cached = render_sessions(conn, queries, args.sessions, cache)
+        for result, reference in zip(results, expected):
+            pd.testing.assert_frame_equal(result, reference)
+        print(f"{args.sessions} sessions of {len(queries)} queries on {args.activities} activities")
+        print(f"{'no cache':<22} {uncached * 1000:8.1f} ms/session")
+        print(f"{'first render':<22} {first * 1000:8.1f} ms/session")
+        print(f"{'cached renders':<22} {cached * 1000:8.1f} ms/session  x{uncached / cached:.1f}  {dict(cache.stats)}")
+
+        # A caller modifying its result must not alter the cached one
+        results[0][results[0].columns[0]] = "modified"
+        pd.testing.assert_frame_equal(sql.read_query(conn, queries[0], cache=cache), expected[0])
+
+        version = get_data_version(conn)
+        ingest_activity(conn)
+        assert get_data_version(conn) == version + 1
+        volume = sql.get_volume_metrics_query("running")
+        before = sql.read_query(conn, volume, cache=None)
+        after = sql.read_query(conn, volume, cache=cache)
+        pd.testing.assert_frame_equal(after, before)
+        recent = sql.read_query(conn, sql.get_recent_activities_query("running", "8_weeks"), cache=cache)
+        assert recent["distance"].iloc[0] == 10.0, "ingested activity missing from the cached render"
+        print(f"{'after ingest':<22} data version {version} -> {version + 1}, new activity visible")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measure what bound parameters save on parsing and planning across tab renders.
+
+A session of renders goes through the Running, Cycling and Swimming tabs for
+each time range, then the Race Training tab for each race. The same queries are
+run three ways on a synthetic database:
+    - values pasted in the SQL text, no statement cache (parse/plan every call)
+    - values pasted in the SQL text, with sqlite3's per-connection statement cache
+      (each new value is a new statement)
+    - bound parameters with the statement cache (one statement per query shape)
+
+Usage:
+    python benchmarks/bench_query_registry.py --activities 5000 --sessions 20
+"""
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sql_queries as sql
+from preprocess_activities import TRAINING_RACE_PERIODS
+from bench_sql_queries import build_database
+
+SPORTS = ["running", "cycling", "swimming"]
+TIMERANGES = ["8_weeks", "6_months", "ytd"]
+
+
+def session_queries():
+    """Queries issued by one walk through the sport tabs and the race tab."""
+    queries = []
+    for sport in SPORTS:
+        for timerange in TIMERANGES:
+            queries.append(sql.get_volume_metrics_query(sport))
+            queries.append(sql.get_weekly_sport_query(sport, timerange))
+            queries.append(sql.get_recent_activities_query(sport, timerange))
+    for race in TRAINING_RACE_PERIODS:
+        queries.append(sql.get_race_metrics_query(race["start"], race["end"]))
+        for sport in SPORTS:
+            queries.append(sql.get_race_distance_by_timerange_query(race["start"], race["end"], "week", sport))
+        queries.append(sql.get_activity_duration_by_granularity_query(race["start"], race["end"], "week"))
+    return queries
+
+
+def inline(query):
+    """The query with its values pasted in the text, like the former f-string SQL."""
+    def literal(match):
+        value = query.params[match.group(1)]
+        return str(value) if isinstance(value, (int, float)) else "'" + str(value).replace("'", "''") + "'"
+    if not query.params:
+        return sql.Query(query.sql, {}, query.dtype)
+    pattern = r":(" + "|".join(map(re.escape, query.params)) + r")\b"
+    return sql.Query(re.sub(pattern, literal, query.sql), {}, query.dtype)
+
+
+def run_sessions(db_path, queries, sessions, cached_statements):
+    conn = sqlite3.connect(db_path, cached_statements=cached_statements)
+    start = time.perf_counter()
+    for _ in range(sessions):
+        for query in queries:
+            conn.execute(query.sql, query.params).fetchall()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bound parameters and statement caching across tab renders")
+    parser.add_argument("--activities", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=20)
+    args = parser.parse_args()
+
+    queries = session_queries()
+    inlined = [inline(query) for query in queries]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "activities.db")
+        build_database(db_path, args.activities).close()
+
+        runs = [
+            ("inlined values, no statement cache", inlined, 0),
+            ("inlined values, statement cache", inlined, sql.STATEMENT_CACHE_SIZE),
+            ("bound parameters, statement cache", queries, sql.STATEMENT_CACHE_SIZE),
+        ]
+        print(f"{args.sessions} sessions of {len(queries)} queries on {args.activities} activities")
+        baseline = None
+        for name, run_queries, cache_size in runs:
+            elapsed = run_sessions(db_path, run_queries, args.sessions, cache_size)
+            baseline = baseline or elapsed
+            statements = len({query.sql for query in run_queries})
+            print(f"{name:<36} {statements:>3} distinct statements  {elapsed * 1000 / args.sessions:8.1f} ms/session  x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
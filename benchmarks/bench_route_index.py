@@ -0,0 +1,120 @@
+"""
+Time map framing and location searches from the route table against reading the GPX files.
+
+A synthetic database gets GPX tracks for some of its activities, scattered
+around Montreal, laid out like the downloads (data/raw/<YYYY-MM>/<id>/<id>.gpx).
+The routes are indexed like an ingest does, then:
+    - framing: the former display path (parse the GPX, list every point, take
+      the middle one and the bounds) against one route table lookup
+    - search: activities whose route comes near a location, from the route
+      table against parsing every GPX file
+Index bounds and centroids must match the ones computed from the XML (within
+float32 rounding of the trackpoint cache), and both searches the same activities.
+
+Usage:
+    python benchmarks/bench_route_index.py --activities 5000 --routes 200 --points 3000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sql_queries as sql
+from routes import activity_gpx_path, index_activity_routes
+from bench_sql_queries import build_database
+from bench_trackpoint_cache import write_gpx
+
+GPX_NAMESPACE = {'default': 'http://www.topografix.com/GPX/1/1'}
+SEARCH = (45.5, -73.6, 10.0)  # latitude, longitude, radius in km
+FLOAT32_ATOL = 1e-5  # degrees, about a metre
+
+
+def former_track_points(gpx_file_path):
+    """Track points as display_gpx_map listed them before the trackpoint cache."""
+    root = ET.parse(gpx_file_path).getroot()
+    track_points = []
+    for trk in root.findall('default:trk', GPX_NAMESPACE):
+        for trkseg in trk.findall('default:trkseg', GPX_NAMESPACE):
+            for trkpt in trkseg.findall('default:trkpt', GPX_NAMESPACE):
+                track_points.append((float(trkpt.attrib['lat']), float(trkpt.attrib['lon'])))
+    return track_points
+
+
+def former_framing(gpx_file_path):
+    track_points = former_track_points(gpx_file_path)
+    latitudes = [lat for lat, _ in track_points]
+    longitudes = [lon for _, lon in track_points]
+    return {
+        "min_lat": min(latitudes), "min_lon": min(longitudes), "max_lat": max(latitudes), "max_lon": max(longitudes),
+        "centroid_lat": np.mean(latitudes), "centroid_lon": np.mean(longitudes), "nb_points": len(track_points),
+    }
+
+
+def write_routes(conn, raw_dir, nb_routes, nb_points, seed=0):
+    """GPX tracks for `nb_routes` random activities, starting within ~40 km of Montreal."""
+    rng = np.random.default_rng(seed)
+    activities = conn.execute(
+        "SELECT activityId, strftime('%Y-%m', startTimeLocal) FROM activities ORDER BY random() LIMIT ?", (nb_routes,)
+    ).fetchall()
+    for i, (activity_id, month) in enumerate(activities):
+        path = activity_gpx_path(activity_id, month, raw_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        origin = (45.5 + rng.uniform(-0.35, 0.35), -73.6 + rng.uniform(-0.5, 0.5))
+        write_gpx(path, nb_points, seed=i, origin=origin)
+    return activities
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the route table against reading GPX files")
+    parser.add_argument("--activities", type=int, default=5000)
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--points", type=int, default=3000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = build_database(os.path.join(tmp_dir, "activities.db"), args.activities)
+        raw_dir = os.path.join(tmp_dir, "raw")
+        activities = write_routes(conn, raw_dir, args.routes, args.points)
+        nb_routes, elapsed = timed(index_activity_routes, conn, activities, raw_dir)
+        conn.commit()
+        assert nb_routes == len(activities)
+        print(f"{nb_routes} routes of {args.points} points indexed in {elapsed:.2f} s (trackpoint caches built)")
+
+        former_time = index_time = 0.0
+        expected_near = set()
+        lat, lon, radius_km = SEARCH
+        near = sql.get_activities_near_query(lat, lon, radius_km).params
+        for activity_id, month in activities:
+            expected, elapsed = timed(former_framing, activity_gpx_path(activity_id, month, raw_dir))
+            former_time += elapsed
+            route, elapsed = timed(sql.read_query, conn, sql.get_activity_route_query(activity_id), None)
+            index_time += elapsed
+            for name, value in expected.items():
+                assert abs(route.iloc[0][name] - value) <= (0 if name == "nb_points" else FLOAT32_ATOL), (activity_id, name)
+            if (expected["min_lat"] <= near["max_lat"] and expected["max_lat"] >= near["min_lat"]
+                    and expected["min_lon"] <= near["max_lon"] and expected["max_lon"] >= near["min_lon"]):
+                expected_near.add(activity_id)
+        print(f"framing   former {former_time * 1000 / nb_routes:8.2f} ms/map | route table {index_time * 1000 / nb_routes:6.3f} ms/map"
+              f"  x{former_time / index_time:.0f}")
+
+        result, elapsed = timed(sql.read_query, conn, sql.get_activities_near_query(lat, lon, radius_km), None)
+        assert set(result["activityId"]) == expected_near
+        print(f"search    {len(expected_near)} activities within {radius_km} km | parsing every GPX {former_time * 1000:8.1f} ms"
+              f" | route table {elapsed * 1000:6.2f} ms  x{former_time / elapsed:.0f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
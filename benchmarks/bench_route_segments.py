@@ -0,0 +1,117 @@
+"""
+Time "activities through this area" searches on the route segment R*-tree.
+
+Thousands of synthetic rides (one point per second, 30 min to 4 h) start
+around Montreal and are indexed like an ingest does (`routes.save_route`).
+Random park-sized boxes and radii are searched through the R*-tree and
+through a scan of every trackpoint, which is what answering the question
+without an index takes even with the tracks already in memory. The R*-tree
+must find every activity the scan finds; the extra ones it returns (piece
+boxes touching the area without the track entering it) are reported, next to
+the ones the route bounding box table (user-023) would return.
+
+Usage:
+    python benchmarks/bench_route_segments.py --routes 5000 --searches 200
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sql_queries as sql
+from db_schema import migrate
+from routes import METERS_PER_DEGREE, save_route
+
+AREA_SIZES_M = [200, 500, 2000]  # box sides and radius diameters
+
+
+def synthetic_rides(nb_routes, seed=0):
+    rng = np.random.default_rng(seed)
+    for activity_id in range(1, nb_routes + 1):
+        n = int(rng.integers(1800, 4 * 3600))
+        heading = rng.uniform(0, 2 * np.pi) + np.cumsum(rng.normal(0, 0.03, n))
+        step = rng.uniform(2, 9) + rng.normal(0, 0.5, n)  # metres per second
+        origin = (45.5 + rng.uniform(-0.2, 0.2), -73.6 + rng.uniform(-0.3, 0.3))
+        latitudes = origin[0] + np.cumsum(np.cos(heading) * step) / METERS_PER_DEGREE
+        longitudes = origin[1] + np.cumsum(np.sin(heading) * step) / (METERS_PER_DEGREE * np.cos(np.radians(origin[0])))
+        yield activity_id, latitudes, longitudes
+
+
+def build_index(path, nb_routes):
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    tracks = {}
+    start = time.perf_counter()
+    for activity_id, latitudes, longitudes in synthetic_rides(nb_routes):
+        conn.execute(
+            "INSERT INTO activities (activityId, activityType, startTimeLocal) VALUES (?, 'synthetic', ?)",
+            (activity_id, f"2024-01-01 {activity_id % 24:02d}:00:00")
+        )
+        save_route(conn, activity_id, latitudes, longitudes)
+        tracks[activity_id] = (latitudes, longitudes)
+    conn.commit()
+    return conn, tracks, time.perf_counter() - start
+
+
+def scan(tracks, inside):
+    return {activity_id for activity_id, (latitudes, longitudes) in tracks.items() if inside(latitudes, longitudes).any()}
+
+
+def searches(nb_searches, seed=1):
+    rng = np.random.default_rng(seed)
+    for i in range(nb_searches):
+        size_m = AREA_SIZES_M[i % len(AREA_SIZES_M)]
+        yield "bbox" if i % 2 else "radius", size_m, 45.5 + rng.uniform(-0.2, 0.2), -73.6 + rng.uniform(-0.3, 0.3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the route segment R*-tree")
+    parser.add_argument("--routes", type=int, default=5000)
+    parser.add_argument("--searches", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn, tracks, elapsed = build_index(os.path.join(tmp_dir, "activities.db"), args.routes)
+        nb_points = sum(len(latitudes) for latitudes, _ in tracks.values())
+        nb_segments = conn.execute("SELECT count(*) FROM route_segments").fetchone()[0]
+        print(f"{args.routes} routes, {nb_points / 1e6:.1f} M points -> {nb_segments} segments, indexed in {elapsed:.1f} s")
+
+        times = {"rtree": 0.0, "scan": 0.0}
+        found = extra = bbox_extra = 0
+        for kind, size_m, lat, lon in searches(args.searches):
+            lat_delta = size_m / 2 / METERS_PER_DEGREE
+            lon_delta = lat_delta / np.cos(np.radians(lat))
+            if kind == "bbox":
+                query = sql.get_activities_through_bbox_query(lat - lat_delta, lon - lon_delta, lat + lat_delta, lon + lon_delta)
+                inside = lambda la, lo: (np.abs(la - lat) <= lat_delta) & (np.abs(lo - lon) <= lon_delta)
+            else:
+                query = sql.get_activities_through_radius_query(lat, lon, size_m / 2000)
+                inside = lambda la, lo: np.hypot(la - lat, (lo - lon) * np.cos(np.radians(lat))) <= lat_delta
+            start = time.perf_counter()
+            result = set(sql.read_query(conn, query, cache=None)["activityId"])
+            times["rtree"] += time.perf_counter() - start
+            start = time.perf_counter()
+            expected = scan(tracks, inside)
+            times["scan"] += time.perf_counter() - start
+            missing = expected - result
+            assert not missing, f"{kind} {size_m} m at ({lat:.5f}, {lon:.5f}) misses {sorted(missing)}"
+            found += len(expected)
+            extra += len(result - expected)
+            route_boxes = sql.read_query(conn, sql.get_activities_in_bbox_query(lat - lat_delta, lon - lon_delta, lat + lat_delta, lon + lon_delta), cache=None)
+            bbox_extra += len(set(route_boxes["activityId"]) - expected)
+
+        print(f"{args.searches} searches ({', '.join(map(str, AREA_SIZES_M))} m areas), {found} matches in total")
+        print(f"  R*-tree     {times['rtree'] * 1000 / args.searches:8.2f} ms/search  {extra:>6} extra activities")
+        print(f"  point scan  {times['scan'] * 1000 / args.searches:8.2f} ms/search  x{times['scan'] / times['rtree']:.0f}")
+        print(f"  route boxes (activity_routes) would add {bbox_extra} extra activities")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
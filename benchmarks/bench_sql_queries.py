@@ -0,0 +1,220 @@
+"""
+Check and time the dashboard queries on a synthetic activities database
+(with its weekly and monthly rollups built).
+
+For every query rewritten on week_start / month_start and plain startTimeLocal
+ranges, EXPLAIN QUERY PLAN must show the activities table searched through an
+index (no full scan). The former function-wrapped versions are timed against
+the current ones, and both must return the same rows.
+
+Usage:
+    python benchmarks/bench_sql_queries.py --activities 100000
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sql_queries as sql
+from db_schema import migrate
+from rollups import ROLLUP_TABLES, ROLLUP_MEASURES, get_activity_periods, refresh_rollups
+
+SPORTS = ["running", "cycling", "swimming", "hiking", "physical_reinforcement", "gym_fitness"]
+RACE_START, RACE_END = "2023-01-06", "2024-06-21"
+
+
+def legacy_weekly_sport_query(sport_type):
+    return sql.Query(f"""
+        WITH RECURSIVE date_series AS (
+            SELECT (SELECT date(min(Week), "weekday 1") FROM activities) AS Week
+            UNION ALL
+            SELECT date(Week, '+7 days')
+            FROM date_series
+            WHERE date(Week, '+7 days') < (SELECT date(max(Week), "weekday 1") FROM activities)
+        )
+        SELECT
+            ds.Week,
+            COALESCE(SUM(a.distance), 0) AS total_distance
+        FROM date_series ds
+        LEFT JOIN activities a
+            ON strftime('%Y-%m-%d', ds.Week)
+               = strftime('%Y-%m-%d', date(a.Week, 'weekday 1'))
+            AND a.activityTypeGrouped = '{sport_type}'
+        GROUP BY ds.Week
+        ORDER BY ds.Week;
+    """, {}, {"total_distance": "float64"})
+
+
+def legacy_race_distance_week_query(start_date, end_date, sport_type):
+    return sql.Query(f"""
+        WITH RECURSIVE date_series AS (
+            SELECT date('{start_date}', 'weekday 0', '-6 days') AS week_start
+            UNION ALL
+            SELECT date(week_start, '+7 days')
+            FROM date_series
+            WHERE date(week_start, '+7 days') <= date('{end_date}')
+        )
+        SELECT
+            ds.week_start AS time_period,
+            COALESCE(SUM(a.distance), 0) AS total_distance
+        FROM date_series ds
+        LEFT JOIN activities a ON date(a.startTimeLocal, 'weekday 0', '-6 days') = ds.week_start
+                              AND date(a.startTimeLocal) BETWEEN '{start_date}' AND '{end_date}'
+                              AND a.activityTypeGrouped = '{sport_type}'
+        GROUP BY ds.week_start
+        ORDER BY ds.week_start;
+    """, {}, {"total_distance": "float64"})
+
+
+def legacy_activity_duration_query(start_date, end_date):
+    return sql.Query(f"""
+    SELECT
+        date(startTimeLocal, 'weekday 0', '-6 days') AS TimePeriod,
+        activityTypeGrouped,
+        SUM(duration) AS Duration
+    FROM activities
+    WHERE date(startTimeLocal) BETWEEN '{start_date}' AND '{end_date}'
+    GROUP BY TimePeriod, activityTypeGrouped
+    ORDER BY TimePeriod
+    """, {}, {"Duration": "float64"})
+
+
+# name -> (current query, former query or None)
+QUERIES = {
+    "weekly_sport(all)": (sql.get_weekly_sport_query("running", "all"), legacy_weekly_sport_query("running")),
+    "weekly_sport(duration, 6_months)": (sql.get_weekly_sport_query("duration", "6_months"), None),
+    "biking_distance(all)": (sql.get_biking_distance_by_timerange_query("all"), None),
+    "recent_activities(all)": (sql.get_recent_activities_query("running", "all"), None),
+    "race_distance(week)": (
+        sql.get_race_distance_by_timerange_query(RACE_START, RACE_END, "week", "cycling"),
+        legacy_race_distance_week_query(RACE_START, RACE_END, "cycling"),
+    ),
+    "race_distance(month)": (sql.get_race_distance_by_timerange_query(RACE_START, RACE_END, "month", "cycling"), None),
+    "activity_duration(week)": (
+        sql.get_activity_duration_by_granularity_query(RACE_START, RACE_END, "week"),
+        legacy_activity_duration_query(RACE_START, RACE_END),
+    ),
+    "race_metrics": (sql.get_race_metrics_query(RACE_START, RACE_END), None),
+    "volume_metrics": (sql.get_volume_metrics_query("running"), None),
+}
+
+
+def build_database(path, nb_activities, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2016-01-01").value
+    end = pd.Timestamp.now().value
+    start_times = pd.to_datetime(np.sort(rng.integers(start, end, nb_activities))).floor("s")
+    df = pd.DataFrame({
+        "activityId": np.arange(nb_activities),
+        "activityType": "synthetic",
+        "activityTypeGrouped": rng.choice(SPORTS, nb_activities),
+        "startTimeLocal": start_times.strftime("%Y-%m-%d %H:%M:%S"),
+        "Day": start_times.strftime("%Y-%m-%d"),
+        "Week": (start_times.normalize() - pd.to_timedelta(start_times.dayofweek, unit="D")).strftime("%Y-%m-%d"),
+        "Month": start_times.strftime("%Y-%m-01 00:00:00"),
+        "week_start": (start_times.normalize() - pd.to_timedelta(start_times.dayofweek, unit="D")).strftime("%Y-%m-%d"),
+        "month_start": start_times.strftime("%Y-%m-01"),
+        "duration": rng.uniform(600, 14400, nb_activities),
+        "distance": rng.uniform(1, 120, nb_activities),
+        "averageHR": rng.uniform(100, 170, nb_activities),
+        "calories": rng.uniform(100, 2000, nb_activities),
+        "elevationGain": rng.uniform(0, 1500, nb_activities),
+    })
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    df.to_sql("activities", conn, if_exists="append", index=False)
+    refresh_rollups(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+def full_scans(conn, query):
+    """Plan steps that scan the activities table without an index."""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query.sql}", query.params).fetchall()
+    details = [row[-1] for row in plan]
+    return [d for d in details if d.startswith("SCAN") and d.split()[1] in ("activities", "a", "act") and "INDEX" not in d]
+
+
+def check_rollups(conn):
+    """Rollup tables must match an aggregation of activities from scratch."""
+    for table, period in ROLLUP_TABLES.items():
+        aggregates = ", ".join(f"{aggregate} AS {name}" for name, (_, aggregate) in ROLLUP_MEASURES.items())
+        expected = pd.read_sql(f"""
+            SELECT {period}, activityTypeGrouped, {aggregates} FROM activities
+            GROUP BY {period}, activityTypeGrouped ORDER BY {period}, activityTypeGrouped
+        """, conn)
+        result = pd.read_sql(f"SELECT * FROM {table} ORDER BY {period}, activityTypeGrouped", conn)
+        pd.testing.assert_frame_equal(result, expected)
+
+
+def time_incremental_refresh(conn, nb_changes, seed=1):
+    """Move and retype some activities like a correcting ingest, then refresh their periods."""
+    rng = np.random.default_rng(seed)
+    ids = [int(i) for i in rng.choice(conn.execute("SELECT max(activityId) FROM activities").fetchone()[0], nb_changes, replace=False)]
+    start = time.perf_counter()
+    weeks, months = get_activity_periods(conn, ids)
+    conn.executemany(
+        """
+        UPDATE activities SET
+            startTimeLocal = datetime(startTimeLocal, '+9 days'),
+            week_start = date(startTimeLocal, '+9 days', 'weekday 0', '-6 days'),
+            month_start = date(startTimeLocal, '+9 days', 'start of month'),
+            activityTypeGrouped = ?
+        WHERE activityId = ?
+        """,
+        [(str(rng.choice(SPORTS)), activity_id) for activity_id in ids]
+    )
+    new_weeks, new_months = get_activity_periods(conn, ids)
+    refresh_rollups(conn, weeks | new_weeks, months | new_months)
+    conn.commit()
+    return time.perf_counter() - start
+
+
+def timed(conn, query, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = sql.read_query(conn, query, cache=None)
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check index use and time the dashboard queries")
+    parser.add_argument("--activities", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = build_database(os.path.join(tmp_dir, "activities.db"), args.activities)
+        print(f"{args.activities} synthetic activities")
+        failures = []
+        for name, (query, legacy_query) in QUERIES.items():
+            scans = full_scans(conn, query)
+            if scans:
+                failures.append(f"{name}: {scans}")
+            result, elapsed = timed(conn, query, args.repeat)
+            line = f"{name:<34} {elapsed * 1000:9.1f} ms  {'full scan' if scans else 'index'}"
+            if legacy_query is not None:
+                # Run once: the former versions take seconds on large databases
+                expected, legacy_elapsed = timed(conn, legacy_query, 1)
+                pd.testing.assert_frame_equal(result, expected)
+                line += f" | former {legacy_elapsed * 1000:9.1f} ms  x{legacy_elapsed / elapsed:.0f}"
+            print(line)
+        check_rollups(conn)
+        elapsed = time_incremental_refresh(conn, 200)
+        check_rollups(conn)
+        print(f"{'incremental rollup refresh (200)':<34} {elapsed * 1000:9.1f} ms  rollups match activities")
+        conn.close()
+    if failures:
+        sys.exit("Queries scanning activities without an index:\n  " + "\n  ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
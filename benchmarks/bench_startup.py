@@ -0,0 +1,96 @@
+"""
+Measure dashboard import times with `python -X importtime`, in fresh interpreters.
+
+`app` is what every script run imports before its first render; each tab module
+is what selecting that tab adds on its first run. For every module the total
+cumulative import time (median of --repeat runs) and its heaviest imports are
+reported. With --budget-ms, the script fails when importing `app` takes longer,
+so startup regressions show up.
+
+Usage:
+    python benchmarks/bench_startup.py --repeat 5 --top 10
+    python benchmarks/bench_startup.py --modules app tabs.tab_running --budget-ms 1500
+"""
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app first, then the tab modules it imports on demand (app.TAB_MODULES)
+DEFAULT_MODULES = [
+    "app",
+    "tabs.tab_stats",
+    "tabs.tab_overview",
+    "tabs.tab_running",
+    "tabs.tab_swimming",
+    "tabs.tab_cycling",
+    "tabs.tab_race",
+    "tabs.tab_races_results",
+    "tabs.tab_heatmap",
+]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_times(module=None):
+    """
+    Import `module` in a fresh interpreter (nothing but startup when None).
+    Returns {imported module: (self µs, cumulative µs, depth)}, or raises
+    RuntimeError with the import error.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}" if module else "pass"],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure dashboard import times")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports listed per module")
+    parser.add_argument("--budget-ms", type=float, help="fail when importing app takes longer")
+    args = parser.parse_args()
+
+    # Imported by the interpreter's startup, whatever the module
+    startup = set(import_times())
+    totals = {}
+    for module in args.modules:
+        try:
+            runs = [import_times(module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{module:<24} failed: {e}")
+            continue
+        totals[module] = statistics.median(run[module][1] for run in runs) / 1000
+        print(f"{module:<24} {totals[module]:8.1f} ms")
+        # Heaviest direct dependencies of the last run, by cumulative time
+        last = runs[-1]
+        heaviest = sorted(
+            ((name, cumulative) for name, (_, cumulative, depth) in last.items() if depth <= 1 and name != module and name not in startup),
+            key=lambda item: item[1], reverse=True,
+        )[:args.top]
+        for name, cumulative in heaviest:
+            print(f"    {name:<36} {cumulative / 1000:8.1f} ms")
+
+    if args.budget_ms is not None:
+        if "app" not in totals:
+            sys.exit("app could not be imported, startup budget not checked")
+        if totals["app"] > args.budget_ms:
+            sys.exit(f"Importing app takes {totals['app']:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
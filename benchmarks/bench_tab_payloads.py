@@ -0,0 +1,291 @@
+"""
+Compare a single-scan "tab payload" with the three queries each sport tab runs.
+
+For the Running, Cycling and Swimming tabs and every time range, a render either
+runs get_volume_metrics_query, get_weekly_sport_query and
+get_recent_activities_query, or loads the payload: one indexed read of the
+sport's activities over the widest range shown (plus a bounds lookup), from
+which the volume table, the weekly series and the recent activities are derived
+in memory. Both must give the same tables. The result cache is disabled so
+every render reaches SQLite.
+
+The volume table and the weekly series are read from the weekly rollup, so the
+three queries only scan `activities` for the recent list. The payload, which
+brings the sport's rows of the year into pandas, has measured slower per render
+and the tabs keep the per-widget queries; the candidate is kept here to re-check
+on other data sizes.
+
+Usage:
+    python benchmarks/bench_tab_payloads.py --activities 20000 --repeat 10
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sql_queries as sql
+from bench_sql_queries import build_database
+
+SPORTS = ["running", "cycling", "swimming"]
+TIMERANGES = ["8_weeks", "6_months", "ytd", "all"]
+
+
+def get_sport_tab_bounds_query(sport_type, timerange):
+    """
+    Weeks shown by a sport tab, with the same bounds as get_volume_metrics_query
+    (year_start to today), get_weekly_sport_query (series_start to series_end)
+    and get_recent_activities_query (recent_start to recent_end).
+    """
+    time_filters = {
+        '8_weeks': {
+            'start': 'date("now", "-84 days", "weekday 1")',
+            'end': 'date("now", "weekday 1")'
+        },
+        '6_months': {
+            'start': 'date("now", "-6 months", "weekday 1")',
+            'end': 'date("now", "weekday 1")'
+        },
+        'ytd': {
+            'start': 'date(strftime("%Y", "now") || "-01-01", "weekday 1")',
+            'end': 'date("now", "weekday 1")'
+        },
+    }
+    if timerange == 'all':
+        series_start = '(SELECT min(week_start) FROM activity_rollup_week)'
+        series_end = '(SELECT max(week_start) FROM activity_rollup_week)'
+        recent_start = '(SELECT date(min(Week), "weekday 1") FROM activities WHERE activityTypeGrouped = :sport_type)'
+        recent_end = '(SELECT date(max(Week), "weekday 1") FROM activities WHERE activityTypeGrouped = :sport_type)'
+    else:
+        series_start = recent_start = time_filters[timerange]['start']
+        series_end = recent_end = time_filters[timerange]['end']
+
+    return sql.Query(f"""
+        SELECT
+            date(strftime('%Y','now') || '-01-01', 'weekday 1') AS year_start,
+            date('now') AS today,
+            {series_start} AS series_start,
+            {series_end} AS series_end,
+            {recent_start} AS recent_start,
+            {recent_end} AS recent_end;
+    """, {"sport_type": sport_type} if timerange == 'all' else {})
+
+
+def get_sport_tab_rows_query(sport_type, since):
+    """
+    Activities of a sport from the week starting `since`, with the recent
+    activities columns (rounded and formatted) and the raw values to sum.
+    """
+    return sql.Query(f"""
+        SELECT
+            week_start,
+            distance AS raw_distance,
+            duration AS raw_duration,
+            Day,
+            activityTypeGrouped,
+            activityId,
+            ROUND(distance, 2) AS distance,
+            time(duration, 'unixepoch') AS duration,
+            calories,
+            averageHR,
+            maxHR,
+            minHR,
+            totalNumberOfStrokes,
+            averageStrokeDistance,
+            averageSwimCadence,
+            maxSwimCadence,
+            ROUND(averageSpeed*3.6, 2) AS averageSpeed,
+            ROUND(maxSpeed*3.6, 2) AS maxSpeed,
+            averageSwolf,
+            ROUND(trainingEffect,2) AS trainingEffect,
+            trainingEffectLabel,
+            moderateIntensityMinutes,
+            vigorousIntensityMinutes,
+            averageTemperature,
+            maxTemperature,
+            minTemperature,
+            waterEstimated,
+            elevationGain,
+            elevationLoss,
+            startTimeLocal,
+            locationName,
+            activityName
+        FROM activities
+        WHERE activityTypeGrouped = :sport_type
+        AND week_start >= :since
+        ORDER BY Day DESC;
+    """, {"sport_type": sport_type, "since": since})
+
+
+# Volume table row -> number of latest active weeks it covers (None: year to date)
+VOLUME_RANGES = {"last_1": 1, "last_4": 4, "last_12": 12, "last_18": 18, "last_all": None}
+
+# Volume table measure -> column of the activities it sums
+VOLUME_SUMS = {
+    "duration": "raw_duration",
+    "distance": "raw_distance",
+    "calories": "calories",
+    "totalNumberOfStrokes": "totalNumberOfStrokes",
+    "elevationGain": "elevationGain",
+}
+
+VOLUME_COLUMNS = [
+    "name", "duration_total", "duration_avg", "nb_trainings", "distance_total", "distance_avg",
+    "calories", "totalNumberOfStrokes", "averageHR", "elevationGain",
+]
+
+
+class SportTabPayload(NamedTuple):
+    """Data of a sport tab, shaped like the results of the queries it would replace."""
+    volume: pd.DataFrame  # get_volume_metrics_query
+    weekly: pd.DataFrame  # get_weekly_sport_query
+    recent: pd.DataFrame  # get_recent_activities_query
+
+
+def _week_series(start, end, include_end=False):
+    """
+    Mondays from `start` every 7 days while before `end` (or on it), like the
+    recursive date_series CTEs: `start` is always part of the series.
+    """
+    if start is None:
+        return np.array([], dtype=object)
+    periods = 1
+    if end is not None:
+        span = (pd.Timestamp(end) - pd.Timestamp(start)).days
+        periods = max(1, (span if include_end else span - 1) // 7 + 1)
+    return pd.date_range(start, periods=periods, freq="7D").strftime("%Y-%m-%d").to_numpy(dtype=object)
+
+
+def _sum_by_week(week_codes, nb_weeks, values):
+    """Sum of each week's values, missing values counting as 0 like SQL's SUM."""
+    return np.bincount(week_codes, weights=np.nan_to_num(values.astype("float64")), minlength=nb_weeks)
+
+
+def _volume_table(rows, year_start, today):
+    """Year to date volume per range of latest active weeks, as get_volume_metrics_query computes it."""
+    year = rows[(rows["week_start"] >= year_start).to_numpy()]
+    # Sorted weeks holding activities, and each activity's week
+    weeks, codes = np.unique(year["week_start"].to_numpy(dtype=object), return_inverse=True)
+    sums = {name: _sum_by_week(codes, len(weeks), year[column].to_numpy()) for name, column in VOLUME_SUMS.items()}
+    sums["nb_trainings"] = np.bincount(codes, minlength=len(weeks))
+    hr_duration = _sum_by_week(codes, len(weeks), year["raw_duration"].to_numpy() * year["averageHR"].to_numpy())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Weekly average HR truncated to an integer, 0 without a duration
+        sums["averageHR"] = np.nan_to_num(np.trunc(hr_duration / sums["duration"]), posinf=0, neginf=0)
+    # Latest active week first, weeks missing from the year's series left out
+    rank = len(weeks) - np.arange(len(weeks))
+    series = _week_series(year_start, today, include_end=True)
+    positions = np.searchsorted(weeks, series)
+    found = positions < len(weeks)
+    found[found] = weeks[positions[found]] == series[found]
+    full_weeks = {name: np.where(found, values[np.minimum(positions, len(weeks) - 1)], 0) if len(weeks) else np.zeros(len(series))
+                  for name, values in sums.items()}
+    full_rank = np.where(found, rank[np.minimum(positions, len(weeks) - 1)], np.inf) if len(weeks) else np.full(len(series), np.inf)
+
+    records = []
+    for name, nb_weeks in VOLUME_RANGES.items():
+        selected = np.ones(len(series), dtype=bool) if nb_weeks is None else full_rank <= nb_weeks
+        record = dict.fromkeys(VOLUME_COLUMNS)
+        record["name"] = name
+        nb_selected = int(selected.sum())
+        if nb_selected:
+            totals = {measure: values[selected].sum() for measure, values in full_weeks.items()}
+            hr_total = (full_weeks["duration"][selected] * full_weeks["averageHR"][selected]).sum()
+            record.update(
+                duration_total=totals["duration"],
+                duration_avg=totals["duration"] / nb_selected,
+                nb_trainings=totals["nb_trainings"],
+                distance_total=totals["distance"],
+                distance_avg=totals["distance"] / nb_selected,
+                calories=totals["calories"],
+                totalNumberOfStrokes=totals["totalNumberOfStrokes"],
+                averageHR=np.trunc(hr_total / totals["duration"]) if totals["duration"] else None,
+                elevationGain=totals["elevationGain"],
+            )
+        records.append(record)
+    return pd.DataFrame.from_records(records, columns=VOLUME_COLUMNS)
+
+
+def load_sport_tab_payload(conn, sport_type, timerange, cache=None):
+    """
+    Volume table, weekly distance and recent activities of a sport tab, derived
+    from one indexed read of the sport's activities over the widest range shown.
+    """
+    bounds = sql.read_query(conn, get_sport_tab_bounds_query(sport_type, timerange), cache=cache).iloc[0]
+    bounds = {name: (value if pd.notna(value) else None) for name, value in bounds.items()}
+    since = min(bounds[name] for name in ["year_start", "series_start", "recent_start"] if bounds[name] is not None)
+    rows = sql.read_query(conn, get_sport_tab_rows_query(sport_type, since), cache=cache)
+    row_weeks = rows["week_start"].to_numpy(dtype=object)
+
+    series = _week_series(bounds["series_start"], bounds["series_end"])
+    weeks, codes = np.unique(row_weeks, return_inverse=True)
+    distances = pd.Series(_sum_by_week(codes, len(weeks), rows["raw_distance"].to_numpy()), index=weeks)
+    weekly = pd.DataFrame({"Week": series, "total_distance": distances.reindex(series, fill_value=0.0).to_numpy(dtype="float64")})
+
+    recent_weeks = set(_week_series(bounds["recent_start"], bounds["recent_end"]))
+    recent = rows[np.array([week in recent_weeks for week in weeks], dtype=bool)[codes]]
+    recent = recent.drop(columns=["week_start", "raw_distance", "raw_duration"]).reset_index(drop=True)
+
+    return SportTabPayload(_volume_table(rows, bounds["year_start"], bounds["today"]), weekly, recent)
+
+
+def render_queries(conn, sport, timerange):
+    return (
+        sql.read_query(conn, sql.get_volume_metrics_query(sport), cache=None),
+        sql.read_query(conn, sql.get_weekly_sport_query(sport, timerange), cache=None),
+        sql.read_query(conn, sql.get_recent_activities_query(sport, timerange), cache=None),
+    )
+
+
+def render_payload(conn, sport, timerange):
+    return load_sport_tab_payload(conn, sport, timerange, cache=None)
+
+
+def timed(render, conn, sport, timerange, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = render(conn, sport, timerange)
+    return result, (time.perf_counter() - start) / repeat
+
+
+def check_same(payload, expected):
+    volume, weekly, recent = expected
+    pd.testing.assert_frame_equal(payload.volume[volume.columns], volume, check_dtype=False)
+    pd.testing.assert_frame_equal(payload.weekly, weekly)
+    # Activities of the same day come in no particular order
+    order = ["Day", "activityId"]
+    pd.testing.assert_frame_equal(
+        payload.recent.sort_values(order, ascending=False, ignore_index=True),
+        recent.sort_values(order, ascending=False, ignore_index=True),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a single-scan sport tab payload against the per-widget queries")
+    parser.add_argument("--activities", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "activities.db")
+        build_database(db_path, args.activities).close()
+        conn = sqlite3.connect(db_path, cached_statements=sql.STATEMENT_CACHE_SIZE)
+        print(f"{args.activities} synthetic activities, mean of {args.repeat} renders")
+        for sport in SPORTS:
+            for timerange in TIMERANGES:
+                expected, former = timed(render_queries, conn, sport, timerange, args.repeat)
+                payload, elapsed = timed(render_payload, conn, sport, timerange, args.repeat)
+                check_same(payload, expected)
+                print(f"{sport:<9} {timerange:<9} 3 queries {former * 1000:7.1f} ms | payload {elapsed * 1000:7.1f} ms  x{former / elapsed:.2f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Time detail-view loads from the columnar trackpoint cache against parsing the XML.
+
+For synthetic TCX and GPX files of each size, three loads are timed: parsing
+the XML (what the detail views did before), a cold load that parses and writes
+the cache, and a warm load that memory-maps it. Cached trackpoints must match
+the parsed ones within float32 precision. Cache invalidation is covered by
+tests/test_trackpoint_cache.py.
+
+Usage:
+    python benchmarks/bench_trackpoint_cache.py --points 5000 50000 200000
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions.parse_tcx_csv import parse_tcx_to_dataframe, parse_gpx_to_dataframe
+from actions.trackpoint_cache import cache_path, load_tcx_trackpoints, load_gpx_track
+from bench_parse_tcx import write_tcx
+
+# Formatted paces are whole seconds: a float32 speed may move a pace across a second
+FLOAT32_RTOL = 1e-6
+
+
+def write_gpx(path, nb_points, seed=0, origin=(45.5, -73.6)):
+    """Synthetic GPX track of `nb_points` one-second points wandering from `origin` (Montreal)."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-06-01T08:00:00Z")
+    latitudes = origin[0] + np.cumsum(rng.normal(0, 2e-5, nb_points))
+    longitudes = origin[1] + np.cumsum(rng.normal(0, 2e-5, nb_points))
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<gpx version="1.1" creator="bench" xmlns="http://www.topografix.com/GPX/1/1"><trk><name>synthetic</name><trkseg>\n')
+        for i in range(nb_points):
+            time_text = (start + pd.Timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+            f.write(f'<trkpt lat="{latitudes[i]:.7f}" lon="{longitudes[i]:.7f}">'
+                    f'<ele>{100 + (i % 300) * 0.2:.1f}</ele><time>{time_text}</time></trkpt>\n')
+        f.write('</trkseg></trk></gpx>\n')
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def cache_size(source_path):
+    cache_dir = cache_path(source_path)
+    return sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir))
+
+
+def check_tcx(result, expected):
+    pd.testing.assert_series_equal(result["Time"], expected["Time"], check_dtype=False)
+    numeric = [name for name in expected.columns if name not in ("Time", "Pace", "Pace_formatted")]
+    pd.testing.assert_frame_equal(result[numeric], expected[numeric], check_dtype=False, rtol=FLOAT32_RTOL)
+    assert list(result.columns) == list(expected.columns)
+    assert (result.dtypes[numeric] == expected.dtypes[numeric]).all()
+    mismatch = result["Pace_formatted"] != expected["Pace_formatted"]
+    drift = ((result["Pace_seconds"] - expected["Pace_seconds"]) / expected["Pace_seconds"])[mismatch].abs()
+    assert (drift < FLOAT32_RTOL).all(), "formatted paces differ beyond float32 rounding"
+
+
+def check_gpx(result, expected):
+    latitudes, longitudes = result
+    np.testing.assert_allclose(latitudes, expected["Latitude"], rtol=FLOAT32_RTOL)
+    np.testing.assert_allclose(longitudes, expected["Longitude"], rtol=FLOAT32_RTOL)
+
+
+# extension -> (writer, XML parser, cached loader, equality check)
+FORMATS = {
+    ".tcx": (write_tcx, parse_tcx_to_dataframe, load_tcx_trackpoints, check_tcx),
+    ".gpx": (write_gpx, parse_gpx_to_dataframe, load_gpx_track, check_gpx),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the columnar trackpoint cache")
+    parser.add_argument("--points", type=int, nargs="+", default=[5000, 50000, 200000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for ext, (write, parse, load, check) in FORMATS.items():
+            for nb_points in args.points:
+                path = os.path.join(tmp_dir, f"activity_{nb_points}{ext}")
+                write(path, nb_points)
+                expected, parse_time = timed(parse, path)
+                _, cold_time = timed(load, path)
+                result, warm_time = timed(load, path)
+                check(result, expected)
+                print(f"{ext} {nb_points:>7} points | XML {os.path.getsize(path) / 1e6:6.1f} MB parse {parse_time * 1000:8.1f} ms"
+                      f" | cache {cache_size(path) / 1e6:5.1f} MB cold {cold_time * 1000:8.1f} ms warm {warm_time * 1000:6.1f} ms"
+                      f"  x{parse_time / warm_time:.0f}")
+                shutil.rmtree(cache_path(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compare the sequential week loop with the fetch -> preprocess -> persist pipeline,
+using sleeps to simulate the cost of each stage.
+
+Usage:
+    python benchmarks/bench_week_pipeline.py --weeks 20 --fetch 0.05 --preprocess 0.03 --persist 0.02
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import run_week_pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs pipelined week processing")
+    parser.add_argument("--weeks", type=int, default=20)
+    parser.add_argument("--fetch", type=float, default=0.05, help="Simulated seconds to fetch a week")
+    parser.add_argument("--preprocess", type=float, default=0.03, help="Simulated seconds to preprocess a week")
+    parser.add_argument("--persist", type=float, default=0.02, help="Simulated seconds to persist a week")
+    args = parser.parse_args()
+
+    def fetch(week):
+        time.sleep(args.fetch)
+        return week
+
+    def preprocess(week, raw):
+        time.sleep(args.preprocess)
+        return raw
+
+    persisted = []
+
+    def persist(week, processed, error):
+        time.sleep(args.persist)
+        persisted.append(processed)
+
+    weeks = list(range(args.weeks))
+
+    start = time.perf_counter()
+    for week in weeks:
+        persist(week, preprocess(week, fetch(week)), None)
+    sequential = time.perf_counter() - start
+
+    persisted.clear()
+    start = time.perf_counter()
+    run_week_pipeline(weeks, fetch, preprocess, persist)
+    pipelined = time.perf_counter() - start
+    assert persisted == weeks, "weeks must be persisted in order"
+
+    slowest = args.weeks * max(args.fetch, args.preprocess, args.persist)
+    print(f"Sequential: {sequential:6.2f}s")
+    print(f"Pipelined:  {pipelined:6.2f}s (slowest stage alone: {slowest:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
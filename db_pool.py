@@ -0,0 +1,104 @@
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from db_schema import migrate
+from sql_queries import STATEMENT_CACHE_SIZE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 8  # connections per database
+CHECKOUT_TIMEOUT = 30  # seconds to wait for a free connection
+
+# Applied to every dashboard connection
+READ_PRAGMAS = {
+    "mmap_size": 268435456,  # map up to 256 MB of the file instead of read() calls
+    "cache_size": -65536,  # 64 MB page cache (negative values are KiB)
+    "temp_store": "MEMORY",  # sorts and temporary b-trees stay off disk
+}
+
+
+def _uri(path, mode):
+    return f"file:{quote(path)}?mode={mode}"
+
+
+def prepare_database(path, migrate_schema=False):
+    """
+    Switch the database to WAL journaling, so dashboard readers neither block
+    nor get blocked by an ingest (the mode is stored in the file), and with
+    `migrate_schema` apply the pending schema migrations, which the read-only
+    dashboard connections cannot do. Returns the journal mode, or None when
+    the database cannot be opened for writing.
+    """
+    try:
+        conn = sqlite3.connect(_uri(path, "rw"), uri=True)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Could not open {path} for writing: {e}")
+        return None
+    try:
+        if migrate_schema:
+            migrate(conn)
+        return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Could not prepare {path}: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def connect_read_only(path, cached_statements=STATEMENT_CACHE_SIZE):
+    """
+    Read-only connection with the dashboard pragmas. It may be used from any
+    thread, one at a time, which the pool guarantees.
+    """
+    conn = sqlite3.connect(
+        _uri(path, "ro"), uri=True, check_same_thread=False, cached_statements=cached_statements
+    )
+    for pragma, value in READ_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Read-only connections to one database, each checked out by a single thread
+    (a Streamlit script run) at a time. Connections are opened on demand, up to
+    `size`, and reused afterwards. With `migrate_schema`, the activities schema
+    is brought up to date before the first connection is handed out.
+    """
+    def __init__(self, path, size=DEFAULT_POOL_SIZE, timeout=CHECKOUT_TIMEOUT, migrate_schema=False):
+        self.path = path
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        prepare_database(path, migrate_schema)
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No connection to {self.path} available after {self.timeout}s")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = connect_read_only(self.path)
+            try:
+                yield conn
+            finally:
+                # Don't hand a snapshot of the database to the next render
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,254 @@
+import logging
+import sqlite3
+from rollups import ROLLUP_TABLES, create_rollup_tables, refresh_rollups
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Dates are ISO text ('YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'), so they sort
+# chronologically and range predicates can use the indexes below
+ACTIVITY_COLUMNS = [
+    ("activityId", "INTEGER NOT NULL"),
+    ("activityName", "TEXT"),
+    ("activityType", "TEXT"),
+    ("activityTypeGrouped", "TEXT"),
+    ("startTimeLocal", "TEXT"),
+    ("Day", "TEXT"),
+    ("Week", "TEXT"),
+    ("Month", "TEXT"),
+    ("duration", "REAL"),
+    ("durationFormatted", "TEXT"),
+    ("distance", "REAL"),
+    ("calories", "REAL"),
+    ("averageHR", "REAL"),
+    ("maxHR", "REAL"),
+    ("minHR", "REAL"),
+    ("averageTemperature", "REAL"),
+    ("maxTemperature", "REAL"),
+    ("minTemperature", "REAL"),
+    ("waterEstimated", "REAL"),
+    ("elevationGain", "REAL"),
+    ("elevationLoss", "REAL"),
+    ("maxElevation", "REAL"),
+    ("minElevation", "REAL"),
+    ("averageSpeed", "REAL"),
+    ("maxSpeed", "REAL"),
+    ("averageRunCadence", "REAL"),
+    ("maxRunCadence", "REAL"),
+    ("totalNumberOfStrokes", "INTEGER"),
+    ("averageStrokeDistance", "REAL"),
+    ("averageSwolf", "REAL"),
+    ("averageSwimCadence", "REAL"),
+    ("maxSwimCadence", "REAL"),
+    ("trainingEffect", "REAL"),
+    ("trainingEffectLabel", "TEXT"),
+    ("moderateIntensityMinutes", "INTEGER"),
+    ("vigorousIntensityMinutes", "INTEGER"),
+    ("steps", "INTEGER"),
+    ("locationName", "TEXT"),
+    ("differenceBodyBattery", "REAL"),
+    ("trainingRace", "TEXT"),
+    ("offSeason", "INTEGER"),
+]
+
+# An activity split in two by `split_biking_musculation_activities_2023` keeps its
+# activityId on both rows, so rows are identified by activity and type
+ACTIVITY_KEY = ["activityId", "activityType"]
+
+ACTIVITY_INDEXES = {
+    "idx_activities_type_week": ["activityTypeGrouped", "Week"],
+    "idx_activities_type_start": ["activityTypeGrouped", "startTimeLocal"],
+    "idx_activities_day": ["Day"],
+    "idx_activities_start": ["startTimeLocal"],
+}
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone() is not None
+
+
+def _create_activities_table(conn):
+    columns = ",\n    ".join(f'"{name}" {sql_type}' for name, sql_type in ACTIVITY_COLUMNS)
+    conn.execute(f"""
+        CREATE TABLE activities (
+            {columns},
+            PRIMARY KEY ({', '.join(ACTIVITY_KEY)})
+        )
+    """)
+    for name, columns in ACTIVITY_INDEXES.items():
+        conn.execute(f"CREATE INDEX {name} ON activities ({', '.join(columns)})")
+
+
+def migration_1_typed_activities(conn):
+    """
+    Typed activities table with its primary key and indexes. A table created
+    by `DataFrame.to_sql` is copied over, keeping the last copy of duplicates.
+    """
+    if not _table_exists(conn, "activities"):
+        _create_activities_table(conn)
+        return
+    conn.execute("ALTER TABLE activities RENAME TO activities_untyped")
+    # Renaming a table renames its indexes along with it, free their names
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='activities_untyped' AND sql IS NOT NULL").fetchall():
+        conn.execute(f'DROP INDEX "{name}"')
+    _create_activities_table(conn)
+    legacy_columns = {row[1] for row in conn.execute("PRAGMA table_info(activities_untyped)")}
+    columns = ", ".join(f'"{name}"' for name, _ in ACTIVITY_COLUMNS if name in legacy_columns)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO activities ({columns})
+        SELECT {columns} FROM activities_untyped ORDER BY rowid
+    """)
+    conn.execute("DROP TABLE activities_untyped")
+
+
+# Normalized period of each activity, as SQLite derives it from startTimeLocal.
+# Filled at ingest (see `save_processed_data`) and indexed, so queries can join
+# and group on periods without wrapping startTimeLocal in date functions.
+PERIOD_COLUMNS = {
+    "week_start": "date(startTimeLocal, 'weekday 0', '-6 days')",  # Monday of the week
+    "month_start": "date(startTimeLocal, 'start of month')",
+}
+
+PERIOD_INDEXES = {
+    "idx_activities_week_start": ["week_start"],
+    "idx_activities_type_week_start": ["activityTypeGrouped", "week_start"],
+    "idx_activities_type_month_start": ["activityTypeGrouped", "month_start"],
+}
+
+
+def migration_2_period_columns(conn):
+    """week_start and month_start columns, backfilled for existing activities."""
+    # Plain columns rather than generated ones: SQLite 3.40 returns wrong LEFT JOIN
+    # results on indexed virtual columns
+    for name in PERIOD_COLUMNS:
+        conn.execute(f"ALTER TABLE activities ADD COLUMN {name} TEXT")
+    assignments = ", ".join(f"{name} = {expression}" for name, expression in PERIOD_COLUMNS.items())
+    conn.execute(f"UPDATE activities SET {assignments}")
+    for name, columns in PERIOD_INDEXES.items():
+        conn.execute(f"CREATE INDEX {name} ON activities ({', '.join(columns)})")
+
+
+def migration_3_rollups(conn):
+    """Weekly and monthly rollup tables, built from the existing activities."""
+    create_rollup_tables(conn)
+    refresh_rollups(conn)
+
+
+def migration_4_data_version(conn):
+    """Counter bumped by every ingest, stamping cached dashboard results."""
+    conn.execute("CREATE TABLE data_version (version INTEGER NOT NULL)")
+    conn.execute("INSERT INTO data_version (version) VALUES (0)")
+
+
+# Route summary of each activity with a GPX track, filled by `routes.save_route`
+ROUTE_TABLE = "activity_routes"
+
+# Column -> type. Bounding box, point-average centroid, first and last points of the GPX track
+ROUTE_COLUMNS = {
+    "min_lat": "REAL",
+    "min_lon": "REAL",
+    "max_lat": "REAL",
+    "max_lon": "REAL",
+    "centroid_lat": "REAL",
+    "centroid_lon": "REAL",
+    "start_lat": "REAL",
+    "start_lon": "REAL",
+    "end_lat": "REAL",
+    "end_lon": "REAL",
+    "nb_points": "INTEGER",
+}
+
+ROUTE_INDEXES = {
+    "idx_activity_routes_lat": ["min_lat", "max_lat"],
+}
+
+# R*-tree of route pieces (see routes.route_segments)
+SEGMENT_TABLE = "route_segments"
+
+
+def create_route_table(conn):
+    columns = ",\n    ".join(f"{name} {sql_type}" for name, sql_type in ROUTE_COLUMNS.items())
+    conn.execute(f"""
+        CREATE TABLE {ROUTE_TABLE} (
+            activityId INTEGER PRIMARY KEY,
+            {columns}
+        )
+    """)
+    for name, columns in ROUTE_INDEXES.items():
+        conn.execute(f"CREATE INDEX {name} ON {ROUTE_TABLE} ({', '.join(columns)})")
+
+
+def create_segment_table(conn):
+    conn.execute(f"ALTER TABLE {ROUTE_TABLE} ADD COLUMN nb_segments INTEGER NOT NULL DEFAULT 0")
+    conn.execute(f"CREATE VIRTUAL TABLE {SEGMENT_TABLE} USING rtree(id, min_lat, max_lat, min_lon, max_lon, +activityId INTEGER)")
+
+
+def migration_5_activity_routes(conn):
+    """
+    Route summary (bounds, centroid, start and end) of each activity with a GPX
+    track, filled at ingest. Existing activities are indexed by `python routes.py`.
+    """
+    create_route_table(conn)
+
+
+def migration_6_route_segments(conn):
+    """
+    R*-tree of route pieces for "activities through this area" searches,
+    filled at ingest. Existing activities are indexed by `python routes.py`.
+    """
+    create_segment_table(conn)
+
+
+# Applied in order; the database's `PRAGMA user_version` is the number applied so far
+MIGRATIONS = [
+    migration_1_typed_activities,
+    migration_2_period_columns,
+    migration_3_rollups,
+    migration_4_data_version,
+    migration_5_activity_routes,
+    migration_6_route_segments,
+]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply the pending migrations, each in its own transaction."""
+    version = get_schema_version(conn)
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.commit()
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"Applied schema migration {number}: {migration.__name__}")
+    return get_schema_version(conn)
+
+
+def get_data_version(conn):
+    """Current data version, None for a database without the counter."""
+    try:
+        row = conn.execute("SELECT version FROM data_version").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def bump_data_version(conn):
+    """Mark the activities as changed. The caller commits."""
+    conn.execute("UPDATE data_version SET version = version + 1")
+
+
+def clear_activities(conn):
+    """Empty the activities table, its rollups and routes, keeping the schema."""
+    migrate(conn)
+    for table in ["activities", *ROLLUP_TABLES, ROUTE_TABLE, SEGMENT_TABLE]:
+        conn.execute(f"DELETE FROM {table}")
+    bump_data_version(conn)
+    conn.commit()
@@ -3,11 +3,16 @@ import logging
 import pandas as pd
 import sqlite3
 from connect_to_garmin import connect_to_garmin
-from preprocess_activities import main_preprocess
+from preprocess_activities import preprocess_weekly_data, save_processed_data
 from datetime import datetime, timedelta
 import argparse
 from time import sleep
 import garmin_cookies
+from fetch_activities import fetch_activities, list_activities_by_range, group_activities_by_week, RateLimiter, DEFAULT_MAX_WORKERS, DEFAULT_RATE_LIMIT
+from pipeline import run_week_pipeline, DEFAULT_QUEUE_SIZE
+from garmin_retry import RetryingClient
+from db_schema import clear_activities
+from fetch_manifest import FetchManifest
 
 # Configure logging
 class WeekProcessingFormatter(logging.Formatter):
@@ -53,7 +58,7 @@ console_handler.addFilter(SuccessFilter())
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-def extract_weekly_activities(client, last_week_date, execution_date):
+def extract_weekly_activities(client, last_week_date, execution_date, max_workers=DEFAULT_MAX_WORKERS, rate_limiter=None, activities=None, manifest=None):
     script_dir = os.path.dirname(os.path.abspath(__file__))
     month_date = datetime.strptime(last_week_date, "%Y-%m-%d").strftime("%Y-%m")
     month_output_dir = os.path.join(script_dir, "data", "raw", month_date)
@@ -61,8 +66,9 @@ def extract_weekly_activities(client, last_week_date, execution_date):
 
     try:
         processed_activities = set()
-        logger.info(f"Fetching activities {last_week_date} to {execution_date}")
-        activities = client.get_activities_by_date(last_week_date, execution_date)
+        if activities is None:
+            logger.info(f"Fetching activities {last_week_date} to {execution_date}")
+            activities = client.get_activities_by_date(last_week_date, execution_date)
         if not activities:
             logger.info("No activities found for this period.")
             return None
@@ -77,81 +83,36 @@ def extract_weekly_activities(client, last_week_date, execution_date):
             "trainingEffect", "trainingEffectLabel", "moderateIntensityMinutes",
             "vigorousIntensityMinutes", "steps", "locationName", "differenceBodyBattery"
         ]
+        jobs = []
         activities_data = []
-
         for activity in activities:
             activity_id = activity.get("activityId")
             activity_month = datetime.strptime(activity.get("startTimeLocal"), "%Y-%m-%d %H:%M:%S").strftime("%Y-%m")
             activity_output_dir = os.path.join(script_dir, "data", "raw", activity_month, str(activity_id))
-            if os.path.isdir(activity_output_dir):
-                logger.info(f"Data already exists for Activity ID {str(activity_id)} in folder {activity_month}")
-                return pd.read_csv(os.path.join(activity_output_dir, f"{str(activity_id)}.csv"))
             if activity_id in processed_activities:
                 continue
             processed_activities.add(activity_id)
+            if manifest is not None:
+                info_file = os.path.join(script_dir, "data", "raw", activity_month, f"{activity_id}_info.csv")
+                if not manifest.is_known(activity_id) and os.path.isdir(activity_output_dir):
+                    # Folder downloaded before the manifest existed
+                    manifest.seed_from_directory(activity_id, activity_output_dir, info_file)
+                if not manifest.pending_formats(activity_id) and os.path.exists(info_file):
+                    logger.info(f"Data already exists for Activity ID {str(activity_id)} in folder {activity_month}")
+                    activities_data.extend(pd.read_csv(info_file).to_dict("records"))
+                    continue
+            jobs.append((activity_id, activity_output_dir))
+
+        # Fetch details and download the missing GPX, TCX, CSV through a bounded worker pool
+        results = fetch_activities(client, jobs, max_workers=max_workers, rate_limiter=rate_limiter, manifest=manifest)
+
+        for (activity_id, activity_output_dir), result in zip(jobs, results):
+            if result is None:
+                continue
+            activity_data, all_saved = result
+            activity_month = os.path.basename(os.path.dirname(activity_output_dir))
             try:
-                logger.debug(f"Processing activity ID: {activity_id}")
-                activity_details = client.get_activity(activity_id)
-                summary = activity_details.get("summaryDTO", {})
-                activity_data = {
-                    "activityId": activity_details.get("activityId"),
-                    "activityName": activity_details.get("activityName"),
-                    "activityType": activity_details.get("activityTypeDTO", {}).get("typeKey"),
-                    "startTimeLocal": summary.get("startTimeLocal"),
-                    "duration": summary.get("duration"),
-                    "elapsedDuration": summary.get("elapsedDuration"),
-                    "movingDuration": summary.get("movingDuration"),
-                    "distance": summary.get("distance"),
-                    "calories": summary.get("calories"),
-                    "averageHR": summary.get("averageHR"),
-                    "maxHR": summary.get("maxHR"),
-                    "minHR": summary.get("minHR"),
-                    "averageTemperature": summary.get("averageTemperature"),
-                    "maxTemperature": summary.get("maxTemperature"),
-                    "minTemperature": summary.get("minTemperature"),
-                    "waterEstimated": summary.get("waterEstimated"),
-                    "elevationGain": summary.get("elevationGain"),
-                    "elevationLoss": summary.get("elevationLoss"),
-                    "maxElevation": summary.get("maxElevation"),
-                    "minElevation": summary.get("minElevation"),
-                    "averageSpeed": summary.get("averageSpeed"),
-                    "maxSpeed": summary.get("maxSpeed"),
-                    "averageRunCadence": summary.get("averageRunCadence"),
-                    "maxRunCadence": summary.get("maxRunCadence"),
-                    "totalNumberOfStrokes": summary.get("totalNumberOfStrokes"),
-                    "averageStrokeDistance": summary.get("averageStrokeDistance"),
-                    "averageSwolf": summary.get("averageSwolf"),
-                    "averageSwimCadence": summary.get("averageSwimCadence"),
-                    "maxSwimCadence": summary.get("maxSwimCadence"),
-                    "trainingEffect": summary.get("trainingEffect"),
-                    "trainingEffectLabel": summary.get("trainingEffectLabel"),
-                    "moderateIntensityMinutes": summary.get("moderateIntensityMinutes"),
-                    "vigorousIntensityMinutes": summary.get("vigorousIntensityMinutes"),
-                    "steps": summary.get("steps"),
-                    "locationName": activity_details.get("locationName"),
-                    "differenceBodyBattery": summary.get("differenceBodyBattery"),
-                }
                 activities_data.append(activity_data)
-
-                os.makedirs(activity_output_dir, exist_ok=True)
-
-                # Download and save GPX, TCX, CSV
-                formats = [
-                    (client.ActivityDownloadFormat.GPX, ".gpx"),
-                    (client.ActivityDownloadFormat.TCX, ".tcx"),
-                    (client.ActivityDownloadFormat.CSV, ".csv")
-                ]
-                all_saved = True
-                for fmt, ext in formats:
-                    try:
-                        data = client.download_activity(activity_id, dl_fmt=fmt)
-                        output_file = os.path.join(activity_output_dir, f"{str(activity_id)}{ext}")
-                        with open(output_file, "wb") as fb:
-                            fb.write(data)
-                    except Exception as e:
-                        logger.error(f"Failed to save {ext} for activity {activity_id}: {e}")
-                        all_saved = False
-
                 logger.info(f"Activity {activity_id} - Last extracted: {datetime.now()} - All formats saved: {all_saved}")
 
                 output_file = os.path.join(script_dir, "data", "raw", activity_month, f"{activity_id}_info.csv")
@@ -174,7 +135,7 @@ def extract_weekly_activities(client, last_week_date, execution_date):
         logger.error(f"Failed to fetch activities: {error}")
         return None
 
-def process_date_range(conn, start_date, end_date=None):
+def process_date_range(conn, start_date, end_date=None, max_workers=DEFAULT_MAX_WORKERS, rate_limit=DEFAULT_RATE_LIMIT, queue_size=DEFAULT_QUEUE_SIZE, bulk_listing=False):
     command = f"python extract_historical_activities.py {start_date}"
     if end_date:
         command += f" --end_date {end_date}"
@@ -182,9 +143,7 @@ def process_date_range(conn, start_date, end_date=None):
 
     if start_date == "2022-05-09":
         logger.info("Initial historical load detected. Clearing database...")
-        cursor = conn.cursor()
-        cursor.execute("DROP TABLE IF EXISTS activities")
-        conn.commit()
+        clear_activities(conn)
         logger.info("Database cleared. Starting fresh load from 2022-05-09")
 
     start_date = datetime.strptime(start_date, "%Y-%m-%d")
@@ -200,55 +159,88 @@ def process_date_range(conn, start_date, end_date=None):
         logger.error("Failed to connect to Garmin Connect. Check your credentials.")
         conn.close()
         return
+    # Retry transient errors with backoff, behind a circuit breaker
+    client = RetryingClient(client)
+    rate_limiter = RateLimiter(rate_limit)
+    manifest = FetchManifest(os.path.join(script_dir, "data", "fetch_manifest.db"))
     
     while start_date.weekday() != 0:
         start_date -= timedelta(days=1)
+    weeks = []
     current_date = start_date
-
     while current_date <= end_date:
+        weeks.append(current_date)
+        current_date += timedelta(days=7)
+
+    activities_by_week = None
+    if bulk_listing and weeks:
+        listing_dir = os.path.join(script_dir, "data", "raw", "listing")
+        activities = list_activities_by_range(client, weeks[0], weeks[-1] + timedelta(days=6), listing_dir, rate_limiter=rate_limiter)
+        activities_by_week = group_activities_by_week(activities)
+
+    def fetch_week(current_date):
         execution_date = current_date + timedelta(days=6)
         last_week_date_str = current_date.strftime("%Y-%m-%d")
         execution_date_str = execution_date.strftime("%Y-%m-%d")
 
         logger.info(f"Processing week: {last_week_date_str} (Mon) to {execution_date_str} (Sun)")
 
+        processed_dir = os.path.join(script_dir, "data", "processed", last_week_date_str)
+        os.makedirs(processed_dir, exist_ok=True)
+        processed_file = os.path.join(processed_dir, f"activities_processed_{last_week_date_str}.csv")
+        if os.path.exists(processed_file):
+            os.remove(processed_file)
+            logger.debug(f"Removed existing processed file for {last_week_date_str}")
+
+        week_activities = activities_by_week.get(last_week_date_str, []) if activities_by_week is not None else None
+        df_weekly_raw = extract_weekly_activities(client, last_week_date_str, execution_date_str, max_workers, rate_limiter, week_activities, manifest)
+        if df_weekly_raw is None:
+            logger.info(f"No activities found for week ending {execution_date_str}")
+            return None
+        df_weekly_raw['startTimeLocal'] = pd.to_datetime(df_weekly_raw['startTimeLocal'])
+        mask = (df_weekly_raw['startTimeLocal'].dt.date >= current_date.date()) & \
+              (df_weekly_raw['startTimeLocal'].dt.date <= execution_date.date())
+        df_weekly_raw = df_weekly_raw[mask]
+        if df_weekly_raw.empty:
+            logger.info(f"No activities found within Mon-Sun range for week ending {execution_date_str}")
+            return None
+        return df_weekly_raw
+
+    def preprocess_week(current_date, df_weekly_raw):
+        return preprocess_weekly_data(df_weekly_raw)
+
+    def persist_week(current_date, df_weekly, error):
+        execution_date_str = (current_date + timedelta(days=6)).strftime("%Y-%m-%d")
+        if error is not None:
+            logger.error(f"Error processing week ending {execution_date_str}: {str(error)}")
+            return
+        if df_weekly is None:
+            return
         try:
-            processed_dir = os.path.join(script_dir, "data", "processed", last_week_date_str)
-            os.makedirs(processed_dir, exist_ok=True)
-            processed_file = os.path.join(processed_dir, f"activities_processed_{last_week_date_str}.csv")
-            if os.path.exists(processed_file):
-                os.remove(processed_file)
-                logger.debug(f"Removed existing processed file for {last_week_date_str}")
-
-            df_weekly_raw = extract_weekly_activities(client, last_week_date_str, execution_date_str)
-            if df_weekly_raw is not None:
-                df_weekly_raw['startTimeLocal'] = pd.to_datetime(df_weekly_raw['startTimeLocal'])
-                mask = (df_weekly_raw['startTimeLocal'].dt.date >= current_date.date()) & \
-                      (df_weekly_raw['startTimeLocal'].dt.date <= execution_date.date())
-                df_weekly_raw = df_weekly_raw[mask]
-                if not df_weekly_raw.empty:
-                    df_weekly_preprocessed = main_preprocess(conn, last_week_date_str, df_weekly_raw)
-                    if df_weekly_preprocessed is not None:
-                        logger.info(f"Successfully processed data for week ending {execution_date_str}")
-                    else:
-                        logger.warning(f"Data processing failed for week ending {execution_date_str}")
-                else:
-                    logger.info(f"No activities found within Mon-Sun range for week ending {execution_date_str}")
+            df_weekly_preprocessed = save_processed_data(conn, df_weekly, current_date.strftime("%Y-%m-%d"))
+            if df_weekly_preprocessed is not None:
+                logger.info(f"Successfully processed data for week ending {execution_date_str}")
             else:
-                logger.info(f"No activities found for week ending {execution_date_str}")
+                logger.warning(f"Data processing failed for week ending {execution_date_str}")
         except Exception as e:
             logger.error(f"Error processing week ending {execution_date_str}: {str(e)}")
 
-        current_date += timedelta(days=7)
+    try:
+        run_week_pipeline(weeks, fetch_week, preprocess_week, persist_week, queue_size)
+    finally:
+        manifest.close()
+        logger.info(f"Garmin Connect calls: {dict(client.stats)}")
 
 if __name__ == "__main__":
     conn = sqlite3.connect("activities.db")
     parser = argparse.ArgumentParser(description='Extract Garmin activities for a date range')
     parser.add_argument('--start_date', help='Start date (format: YYYY-MM-DD)')
     parser.add_argument('--end_date', help='End date (format: YYYY-MM-DD). If not provided, current date will be used.', default=None)
+    parser.add_argument('--max_workers', type=int, help='Number of activities fetched concurrently.', default=DEFAULT_MAX_WORKERS)
+    parser.add_argument('--rate_limit', type=float, help='Maximum Garmin Connect requests per second (0 disables the limit).', default=DEFAULT_RATE_LIMIT)
+    parser.add_argument('--queue_size', type=int, help='Number of weeks buffered between pipeline stages.', default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument('--bulk_listing', action='store_true', help='List the whole date range in a few paginated calls (cached on disk) instead of one call per week.')
     args = parser.parse_args()
-    print(args.start_date)
-    print('ok')
-    process_date_range(conn, args.start_date, args.end_date)
+    process_date_range(conn, args.start_date, args.end_date, args.max_workers, args.rate_limit, args.queue_size, args.bulk_listing)
     conn.close()
     logger.info("Database connection closed")
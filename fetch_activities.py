@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from fetch_manifest import DETAILS, DOWNLOAD_FORMATS, STATUS_DONE, STATUS_FAILED
+from actions.trackpoint_cache import CACHE_FORMATS, build_trackpoint_cache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "connect.garmin.com"
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RATE_LIMIT = 4.0  # requests per second, per host
+DEFAULT_LISTING_CHUNK_WEEKS = 26
+
+
+class RateLimiter:
+    """
+    Thread-safe per-host rate limiter: hands out evenly spaced time slots so
+    that at most `rate` requests per second are sent to each host.
+    A rate of 0 or None disables limiting.
+    """
+    def __init__(self, rate=DEFAULT_RATE_LIMIT):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host=DEFAULT_HOST):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+
+
+def build_activity_data(activity_details):
+    """Flatten a `client.get_activity` payload into one activity row."""
+    summary = activity_details.get("summaryDTO", {})
+    return {
+        "activityId": activity_details.get("activityId"),
+        "activityName": activity_details.get("activityName"),
+        "activityType": activity_details.get("activityTypeDTO", {}).get("typeKey"),
+        "startTimeLocal": summary.get("startTimeLocal"),
+        "duration": summary.get("duration"),
+        "elapsedDuration": summary.get("elapsedDuration"),
+        "movingDuration": summary.get("movingDuration"),
+        "distance": summary.get("distance"),
+        "calories": summary.get("calories"),
+        "averageHR": summary.get("averageHR"),
+        "maxHR": summary.get("maxHR"),
+        "minHR": summary.get("minHR"),
+        "averageTemperature": summary.get("averageTemperature"),
+        "maxTemperature": summary.get("maxTemperature"),
+        "minTemperature": summary.get("minTemperature"),
+        "waterEstimated": summary.get("waterEstimated"),
+        "elevationGain": summary.get("elevationGain"),
+        "elevationLoss": summary.get("elevationLoss"),
+        "maxElevation": summary.get("maxElevation"),
+        "minElevation": summary.get("minElevation"),
+        "averageSpeed": summary.get("averageSpeed"),
+        "maxSpeed": summary.get("maxSpeed"),
+        "averageRunCadence": summary.get("averageRunCadence"),
+        "maxRunCadence": summary.get("maxRunCadence"),
+        "totalNumberOfStrokes": summary.get("totalNumberOfStrokes"),
+        "averageStrokeDistance": summary.get("averageStrokeDistance"),
+        "averageSwolf": summary.get("averageSwolf"),
+        "averageSwimCadence": summary.get("averageSwimCadence"),
+        "maxSwimCadence": summary.get("maxSwimCadence"),
+        "trainingEffect": summary.get("trainingEffect"),
+        "trainingEffectLabel": summary.get("trainingEffectLabel"),
+        "moderateIntensityMinutes": summary.get("moderateIntensityMinutes"),
+        "vigorousIntensityMinutes": summary.get("vigorousIntensityMinutes"),
+        "steps": summary.get("steps"),
+        "locationName": activity_details.get("locationName"),
+        "differenceBodyBattery": summary.get("differenceBodyBattery"),
+    }
+
+
+def get_download_formats(client):
+    """Export formats saved next to each activity, as (format, extension) pairs."""
+    return [
+        (client.ActivityDownloadFormat.GPX, ".gpx"),
+        (client.ActivityDownloadFormat.TCX, ".tcx"),
+        (client.ActivityDownloadFormat.CSV, ".csv")
+    ]
+
+
+def fetch_activity(client, activity_id, output_dir=None, rate_limiter=None, manifest=None):
+    """
+    Fetch the details of one activity and, when `output_dir` is given,
+    download its GPX/TCX/CSV exports into that folder, caching the trackpoints
+    of the GPX and TCX files (see `actions.trackpoint_cache`).
+    With a `manifest`, exports already recorded as done are skipped and every
+    attempt is recorded, so only failed formats are retried on the next run.
+    Returns (activity_data, all_saved).
+    """
+    rate_limiter = rate_limiter or RateLimiter(None)
+
+    rate_limiter.acquire()
+    try:
+        activity_details = client.get_activity(activity_id)
+    except Exception:
+        if manifest is not None:
+            manifest.record(activity_id, DETAILS, STATUS_FAILED)
+        raise
+    activity_data = build_activity_data(activity_details)
+    if manifest is not None:
+        manifest.record(activity_id, DETAILS, STATUS_DONE, json.dumps(activity_data, sort_keys=True, default=str).encode())
+
+    all_saved = True
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        pending = manifest.pending_formats(activity_id, DOWNLOAD_FORMATS) if manifest is not None else DOWNLOAD_FORMATS
+        for fmt, ext in get_download_formats(client):
+            if ext[1:] not in pending:
+                continue
+            try:
+                rate_limiter.acquire()
+                data = client.download_activity(activity_id, dl_fmt=fmt)
+                output_file = os.path.join(output_dir, f"{str(activity_id)}{ext}")
+                with open(output_file, "wb") as fb:
+                    fb.write(data)
+                if manifest is not None:
+                    manifest.record(activity_id, ext[1:], STATUS_DONE, data)
+            except Exception as e:
+                logger.error(f"Failed to save {ext} for activity {activity_id}: {e}")
+                if manifest is not None:
+                    manifest.record(activity_id, ext[1:], STATUS_FAILED)
+                all_saved = False
+                continue
+            if ext in CACHE_FORMATS:
+                # Detail views read the columnar cache; a missing one is rebuilt on first view
+                try:
+                    build_trackpoint_cache(output_file)
+                except Exception as e:
+                    logger.warning(f"Failed to cache trackpoints of {ext} for activity {activity_id}: {e}")
+    return activity_data, all_saved
+
+
+def fetch_activities(client, jobs, max_workers=DEFAULT_MAX_WORKERS, rate_limiter=None, manifest=None):
+    """
+    Run `fetch_activity` for every (activity_id, output_dir) job through a
+    bounded thread pool. Results are returned in job order; activities that
+    failed are returned as None so the caller can carry on with the rest.
+    """
+    rate_limiter = rate_limiter or RateLimiter()
+
+    def run(job):
+        activity_id, output_dir = job
+        try:
+            logger.debug(f"Processing activity ID: {activity_id}")
+            return fetch_activity(client, activity_id, output_dir, rate_limiter, manifest)
+        except Exception as error:
+            logger.error(f"Failed to process activity {activity_id}: {error}")
+            return None
+
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(run, jobs))
+
+
+def list_activities_by_range(client, start_date, end_date, cache_dir, chunk_weeks=DEFAULT_LISTING_CHUNK_WEEKS, rate_limiter=None):
+    """
+    List every activity between two datetimes with one `get_activities_by_date`
+    call per chunk of `chunk_weeks` weeks (the client paginates each call itself)
+    instead of one call per week.
+    Each finished chunk is cached as JSON in `cache_dir`, so an interrupted run
+    resumes without listing it again. Chunks reaching today are never cached
+    since new activities can still appear in them.
+    """
+    rate_limiter = rate_limiter or RateLimiter(None)
+    os.makedirs(cache_dir, exist_ok=True)
+    today = datetime.now().date()
+
+    activities = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(weeks=chunk_weeks, days=-1), end_date)
+        chunk_start_str = chunk_start.strftime("%Y-%m-%d")
+        chunk_end_str = chunk_end.strftime("%Y-%m-%d")
+        cache_file = os.path.join(cache_dir, f"activities_{chunk_start_str}_{chunk_end_str}.json")
+
+        if os.path.exists(cache_file):
+            logger.info(f"Using cached activity listing {chunk_start_str} to {chunk_end_str}")
+            with open(cache_file) as f:
+                chunk = json.load(f)
+        else:
+            logger.info(f"Listing activities {chunk_start_str} to {chunk_end_str}")
+            rate_limiter.acquire()
+            chunk = client.get_activities_by_date(chunk_start_str, chunk_end_str) or []
+            if chunk_end.date() < today:
+                with open(cache_file, "w") as f:
+                    json.dump(chunk, f)
+        activities.extend(chunk)
+        chunk_start = chunk_end + timedelta(days=1)
+    return activities
+
+
+def group_activities_by_week(activities):
+    """Split an activity listing into {Monday (YYYY-MM-DD): [activities]}."""
+    weeks = {}
+    for activity in activities:
+        start_time = datetime.strptime(activity.get("startTimeLocal"), "%Y-%m-%d %H:%M:%S")
+        monday = (start_time - timedelta(days=start_time.weekday())).strftime("%Y-%m-%d")
+        weeks.setdefault(monday, []).append(activity)
+    return weeks
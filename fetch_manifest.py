@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DETAILS = "details"
+DOWNLOAD_FORMATS = ["gpx", "tcx", "csv"]
+ALL_FORMATS = [DETAILS] + DOWNLOAD_FORMATS
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class FetchManifest:
+    """
+    Durable record of what has been fetched for each activity: one row per
+    (activity, format) with its status and the SHA-256 of the saved content.
+
+    The whole table is loaded in memory when opened so skip decisions are
+    constant-time dictionary lookups; every update is committed immediately
+    so a crashed run resumes from the last recorded download.
+    Safe to share between the fetch worker threads.
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS fetch_manifest (
+                activityId INTEGER NOT NULL,
+                format TEXT NOT NULL,
+                status TEXT NOT NULL,
+                sha256 TEXT,
+                updatedAt TEXT NOT NULL,
+                PRIMARY KEY (activityId, format)
+            )
+        """)
+        self.conn.commit()
+        self._status = {
+            (int(activity_id), fmt): status
+            for activity_id, fmt, status in self.conn.execute("SELECT activityId, format, status FROM fetch_manifest")
+        }
+
+    def is_known(self, activity_id):
+        return any((int(activity_id), fmt) in self._status for fmt in ALL_FORMATS)
+
+    def pending_formats(self, activity_id, formats=ALL_FORMATS):
+        """Formats that were never fetched or whose last attempt failed."""
+        return [fmt for fmt in formats if self._status.get((int(activity_id), fmt)) != STATUS_DONE]
+
+    def record(self, activity_id, fmt, status, content=None):
+        sha256 = hashlib.sha256(content).hexdigest() if content is not None else None
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO fetch_manifest (activityId, format, status, sha256, updatedAt)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (activityId, format) DO UPDATE SET
+                    status = excluded.status,
+                    sha256 = excluded.sha256,
+                    updatedAt = excluded.updatedAt
+                """,
+                (int(activity_id), fmt, status, sha256, datetime.now().isoformat(timespec="seconds"))
+            )
+            self.conn.commit()
+            self._status[(int(activity_id), fmt)] = status
+
+    def seed_from_directory(self, activity_id, activity_output_dir, info_file=None):
+        """
+        Register files downloaded before the manifest existed, so they are not
+        fetched again. Only used for activities the manifest does not know yet.
+        """
+        for fmt in DOWNLOAD_FORMATS:
+            file_path = os.path.join(activity_output_dir, f"{str(activity_id)}.{fmt}")
+            if os.path.exists(file_path):
+                with open(file_path, "rb") as f:
+                    self.record(activity_id, fmt, STATUS_DONE, f.read())
+        if info_file is not None and os.path.exists(info_file):
+            with open(info_file, "rb") as f:
+                self.record(activity_id, DETAILS, STATUS_DONE, f.read())
+
+    def close(self):
+        self.conn.close()
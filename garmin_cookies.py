@@ -1,33 +1,133 @@
-import pickle
 import os
 import json
+import time
 import logging
-from garminconnect import Garmin
+import inspect
+import threading
+from functools import wraps
+from garminconnect import Garmin, GarminConnectAuthenticationError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_garmin_client(email, password):
-    cookies_file = 'garmin_cookies.pkl'
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TOKENSTORE = os.path.join(script_dir, "data", ".garmin_tokens")
+SESSION_FILE = "session.json"
+DEFAULT_SESSION_MAX_AGE = 30 * 24 * 3600  # seconds before a saved session is replaced by a full login
+
+
+def _session_file(tokenstore):
+    return os.path.join(tokenstore, SESSION_FILE)
+
+
+def session_is_fresh(tokenstore):
+    """True when a saved session exists and has not passed its expiry."""
+    try:
+        with open(_session_file(tokenstore)) as f:
+            session = json.load(f)
+        return session.get("expires_at", 0) > time.time()
+    except (OSError, ValueError):
+        return False
+
+
+def save_session(client, tokenstore, max_age=DEFAULT_SESSION_MAX_AGE):
+    """Dump the client's auth tokens to `tokenstore`, with an expiry stamp."""
+    # The tokens grant access to the account: keep the folder private to its owner
+    os.makedirs(tokenstore, mode=0o700, exist_ok=True)
+    # garminconnect < 0.3 keeps its tokens in `client.garth`, later versions in `client.client`
+    token_client = getattr(client, "garth", None) or getattr(client, "client")
+    token_client.dump(tokenstore)
+    now = time.time()
+    with open(_session_file(tokenstore), "w") as f:
+        json.dump({"created_at": now, "expires_at": now + max_age}, f)
+
+
+def is_auth_error(error):
+    """Authentication failures, including plain HTTP 401 responses wrapped by garminconnect."""
+    if isinstance(error, GarminConnectAuthenticationError):
+        return True
+    for err in (error, error.__cause__):
+        response = getattr(err, "response", None)
+        if getattr(response, "status_code", None) == 401:
+            return True
+    return False
+
+
+def login(email, password, tokenstore=DEFAULT_TOKENSTORE, client_cls=Garmin):
+    """
+    Return a logged-in client, reusing the session saved in `tokenstore`
+    when it is still fresh and doing a full login (then saving it) otherwise.
+    """
+    if session_is_fresh(tokenstore):
+        try:
+            client = client_cls(email, password)
+            client.login(tokenstore)
+            logger.info("Resumed saved Garmin Connect session")
+            return client
+        except Exception as e:
+            logger.info(f"Saved Garmin Connect session rejected, logging in again: {e}")
+
+    client = client_cls(email, password)
+    client.login()
+    logger.info("Successfully logged in to Garmin Connect")
     try:
-        # Create a new API client
-        client = Garmin(email, password)
-        
-        # Try to login (this will automatically handle the authentication)
-        client.login()
-        logger.info("Successfully logged in to Garmin Connect")
-        
-        return client
+        save_session(client, tokenstore)
+    except Exception as e:
+        logger.warning(f"Could not save Garmin Connect session: {e}")
+    return client
+
+
+class ReauthClient:
+    """
+    Wraps a logged-in Garmin client: when an API call fails with a 401, the
+    session is replaced by a full login and the call is retried once.
+    Every other attribute is passed through unchanged.
+    """
+    def __init__(self, email, password, tokenstore=DEFAULT_TOKENSTORE, client_cls=Garmin):
+        self._email = email
+        self._password = password
+        self._tokenstore = tokenstore
+        self._client_cls = client_cls
+        self._lock = threading.Lock()
+        self._client = login(email, password, tokenstore, client_cls)
+
+    def refresh(self, stale_client=None):
+        """Force a full login, unless another thread already replaced `stale_client`."""
+        with self._lock:
+            if stale_client is None or self._client is stale_client:
+                logger.info("Garmin Connect session expired, logging in again")
+                if os.path.exists(_session_file(self._tokenstore)):
+                    os.remove(_session_file(self._tokenstore))
+                self._client = login(self._email, self._password, self._tokenstore, self._client_cls)
+            return self._client
+
+    def __getattr__(self, name):
+        client = self._client
+        attr = getattr(client, name)
+        if not inspect.ismethod(attr):
+            return attr
+
+        @wraps(attr)
+        def call(*args, **kwargs):
+            try:
+                return attr(*args, **kwargs)
+            except Exception as error:
+                if not is_auth_error(error):
+                    raise
+                return getattr(self.refresh(client), name)(*args, **kwargs)
+        return call
+
+
+def get_garmin_client(email, password, tokenstore=DEFAULT_TOKENSTORE, client_cls=Garmin):
+    try:
+        return ReauthClient(email, password, tokenstore, client_cls)
     except Exception as e:
         logger.error(f"Failed to login to Garmin Connect: {e}")
         return None
 
-    return client
-
 # Usage
 def load_credentials():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
     creds_path = os.path.join(script_dir, "credentials.json")
     with open(creds_path) as f:
         credentials = json.load(f)
@@ -0,0 +1,192 @@
+import time
+import random
+import logging
+import threading
+from collections import Counter, deque
+from functools import wraps
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from garminconnect import (
+    GarminConnectAuthenticationError,
+    GarminConnectConnectionError,
+    GarminConnectTooManyRequestsError
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0  # seconds
+DEFAULT_MAX_DELAY = 120.0  # seconds
+RETRIED_METHODS = ("get_activities_by_date", "get_activity", "download_activity")
+
+
+def _responses(error):
+    """HTTP responses attached to an error or to the error it wraps."""
+    for err in (error, error.__cause__, error.__context__):
+        response = getattr(err, "response", None)
+        if response is not None:
+            yield response
+
+
+def get_status_code(error):
+    for response in _responses(error):
+        status = getattr(response, "status_code", None)
+        if status is not None:
+            return status
+    return None
+
+
+def get_retry_after(error):
+    """Seconds requested by a Retry-After header (delay or HTTP date), or None."""
+    for response in _responses(error):
+        value = (getattr(response, "headers", None) or {}).get("Retry-After")
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def is_retryable(error):
+    """Rate limiting, server errors, timeouts and dropped connections are transient."""
+    status = get_status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(error, GarminConnectAuthenticationError):
+        return False
+    return isinstance(error, (
+        GarminConnectTooManyRequestsError,
+        GarminConnectConnectionError,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        ConnectionError,
+        TimeoutError
+    ))
+
+
+class CircuitBreaker:
+    """
+    Opens when at least `failure_threshold` of the last `window` calls failed.
+    While open, every caller waits `cooldown` seconds before its next call,
+    which pauses the whole fetch pipeline instead of hammering the API.
+    The first call after the cooldown is a trial (half-open): a failure opens
+    the circuit again right away, a success closes it.
+    `clock` and `sleep` default to time.monotonic and time.sleep.
+    """
+    def __init__(self, window=20, failure_threshold=0.5, min_calls=10, cooldown=60.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._clock = clock
+        self._sleep = sleep
+        self._outcomes = deque(maxlen=window)
+        self._open_until = 0.0
+        self._half_open = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._open_until > self._clock():
+                return "open"
+            return "half_open" if self._half_open else "closed"
+
+    def wait(self):
+        with self._lock:
+            delay = self._open_until - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+
+    def _open(self):
+        self._open_until = self._clock() + self.cooldown
+        self._outcomes.clear()
+        self._half_open = True
+
+    def record(self, success):
+        """Record a call outcome. Returns True when this call opened the circuit."""
+        with self._lock:
+            if self._half_open and self._open_until <= self._clock():
+                self._half_open = False
+                if not success:
+                    self._open()
+                    return True
+                return False
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_threshold:
+                self._open()
+                return True
+            return False
+
+
+class RetryingClient:
+    """
+    Wraps a Garmin client so that `get_activities_by_date`, `get_activity` and
+    `download_activity` are retried on transient errors, with jittered
+    exponential backoff (or the server's Retry-After), behind a shared
+    circuit breaker. `stats` counts calls, retries, failures and circuit opens.
+    Every other attribute is passed through unchanged.
+    """
+    def __init__(self, client, max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY, circuit_breaker=None, sleep=time.sleep):
+        self._client = client
+        self._sleep = sleep
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def backoff_delay(self, attempt, error):
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Full jitter: uniform between 0 and the exponential cap
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, method, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.circuit_breaker.wait()
+            self._count("calls")
+            try:
+                result = method(*args, **kwargs)
+            except Exception as error:
+                if self.circuit_breaker.record(False):
+                    self._count("circuit_opens")
+                    logger.warning(f"Too many Garmin Connect errors, pausing for {self.circuit_breaker.cooldown:.0f}s")
+                if not is_retryable(error) or attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = self.backoff_delay(attempt, error)
+                self._count("retries")
+                logger.info(f"{method.__name__} failed ({error}), retrying in {delay:.1f}s")
+                self._sleep(delay)
+            else:
+                self.circuit_breaker.record(True)
+                return result
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in RETRIED_METHODS:
+            return attr
+
+        @wraps(attr)
+        def call(*args, **kwargs):
+            return self.call(attr, *args, **kwargs)
+        return call
@@ -0,0 +1,260 @@
+"""
+Heatmap of every GPX track under data/raw, pre-rendered as a pyramid of map tiles.
+
+Each zoom level holds, per pixel, the number of activities whose track crosses
+it: counts are kept per tile in data/heatmap/counts/<z>/<x>/<y>.npz and drawn
+to static/heatmap/<z>/<x>/<y>.png, which Streamlit serves to the Heatmap tab.
+A run only rasterizes the tracks added since the previous one and re-renders
+the tiles they touch; zoom levels are rendered by parallel workers.
+
+Usage:
+    python heatmap.py [--workers 4] [--rebuild]
+"""
+import os
+import json
+import zlib
+import shutil
+import struct
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from actions.trackpoint_cache import load_trackpoint_columns
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(script_dir, "data", "raw")
+COUNTS_DIR = os.path.join(script_dir, "data", "heatmap")
+TILES_DIR = os.path.join(script_dir, "static", "heatmap")
+STATE_FILE = "state.json"
+
+TILE_SIZE = 256
+MIN_ZOOM = 3
+MAX_ZOOM = 15
+MAX_LATITUDE = 85.05112878  # Web Mercator limit
+# GPS dropouts longer than this are not drawn as a line
+MAX_GAP_M = 200.0
+EARTH_RADIUS_M = 6378137.0
+# Tracks rasterized together before their counts are added to the tiles
+BATCH_TRACKS = 100
+# Touched tiles kept in memory by a worker before they are written out
+MAX_PENDING_TILES = 1024
+# Number of activities at which a pixel reaches the hottest colour
+SATURATION_COUNT = 50
+
+
+def pixel_coordinates(latitudes, longitudes, zoom):
+    """Web Mercator pixel coordinates at `zoom` (float, origin at the top left of the world)."""
+    world = TILE_SIZE * 2 ** zoom
+    latitudes = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))
+    x = (np.asarray(longitudes) + 180.0) / 360.0 * world
+    y = (1.0 - np.log(np.tan(latitudes) + 1.0 / np.cos(latitudes)) / np.pi) / 2.0 * world
+    return np.clip(x, 0, world - 1), np.clip(y, 0, world - 1)
+
+
+def track_pixels(latitudes, longitudes, zoom):
+    """Pixel ids (y * world size + x) crossed by a track at `zoom`, each once."""
+    latitudes = np.asarray(latitudes, dtype="float64")
+    longitudes = np.asarray(longitudes, dtype="float64")
+    valid = np.isfinite(latitudes) & np.isfinite(longitudes)
+    latitudes, longitudes = latitudes[valid], longitudes[valid]
+    if len(latitudes) == 0:
+        return np.empty(0, dtype="int64")
+    x, y = pixel_coordinates(latitudes, longitudes, zoom)
+    dx, dy = np.diff(x), np.diff(y)
+    # One sample per pixel along each segment, none along the gaps
+    steps = np.maximum(np.ceil(np.maximum(np.abs(dx), np.abs(dy))), 1).astype("int64")
+    gap_m = np.hypot(
+        np.radians(np.diff(longitudes)) * np.cos(np.radians(latitudes[:-1])),
+        np.radians(np.diff(latitudes)),
+    ) * EARTH_RADIUS_M
+    steps[gap_m > MAX_GAP_M] = 1
+    dx[gap_m > MAX_GAP_M] = dy[gap_m > MAX_GAP_M] = 0
+    segment = np.repeat(np.arange(len(steps)), steps)
+    t = (np.arange(len(segment)) - np.repeat(np.cumsum(steps) - steps, steps)) / steps[segment]
+    xs = np.append(x[segment] + t * dx[segment], x[-1]).astype("int64")
+    ys = np.append(y[segment] + t * dy[segment], y[-1]).astype("int64")
+    world = TILE_SIZE * 2 ** zoom
+    return np.unique(ys * world + xs)
+
+
+def counts_path(counts_dir, zoom, tile_x, tile_y):
+    return os.path.join(counts_dir, "counts", str(zoom), str(tile_x), f"{tile_y}.npz")
+
+
+def tile_path(tiles_dir, zoom, tile_x, tile_y):
+    return os.path.join(tiles_dir, str(zoom), str(tile_x), f"{tile_y}.png")
+
+
+def encode_png(rgba):
+    """8-bit RGBA PNG of an (height, width, 4) uint8 array."""
+    height, width, _ = rgba.shape
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    # Filter type 0 (none) before every row
+    raw = np.concatenate([np.zeros((height, 1), dtype="uint8"), rgba.reshape(height, width * 4)], axis=1)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def render_tile(counts):
+    """
+    RGBA heat colours of a tile's counts: transparent where no track passes,
+    then red to yellow to white on a log scale reaching white at SATURATION_COUNT.
+    """
+    heat = np.clip(np.log1p(counts) / np.log1p(SATURATION_COUNT), 0, 1)
+    rgba = np.zeros(counts.shape + (4,), dtype="uint8")
+    rgba[..., 0] = 255
+    rgba[..., 1] = np.clip(heat * 2 - 0.5, 0, 1) * 255
+    rgba[..., 2] = np.clip(heat * 2 - 1, 0, 1) * 255
+    rgba[..., 3] = np.where(counts > 0, 128 + heat * 127, 0)
+    return rgba
+
+
+def _write_tile(dirs, zoom, tile_x, tile_y, counts):
+    """Add counts to the tile's stored ones, then re-render its image."""
+    counts_dir, tiles_dir = dirs
+    path = counts_path(counts_dir, zoom, tile_x, tile_y)
+    if os.path.exists(path):
+        with np.load(path) as stored:
+            counts = counts + stored["counts"]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, counts=counts)
+    png_path = tile_path(tiles_dir, zoom, tile_x, tile_y)
+    os.makedirs(os.path.dirname(png_path), exist_ok=True)
+    tmp_path = png_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_png(render_tile(counts)))
+    os.replace(tmp_path, png_path)
+
+
+def _add_pixels(pending, pixel_ids, zoom):
+    """Add per-pixel activity counts to the pending tiles."""
+    world = TILE_SIZE * 2 ** zoom
+    pixel_ids, counts = np.unique(pixel_ids, return_counts=True)
+    ys, xs = np.divmod(pixel_ids, world)
+    tile_keys = (ys // TILE_SIZE) * (world // TILE_SIZE) + xs // TILE_SIZE
+    order = np.argsort(tile_keys, kind="stable")
+    tile_keys, ys, xs, counts = tile_keys[order], ys[order], xs[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, tile_keys[1:] != tile_keys[:-1]])
+    for start, end in zip(starts, np.r_[starts[1:], len(tile_keys)]):
+        tile = (int(xs[start] // TILE_SIZE), int(ys[start] // TILE_SIZE))
+        if tile not in pending:
+            pending[tile] = np.zeros((TILE_SIZE, TILE_SIZE), dtype="uint32")
+        pending[tile][ys[start:end] % TILE_SIZE, xs[start:end] % TILE_SIZE] += counts[start:end].astype("uint32")
+
+
+def render_zoom(zoom, gpx_paths, dirs=(COUNTS_DIR, TILES_DIR)):
+    """
+    Rasterize the tracks at one zoom level into the tiles of the (counts, images)
+    folders. Returns the number of tiles written.
+    """
+    pending = {}
+    written = set()
+
+    def flush():
+        for (tile_x, tile_y), counts in pending.items():
+            _write_tile(dirs, zoom, tile_x, tile_y, counts)
+            written.add((tile_x, tile_y))
+        pending.clear()
+
+    for start in range(0, len(gpx_paths), BATCH_TRACKS):
+        batch = []
+        for gpx_file_path in gpx_paths[start:start + BATCH_TRACKS]:
+            columns, _ = load_trackpoint_columns(gpx_file_path)
+            batch.append(track_pixels(columns["Latitude"], columns["Longitude"], zoom))
+        if batch:
+            _add_pixels(pending, np.concatenate(batch), zoom)
+        if len(pending) > MAX_PENDING_TILES:
+            flush()
+    flush()
+    return len(written)
+
+
+def find_gpx_files(raw_dir=RAW_DIR):
+    return sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(raw_dir)
+        for name in files if name.lower().endswith(".gpx")
+    )
+
+
+def _load_state(counts_dir):
+    try:
+        with open(os.path.join(counts_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(counts_dir, state):
+    os.makedirs(counts_dir, exist_ok=True)
+    tmp_file = os.path.join(counts_dir, STATE_FILE + ".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, os.path.join(counts_dir, STATE_FILE))
+
+
+def update_heatmap(raw_dir=RAW_DIR, workers=None, rebuild=False, zooms=range(MIN_ZOOM, MAX_ZOOM + 1),
+                   counts_dir=COUNTS_DIR, tiles_dir=TILES_DIR):
+    """
+    Render the tracks not yet in the heatmap (all of them with `rebuild`).
+    Counts only ever grow, so a track that changed or disappeared since it was
+    rendered, or an interrupted run, triggers a rebuild. Returns {zoom: tiles written}.
+    """
+    state = {} if rebuild else _load_state(counts_dir)
+    zooms = list(zooms)
+    if state.get("zooms", zooms) != zooms or state.get("in_progress"):
+        state = {}
+    rendered = state.get("tracks", {})
+    tracks = {}
+    for gpx_file_path in find_gpx_files(raw_dir):
+        try:
+            _, meta = load_trackpoint_columns(gpx_file_path)
+        except Exception as e:
+            logger.warning(f"Skipping {gpx_file_path}: {e}")
+            continue
+        tracks[os.path.relpath(gpx_file_path, raw_dir)] = meta["sha256"]
+    if any(tracks.get(name) != sha256 for name, sha256 in rendered.items()):
+        logger.info("Tracks changed or removed since the last run, rebuilding the heatmap")
+        rendered = {}
+    if not rendered:
+        shutil.rmtree(os.path.join(counts_dir, "counts"), ignore_errors=True)
+        shutil.rmtree(tiles_dir, ignore_errors=True)
+
+    new_tracks = [os.path.join(raw_dir, name) for name in tracks if name not in rendered]
+    written = {}
+    if new_tracks:
+        _save_state(counts_dir, {"zooms": zooms, "tracks": rendered, "in_progress": True})
+        # Zoom levels write to separate folders, so each one gets its own worker
+        with ProcessPoolExecutor(workers) as executor:
+            nb_zooms = len(zooms)
+            results = executor.map(render_zoom, zooms, [new_tracks] * nb_zooms, [(counts_dir, tiles_dir)] * nb_zooms)
+            written = dict(zip(zooms, results))
+    _save_state(counts_dir, {"zooms": zooms, "tracks": tracks})
+    logger.info(f"Rendered {len(new_tracks)} new tracks into {sum(written.values())} tiles")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the activity heatmap tiles")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="parallel zoom levels (default: one per CPU)")
+    parser.add_argument("--rebuild", action="store_true", help="render every track again")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    update_heatmap(args.raw_dir, args.workers, args.rebuild)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import queue
+import logging
+import threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 2
+_DONE = object()
+
+
+def _put(out_queue, item, stop_event):
+    """Blocking put that gives up when the pipeline is being stopped."""
+    while not stop_event.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(in_queue, stop_event):
+    """Blocking get that gives up when the pipeline is being stopped."""
+    while not stop_event.is_set():
+        try:
+            return in_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def run_week_pipeline(weeks, fetch, preprocess, persist, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Run fetch -> preprocess -> persist for every week as a three-stage pipeline.
+
+    - fetch(week) runs in its own thread and returns the raw data (or None).
+    - preprocess(week, raw) runs in its own thread and returns the processed data.
+    - persist(week, processed, error) runs in the calling thread, so it may use
+      objects bound to it (e.g. a sqlite3 connection). Weeks are persisted in
+      the order they were given; `error` is the exception raised by an earlier
+      stage for that week, in which case `processed` is None.
+
+    Bounded queues between the stages (`queue_size` weeks each) provide
+    backpressure: fetching never runs more than a few weeks ahead of the
+    database writes.
+    """
+    fetched = queue.Queue(maxsize=queue_size)
+    preprocessed = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+
+    def fetch_stage():
+        try:
+            for week in weeks:
+                try:
+                    item = (week, fetch(week), None)
+                except Exception as error:
+                    item = (week, None, error)
+                if not _put(fetched, item, stop_event):
+                    return
+        finally:
+            _put(fetched, _DONE, stop_event)
+
+    def preprocess_stage():
+        try:
+            while True:
+                item = _get(fetched, stop_event)
+                if item is _DONE:
+                    return
+                week, raw, error = item
+                processed = None
+                if error is None and raw is not None:
+                    try:
+                        processed = preprocess(week, raw)
+                    except Exception as stage_error:
+                        error = stage_error
+                if not _put(preprocessed, (week, processed, error), stop_event):
+                    return
+        finally:
+            _put(preprocessed, _DONE, stop_event)
+
+    threads = [
+        threading.Thread(target=fetch_stage, name="pipeline-fetch", daemon=True),
+        threading.Thread(target=preprocess_stage, name="pipeline-preprocess", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = _get(preprocessed, stop_event)
+            if item is _DONE:
+                break
+            week, processed, error = item
+            persist(week, processed, error)
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
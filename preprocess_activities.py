@@ -1,16 +1,20 @@
 import os
+import json
+import numpy as np
 import pandas as pd
-from datetime import timedelta
 import logging
+import datetime
+from db_schema import ACTIVITY_KEY, bump_data_version, migrate
+from rollups import get_activity_periods, refresh_rollups
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-def load_and_clean_data(df):
-    """Load and clean data from a raw DataFrame."""
-    numeric_cols = [
+# Declared dtype of every numeric activity column
+NUMERIC_COLUMNS = {
+    col: 'float64' for col in [
         'averageHR', 'maxHR', 'minHR', 'distance', 'calories', 'averageTemperature',
         'maxTemperature', 'minTemperature', 'waterEstimated', 'elevationGain',
         'elevationLoss', 'maxElevation', 'minElevation', 'averageSpeed', 'maxSpeed',
@@ -18,20 +22,61 @@ def load_and_clean_data(df):
         'averageSwolf', 'averageSwimCadence', 'maxSwimCadence', 'trainingEffect',
         'moderateIntensityMinutes', 'vigorousIntensityMinutes', 'steps', 'differenceBodyBattery'
     ]
-    for col in numeric_cols:
+}
+# Placeholder cells (Garmin CSV exports write '--' for "no value") and the number they stand for
+NUMERIC_NA_TOKENS = {'--': 0}
+DECIMAL_SEPARATORS = [',']
+
+def parse_numeric(series, dtype='float64'):
+    """
+    Parse a numeric column to `dtype`. Numbers and numeric strings are
+    converted directly; only the remaining text cells go through the
+    placeholder and decimal comma handling. Booleans are not numbers: they
+    become NaN, as their 'True'/'False' text always did.
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return pd.Series(np.nan, index=series.index, dtype=dtype)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(dtype)
+    values = pd.to_numeric(series, errors='coerce')
+    if series.dtype == object:
+        # to_numeric reads True/False cells as 1/0
+        values = values.mask(series.map(type).isin([bool, np.bool_]))
+    text_cells = values.isna() & series.notna()
+    if text_cells.any():
+        text = series[text_cells].astype(str).str.strip()
+        for separator in DECIMAL_SEPARATORS:
+            text = text.str.replace(separator, '.', regex=False)
+        text = text.replace(NUMERIC_NA_TOKENS)
+        values = values.astype(dtype)
+        values[text_cells] = pd.to_numeric(text, errors='coerce')
+    return values.astype(dtype)
+
+def format_durations(durations):
+    """Vectorized "HH:MM:SS" formatting of durations in seconds (None when missing)."""
+    seconds = durations.to_numpy(dtype='float64')
+    missing = np.isnan(seconds)
+    seconds = np.floor(np.where(missing, 0, seconds)).astype('int64')
+    parts = [seconds // 3600, (seconds % 3600) // 60, seconds % 60]
+    hours, minutes, secs = (pd.Series(part, index=durations.index).astype(str).str.zfill(2) for part in parts)
+    formatted = (hours + ':' + minutes + ':' + secs).astype(object)
+    formatted[missing] = None
+    return formatted
+
+def load_and_clean_data(df):
+    """Load and clean data from a raw DataFrame."""
+    for col, dtype in NUMERIC_COLUMNS.items():
         if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(',', '.').str.replace('--', '0')
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+            df[col] = parse_numeric(df[col], dtype)
     df['distance'] = df['distance'] / 1000  # Convert distance to kilometers
     if 'startTimeLocal' in df.columns:
         df['startTimeLocal'] = pd.to_datetime(df['startTimeLocal'])
         df['Day'] = df['startTimeLocal'].dt.date
-        df['Week'] = df['startTimeLocal'].apply(lambda x: (x - timedelta(days=x.dayofweek))).dt.date
+        # Monday of the week, as a date
+        df['Week'] = (df['startTimeLocal'].dt.normalize() - pd.to_timedelta(df['startTimeLocal'].dt.dayofweek, unit='D')).dt.date
         df['Month'] = df['startTimeLocal'].to_numpy().astype('datetime64[M]')
     if 'duration' in df.columns:
-        df['durationFormatted'] = df['duration'].apply(
-            lambda x: f"{int(x // 3600):02d}:{int((x % 3600) // 60):02d}:{int(x % 60):02d}"
-        )
+        df['durationFormatted'] = format_durations(pd.to_numeric(df['duration'], errors='coerce'))
     return df
 
 def split_biking_musculation_activities_2023(df):
@@ -66,100 +111,199 @@ def harmonize_zwift_activities(df):
     """Harmonize heart rate values for Zwift activities."""
     if not all(col in df.columns for col in ['startTimeLocal', 'activityName', 'averageHR', 'maxHR']):
         return df
-    unique_days = df['Day'].unique()
-    for day in unique_days:
-        max_avg_hr = df.loc[(df['Day'] == day) & (df['activityName'] == "Cardio Zwift"), 'averageHR'].max()
-        max_max_hr = df.loc[(df['Day'] == day) & (df['activityName'] == "Cardio Zwift"), 'maxHR'].max()
-        df.loc[(df['Day'] == day) & (df['activityName'].str.startswith('Zwift', na=False)), 'averageHR'] = max_avg_hr
-        df.loc[(df['Day'] == day) & (df['activityName'].str.startswith('Zwift', na=False)), 'maxHR'] = max_max_hr
-    df = df.loc[df['activityName'] != "Cardio Zwift"]
+    cardio = df['activityName'] == "Cardio Zwift"
+    zwift = df['activityName'].str.startswith('Zwift', na=False) & df['Day'].notna()
+    # Max HR of the day's "Cardio Zwift" rows, broadcast to every row of that day (NaN without one)
+    day_max_hr = df[['averageHR', 'maxHR']].where(cardio).groupby(df['Day']).transform('max')
+    df.loc[zwift, ['averageHR', 'maxHR']] = day_max_hr.loc[zwift]
+    df = df.loc[~cardio]
     return df
 
-def standardize_activity_types(df):
+ACTIVITY_TYPE_MAPPING = {
+    'cycling': 'cycling',
+    'biking': 'cycling',
+    'virtual_ride': 'cycling',
+    'running': 'running',
+    'swimming': 'swimming',
+    'rowing': 'rowing',
+    'walking': 'hiking',
+    'hiking': 'hiking',
+    'strength_training': 'musculation',
+    'backcountry_skiing': 'backcountry_skiing',
+    'cross_country_skiing_ws': 'cross_country_skiing',
+    'skate_skiing_ws': 'cross_country_skiing',
+    'resort_skiing': 'skiing',
+    'fitness_equipment': 'physical_reinforcement',
+    'indoor_cardio': 'physical_reinforcement',
+}
+# Optional JSON object {"activityType substring": "group"} replacing ACTIVITY_TYPE_MAPPING, order matters
+ACTIVITY_TYPE_MAPPING_FILE = os.path.join(script_dir, "data", "activity_type_mapping.json")
+
+def load_activity_mapping(path=ACTIVITY_TYPE_MAPPING_FILE):
+    """Activity type mapping from `path` when it exists, else the built-in one."""
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return ACTIVITY_TYPE_MAPPING
+
+def classify_activity_type(activity_type, activity_mapping):
+    """
+    Group of one activity type: the last mapping key contained in it wins
+    (case-insensitive), then any 'gym' type is 'gym_fitness'.
+    """
+    if not isinstance(activity_type, str):
+        return None
+    activity_type = activity_type.lower()
+    grouped = None
+    for old, new in activity_mapping.items():
+        if old.lower() in activity_type:
+            grouped = new
+    if 'gym' in activity_type:
+        grouped = 'gym_fitness'
+    return grouped
+
+def standardize_activity_types(df, activity_mapping=None):
     """Standardize activity types for better categorization."""
     if 'activityType' not in df.columns:
         return df
+    if activity_mapping is None:
+        activity_mapping = load_activity_mapping()
 
-    activity_mapping = {
-        'cycling': 'cycling',
-        'biking': 'cycling',
-        'virtual_ride': 'cycling',
-        'running': 'running',
-        'swimming': 'swimming',
-        'rowing': 'rowing',
-        'walking': 'hiking',
-        'hiking': 'hiking',
-        'strength_training': 'musculation',
-        'backcountry_skiing': 'backcountry_skiing',
-        'cross_country_skiing_ws': 'cross_country_skiing',
-        'skate_skiing_ws': 'cross_country_skiing',
-        'resort_skiing': 'skiing',
-        'fitness_equipment': 'physical_reinforcement',
-        'indoor_cardio': 'physical_reinforcement',
-    }
-
-    df['activityTypeGrouped'] = None  # Initialize the column
+    # Classify each distinct type once, then broadcast back through the factorized codes
+    codes, activity_types = pd.factorize(df['activityType'])
+    # Missing types get code -1, i.e. the trailing None / False
+    grouped = np.array([classify_activity_type(t, activity_mapping) for t in activity_types] + [None], dtype=object)
+    is_swim = np.array([isinstance(t, str) and 'swim' in t.lower() for t in activity_types] + [False])
 
-    for old, new in activity_mapping.items():
-        df.loc[df['activityType'].str.contains(old, case=False, na=False), 'activityTypeGrouped'] = new
-
-    # Handle gym activities
-    df.loc[df['activityType'].str.contains('gym', case=False, na=False), 'activityTypeGrouped'] = 'gym_fitness'
+    df['activityTypeGrouped'] = pd.Series(grouped[codes], index=df.index, dtype=object)
 
     # Handle swimming distance
-    df.loc[(df['activityType'].str.contains('swim', case=False, na=False)) & (df['distance'] > 100), 'distance'] /= 1000
+    df.loc[is_swim[codes] & (df['distance'] > 100), 'distance'] /= 1000
 
     return df
 
+TRAINING_RACE_PERIODS = [
+    {'start': '2022-05-02', 'end': '2022-07-15', 'distance': 'Olympic', 'race': 'Magog 2022'},
+    {'start': '2022-05-02', 'end': '2022-09-09', 'distance': 'Olympic', 'race': 'Esprint Montréal 2022'},
+    {'start': '2023-01-06', 'end': '2023-07-14', 'distance': 'Olympic', 'race': 'Magog 2023'},
+    {'start': '2023-01-06', 'end': '2023-08-19', 'distance': '70.3', 'race': 'Mont Tremblant 2023'},
+    {'start': '2023-01-06', 'end': '2023-09-09', 'distance': 'Sprint', 'race': 'Esprint Montréal 2023'},
+    {'start': '2023-01-06', 'end': '2024-06-21', 'distance': 'Olympic', 'race': 'Mont Tremblant 2024'},
+    {'start': '2023-12-04', 'end': '2024-07-13', 'distance': '140.6', 'race': 'Vitoria Gasteiz 2024'},
+    {'start': '2024-12-30', 'end': '2025-09-06', 'distance': '70.3', 'race': 'Santa Cruz 2025'},
+    {'start': '2024-12-30', 'end': '2025-09-20', 'distance': '70.3', 'race': 'Cervia 2025'}
+]
+OFF_SEASON_FALSE_PERIODS = [
+    {'start': '2022-05-02', 'end': '2022-09-10'},
+    {'start': '2023-01-06', 'end': '2023-09-10'},
+    {'start': '2023-12-04', 'end': '2024-07-14'},
+    {'start': '2024-12-30', 'end': '2025-09-21'}
+]
+
 def assign_periods(row):
-    """Assign training periods and off-season status."""
-    training_race_periods = [
-        {'start': '2022-05-02', 'end': '2022-07-15', 'distance': 'Olympic', 'race': 'Magog 2022'},
-        {'start': '2022-05-02', 'end': '2022-09-09', 'distance': 'Olympic', 'race': 'Esprint Montréal 2022'},
-        {'start': '2023-01-06', 'end': '2023-07-14', 'distance': 'Olympic', 'race': 'Magog 2023'},
-        {'start': '2023-01-06', 'end': '2023-08-19', 'distance': '70.3', 'race': 'Mont Tremblant 2023'},
-        {'start': '2023-01-06', 'end': '2023-09-09', 'distance': 'Sprint', 'race': 'Esprint Montréal 2023'},
-        {'start': '2023-01-06', 'end': '2024-06-21', 'distance': 'Olympic', 'race': 'Mont Tremblant 2024'},
-        {'start': '2023-12-04', 'end': '2024-07-13', 'distance': '140.6', 'race': 'Vitoria Gasteiz 2024'},
-        {'start': '2024-12-30', 'end': '2025-09-06', 'distance': '70.3', 'race': 'Santa Cruz 2025'},
-        {'start': '2024-12-30', 'end': '2025-09-20', 'distance': '70.3', 'race': 'Cervia 2025'}
-    ]
-    off_season_false_periods = [
-        {'start': '2022-05-02', 'end': '2022-09-10'},
-        {'start': '2023-01-06', 'end': '2023-09-10'},
-        {'start': '2023-12-04', 'end': '2024-07-14'},
-        {'start': '2024-12-30', 'end': '2025-09-21'}
-    ]
+    """Assign training periods and off-season status (row-wise reference implementation)."""
     date = row['startTimeLocal']
     races = []
     off_season = True
-    for period in training_race_periods:
+    for period in TRAINING_RACE_PERIODS:
         if pd.to_datetime(period['start']) <= date <= pd.to_datetime(period['end']):
             races.append(period['race'])
-    for period in off_season_false_periods:
+    for period in OFF_SEASON_FALSE_PERIODS:
         if pd.to_datetime(period['start']) <= date <= pd.to_datetime(period['end']):
             off_season = False
     return pd.Series({'trainingRace': races, 'offSeason': off_season})
 
+def _period_segments(periods, dates):
+    """
+    For each date, the index of the segment it falls in between the sorted
+    period boundaries, and for each segment which periods cover it.
+    Periods are inclusive on both ends, like in `assign_periods`.
+    """
+    starts = pd.to_datetime([period['start'] for period in periods]).to_numpy(dtype='datetime64[ns]')
+    ends = pd.to_datetime([period['end'] for period in periods]).to_numpy(dtype='datetime64[ns]') + np.timedelta64(1, 'ns')
+    boundaries = np.unique(np.concatenate([starts, ends]))
+    # Coverage is constant between two consecutive boundaries: evaluate it on each left boundary
+    covered = (starts[None, :] <= boundaries[:, None]) & (boundaries[:, None] < ends[None, :])
+    # Segment 0 is before the first boundary and is covered by no period
+    covered = np.vstack([np.zeros((1, len(periods)), dtype=bool), covered])
+    segments = np.searchsorted(boundaries, dates, side='right')
+    segments[np.isnat(dates)] = 0
+    return segments, covered
+
+def assign_periods_batch(df):
+    """Vectorized `assign_periods` over a whole DataFrame, with identical output."""
+    dates = pd.to_datetime(df['startTimeLocal']).to_numpy(dtype='datetime64[ns]')
+
+    segments, covered = _period_segments(TRAINING_RACE_PERIODS, dates)
+    # One race list per segment, shared by the rows of that segment
+    segment_races = [
+        [period['race'] for period, is_covered in zip(TRAINING_RACE_PERIODS, row) if is_covered]
+        for row in covered
+    ]
+    training_race = [segment_races[segment] for segment in segments]
+
+    segments, covered = _period_segments(OFF_SEASON_FALSE_PERIODS, dates)
+    off_season = ~covered.any(axis=1)[segments]
+
+    return pd.DataFrame({'trainingRace': training_race, 'offSeason': off_season}, index=df.index)
+
+OUTPUT_COLUMNS = [
+    'activityId', 'activityName', 'activityType', 'activityTypeGrouped',
+    'startTimeLocal', 'Day', 'Week', 'Month', 'duration', 'durationFormatted',
+    'distance', 'calories', 'averageHR', 'maxHR', 'minHR', 'averageTemperature',
+    'maxTemperature', 'minTemperature', 'waterEstimated', 'elevationGain',
+    'elevationLoss', 'maxElevation', 'minElevation', 'averageSpeed', 'maxSpeed',
+    'averageRunCadence', 'maxRunCadence', 'totalNumberOfStrokes', 'averageStrokeDistance',
+    'averageSwolf', 'averageSwimCadence', 'maxSwimCadence', 'trainingEffect',
+    'trainingEffectLabel', 'moderateIntensityMinutes', 'vigorousIntensityMinutes',
+    'steps', 'locationName', 'differenceBodyBattery', 'trainingRace', 'offSeason'
+]
+
+def _sql_value(value):
+    """A DataFrame cell as sqlite3 stores it: NULL for missing values, ISO text for dates."""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if not isinstance(value, str) and pd.isna(value):
+        return None
+    return value
+
+def upsert_activities(conn, df):
+    """
+    Insert new activities and update known ones in place. Rows left behind by
+    an activity whose type changed are removed. The caller commits.
+    """
+    columns = list(df.columns)
+    rows = [tuple(_sql_value(value) for value in row) for row in df.itertuples(index=False, name=None)]
+    id_pos, type_pos = columns.index('activityId'), columns.index('activityType')
+    types_by_id = {}
+    for row in rows:
+        types_by_id.setdefault(row[id_pos], []).append(row[type_pos])
+    conn.executemany(
+        "DELETE FROM activities WHERE activityId = ? AND activityType NOT IN (SELECT value FROM json_each(?))",
+        [(activity_id, json.dumps(types)) for activity_id, types in types_by_id.items()]
+    )
+    names = ', '.join(f'"{name}"' for name in columns)
+    placeholders = ', '.join('?' * len(columns))
+    updates = ', '.join(f'"{name}" = excluded."{name}"' for name in columns if name not in ACTIVITY_KEY)
+    conn.executemany(
+        f"INSERT INTO activities ({names}) VALUES ({placeholders}) "
+        f"ON CONFLICT ({', '.join(ACTIVITY_KEY)}) DO UPDATE SET {updates}",
+        rows
+    )
+    return len(rows)
+
 def save_processed_data(conn, df, last_week_date):
     """Save processed data to a CSV file and database."""
     os.makedirs("data/processed", exist_ok=True)
-    output_columns = [
-        'activityId', 'activityName', 'activityType', 'activityTypeGrouped',
-        'startTimeLocal', 'Day', 'Week', 'Month', 'duration', 'durationFormatted',
-        'distance', 'calories', 'averageHR', 'maxHR', 'minHR', 'averageTemperature',
-        'maxTemperature', 'minTemperature', 'waterEstimated', 'elevationGain',
-        'elevationLoss', 'maxElevation', 'minElevation', 'averageSpeed', 'maxSpeed',
-        'averageRunCadence', 'maxRunCadence', 'totalNumberOfStrokes', 'averageStrokeDistance',
-        'averageSwolf', 'averageSwimCadence', 'maxSwimCadence', 'trainingEffect',
-        'trainingEffectLabel', 'moderateIntensityMinutes', 'vigorousIntensityMinutes',
-        'steps', 'locationName', 'differenceBodyBattery', 'trainingRace', 'offSeason'
-    ]
-    for col in output_columns:
+    for col in OUTPUT_COLUMNS:
         if col not in df.columns:
             df[col] = None
     # Create an explicit copy of the DataFrame with the selected columns
-    new_df = df[output_columns].copy()
+    new_df = df[OUTPUT_COLUMNS].copy()
     
     # Save the CSV with list format for trainingRace
     output_file = os.path.join(script_dir, f"data/processed/activities_processed_{last_week_date}.csv")
@@ -168,38 +312,49 @@ def save_processed_data(conn, df, last_week_date):
     # Create another DataFrame for SQL storage with joined string format for trainingRace
     sql_df = new_df.copy()
     sql_df.loc[:, 'trainingRace'] = sql_df['trainingRace'].apply(lambda x: ', '.join(x) if isinstance(x, list) else '')
+    # Normalized periods, matching db_schema.PERIOD_COLUMNS
+    start_times = pd.to_datetime(sql_df['startTimeLocal'])
+    sql_df['week_start'] = (start_times.dt.normalize() - pd.to_timedelta(start_times.dt.dayofweek, unit='D')).dt.strftime('%Y-%m-%d')
+    sql_df['month_start'] = start_times.dt.strftime('%Y-%m-01')
     
     # Save to SQL database
     if conn is not None:
-        # Check if the activities table exists
-        table_exists = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table' AND name='activities'", conn).shape[0] > 0
-        
-        if table_exists:
-            # Check for existing activities to avoid duplicates
-            existing_ids = pd.read_sql("SELECT activityId FROM activities", conn)["activityId"].tolist()
-            
-            # Filter out activities that already exist in the database
-            new_activities = sql_df[~sql_df['activityId'].isin(existing_ids)]
-            
-            if not new_activities.empty:
-                new_activities.to_sql("activities", conn, if_exists="append", index=False)
-                print(f"\nAdded {len(new_activities)} new activities to the database.")
-            else:
-                print("\nNo new activities to add to the database.")
-        else:
-            # Create the table if it doesn't exist
-            sql_df.to_sql("activities", conn, if_exists="replace", index=False)
-            print(f"\nCreated activities table with {len(sql_df)} initial records.")
+        # Loads the GPX parser: kept out of the dashboard's imports of db_schema
+        from routes import index_activity_routes
+        migrate(conn)
+        # One transaction: readers never see activities without their rollups, routes and data version
+        conn.execute("BEGIN")
+        try:
+            # Periods to re-aggregate: where the batch lands and where its activities were before
+            weeks, months = get_activity_periods(conn, sql_df['activityId'].dropna().unique())
+            weeks.update(sql_df['week_start'].dropna())
+            months.update(sql_df['month_start'].dropna())
+            # Inserted or updated in place
+            nb_rows = upsert_activities(conn, sql_df)
+            refresh_rollups(conn, weeks, months)
+            # Map framing and location searches read the route table instead of the GPX files
+            index_activity_routes(conn, zip(sql_df['activityId'], start_times.dt.strftime('%Y-%m')))
+            bump_data_version(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"\nUpserted {nb_rows} activities in the database.")
             
     print(f"Processed data saved to CSV.")
     return new_df
 
-def main_preprocess(conn, last_week_date, df_weekly_raw):
-    """Main preprocessing function."""
+def preprocess_weekly_data(df_weekly_raw):
+    """Clean and enrich a week of raw activities, without touching the database."""
     df = load_and_clean_data(df_weekly_raw)
     df = split_biking_musculation_activities_2023(df)
     df = harmonize_zwift_activities(df)
     df = standardize_activity_types(df)
-    df[['trainingRace', 'offSeason']] = df.apply(assign_periods, axis=1)
+    df[['trainingRace', 'offSeason']] = assign_periods_batch(df)
+    return df
+
+def main_preprocess(conn, last_week_date, df_weekly_raw):
+    """Main preprocessing function."""
+    df = preprocess_weekly_data(df_weekly_raw)
     processed_file = save_processed_data(conn, df, last_week_date)
     return processed_file
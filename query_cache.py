@@ -0,0 +1,56 @@
+import time
+import threading
+from collections import Counter, OrderedDict
+
+DEFAULT_MAXSIZE = 256  # cached results
+DEFAULT_TTL = 300.0  # seconds
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results with a time-to-live. Keys include
+    the database's data version, so results cached before an ingest are never
+    returned after it; TTL and size only bound how long stale entries linger.
+    `stats` counts hits, misses, expirations and evictions.
+    """
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = Counter()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared by every dashboard session of the process
+RESULT_CACHE = QueryCache()
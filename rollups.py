@@ -0,0 +1,73 @@
+import json
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rollup table -> period column of `activities` it aggregates on
+ROLLUP_TABLES = {
+    "activity_rollup_week": "week_start",
+    "activity_rollup_month": "month_start",
+}
+
+# Column -> (type, aggregate over the period's activities)
+ROLLUP_MEASURES = {
+    "nb_trainings": ("INTEGER", "COUNT(*)"),
+    "duration": ("REAL", "SUM(duration)"),
+    "distance": ("REAL", "SUM(distance)"),
+    "calories": ("REAL", "SUM(calories)"),
+    "elevationGain": ("REAL", "SUM(elevationGain)"),
+    "totalNumberOfStrokes": ("REAL", "SUM(totalNumberOfStrokes)"),
+    "waterEstimated": ("REAL", "SUM(waterEstimated)"),
+    "vigorousIntensityMinutes": ("REAL", "SUM(vigorousIntensityMinutes)"),
+    # Numerator of the duration-weighted average HR, divided by `duration` when read
+    "hr_duration": ("REAL", "SUM(duration * averageHR)"),
+}
+
+
+def create_rollup_tables(conn):
+    measures = ",\n    ".join(f"{name} {sql_type}" for name, (sql_type, _) in ROLLUP_MEASURES.items())
+    for table, period in ROLLUP_TABLES.items():
+        conn.execute(f"""
+            CREATE TABLE {table} (
+                {period} TEXT NOT NULL,
+                activityTypeGrouped TEXT,
+                {measures},
+                PRIMARY KEY ({period}, activityTypeGrouped)
+            )
+        """)
+
+
+def get_activity_periods(conn, activity_ids):
+    """Weeks and months currently holding these activities in the database."""
+    rows = conn.execute(
+        "SELECT DISTINCT week_start, month_start FROM activities WHERE activityId IN (SELECT value FROM json_each(?))",
+        (json.dumps([int(activity_id) for activity_id in activity_ids]),)
+    ).fetchall()
+    return {week for week, _ in rows}, {month for _, month in rows}
+
+
+def refresh_rollups(conn, weeks=None, months=None):
+    """
+    Recompute the rollup rows of the given weeks and months from `activities`
+    (every period when None). The caller commits.
+    """
+    columns = ", ".join(ROLLUP_MEASURES)
+    aggregates = ", ".join(aggregate for _, aggregate in ROLLUP_MEASURES.values())
+    for (table, period), periods in zip(ROLLUP_TABLES.items(), (weeks, months)):
+        if periods is None:
+            conn.execute(f"DELETE FROM {table}")
+            condition, params = f"{period} IS NOT NULL", ()
+        else:
+            periods = [p for p in periods if p is not None]
+            if not periods:
+                continue
+            condition, params = f"{period} IN (SELECT value FROM json_each(?))", (json.dumps(sorted(periods)),)
+            conn.execute(f"DELETE FROM {table} WHERE {condition}", params)
+        conn.execute(f"""
+            INSERT INTO {table} ({period}, activityTypeGrouped, {columns})
+            SELECT {period}, activityTypeGrouped, {aggregates}
+            FROM activities
+            WHERE {condition}
+            GROUP BY {period}, activityTypeGrouped
+        """, params)
@@ -0,0 +1,164 @@
+import os
+import logging
+import argparse
+import sqlite3
+
+import numpy as np
+
+from actions.decimation import _project, douglas_peucker
+from actions.trackpoint_cache import load_gpx_track
+from db_schema import ROUTE_TABLE, ROUTE_COLUMNS, SEGMENT_TABLE, bump_data_version, migrate
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(script_dir, "data", "raw")
+
+# R*-tree of route pieces: the track is simplified to SEGMENT_TOLERANCE_M, then cut
+# in pieces of at most SEGMENT_POINTS points and about SEGMENT_LENGTH_M (sharing
+# their ends), each indexed by its box.
+# Row ids are activityId * MAX_SEGMENTS + piece number, so an activity's pieces
+# can be deleted by id without scanning the tree.
+SEGMENT_TOLERANCE_M = 5.0
+METERS_PER_DEGREE = 111320.0  # of latitude
+SEGMENT_POINTS = 16
+SEGMENT_LENGTH_M = 500.0
+MAX_SEGMENTS = 1 << 16
+
+
+def route_segments(latitudes, longitudes):
+    """(min_lat, max_lat, min_lon, max_lon) of each piece of a track, in track order."""
+    latitudes = np.asarray(latitudes, dtype="float64")
+    longitudes = np.asarray(longitudes, dtype="float64")
+    valid = np.isfinite(latitudes) & np.isfinite(longitudes)
+    latitudes, longitudes = latitudes[valid], longitudes[valid]
+    if len(latitudes) == 0:
+        return np.empty((0, 4))
+    x, y = _project(latitudes, longitudes)
+    kept = douglas_peucker(x, y, SEGMENT_TOLERANCE_M)
+    latitudes, longitudes = latitudes[kept], longitudes[kept]
+    lengths = np.hypot(np.diff(x[kept]), np.diff(y[kept]))
+    # Pieces close once they reach SEGMENT_POINTS points or SEGMENT_LENGTH_M
+    bounds = [0]
+    length = 0.0
+    for i, edge in enumerate(lengths, start=1):
+        length += edge
+        if i - bounds[-1] >= SEGMENT_POINTS - 1 or length >= SEGMENT_LENGTH_M:
+            bounds.append(i)
+            length = 0.0
+    if bounds[-1] != len(latitudes) - 1:
+        bounds.append(len(latitudes) - 1)
+    if len(bounds) - 1 > MAX_SEGMENTS:
+        # Fewer, longer pieces for the rare track that would need more rows than its id range
+        thinned = bounds[::-(-(len(bounds) - 1) // (MAX_SEGMENTS - 1))]
+        bounds = thinned if thinned[-1] == bounds[-1] else thinned + [bounds[-1]]
+    pieces = zip(bounds[:-1], bounds[1:]) if len(bounds) > 1 else [(0, 0)]
+    boxes = np.array([
+        (latitudes[s:e + 1].min(), latitudes[s:e + 1].max(), longitudes[s:e + 1].min(), longitudes[s:e + 1].max())
+        for s, e in pieces
+    ])
+    # Widened by the simplification tolerance, so every original point stays inside its piece's box
+    lat_pad = SEGMENT_TOLERANCE_M / METERS_PER_DEGREE
+    lon_pad = lat_pad / max(np.cos(np.radians(np.abs(latitudes).max())), 1e-6)
+    return boxes + np.array([-lat_pad, lat_pad, -lon_pad, lon_pad])
+
+
+def summarize_route(latitudes, longitudes):
+    """ROUTE_COLUMNS values of a track, None when it has no position."""
+    latitudes = np.asarray(latitudes, dtype="float64")
+    longitudes = np.asarray(longitudes, dtype="float64")
+    valid = np.isfinite(latitudes) & np.isfinite(longitudes)
+    if not valid.any():
+        return None
+    latitudes, longitudes = latitudes[valid], longitudes[valid]
+    return {
+        "min_lat": latitudes.min(),
+        "min_lon": longitudes.min(),
+        "max_lat": latitudes.max(),
+        "max_lon": longitudes.max(),
+        "centroid_lat": latitudes.mean(),
+        "centroid_lon": longitudes.mean(),
+        "start_lat": latitudes[0],
+        "start_lon": longitudes[0],
+        "end_lat": latitudes[-1],
+        "end_lon": longitudes[-1],
+        "nb_points": len(latitudes),
+    }
+
+
+def activity_gpx_path(activity_id, month, raw_dir=RAW_DIR):
+    """GPX export of an activity, as downloaded in data/raw/<YYYY-MM>/<activityId>/."""
+    return os.path.join(raw_dir, month, str(activity_id), f"{activity_id}.gpx")
+
+
+def save_route(conn, activity_id, latitudes, longitudes):
+    """
+    Write the summary and the segments of an activity's track, replacing its
+    previous ones. Returns False for a track without position. The caller commits.
+    """
+    summary = summarize_route(latitudes, longitudes)
+    if summary is None:
+        return False
+    activity_id = int(activity_id)
+    segments = route_segments(latitudes, longitudes)
+    previous = conn.execute(f"SELECT nb_segments FROM {ROUTE_TABLE} WHERE activityId = ?", (activity_id,)).fetchone()
+    if previous is not None:
+        conn.executemany(
+            f"DELETE FROM {SEGMENT_TABLE} WHERE id = ?",
+            [(activity_id * MAX_SEGMENTS + i,) for i in range(previous[0])]
+        )
+    conn.executemany(
+        f"INSERT INTO {SEGMENT_TABLE} (id, min_lat, max_lat, min_lon, max_lon, activityId) VALUES (?, ?, ?, ?, ?, ?)",
+        [(activity_id * MAX_SEGMENTS + i, *map(float, box), activity_id) for i, box in enumerate(segments)]
+    )
+    columns = ["activityId", *ROUTE_COLUMNS, "nb_segments"]
+    conn.execute(
+        f"INSERT OR REPLACE INTO {ROUTE_TABLE} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        (activity_id, *(float(summary[name]) for name in ROUTE_COLUMNS), len(segments))
+    )
+    return True
+
+
+def index_activity_routes(conn, activities, raw_dir=RAW_DIR):
+    """
+    Index the GPX track of each (activityId, 'YYYY-MM' month) in the route and
+    segment tables. Activities without a GPX file are skipped. The caller commits.
+    Returns the number of routes indexed.
+    """
+    nb_routes = 0
+    for activity_id, month in dict(activities).items():
+        gpx_file_path = activity_gpx_path(activity_id, month, raw_dir)
+        if not os.path.exists(gpx_file_path):
+            continue
+        try:
+            latitudes, longitudes = load_gpx_track(gpx_file_path)
+        except Exception as e:
+            logger.warning(f"Could not index the route of activity {activity_id}: {e}")
+            continue
+        nb_routes += save_route(conn, activity_id, latitudes, longitudes)
+    return nb_routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the routes of the activities already in the database")
+    parser.add_argument("--db", default=os.path.join(script_dir, "activities.db"))
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    conn = sqlite3.connect(args.db)
+    migrate(conn)
+    activities = conn.execute(
+        "SELECT DISTINCT activityId, strftime('%Y-%m', startTimeLocal) FROM activities WHERE startTimeLocal IS NOT NULL"
+    ).fetchall()
+    nb_routes = index_activity_routes(conn, activities, args.raw_dir)
+    # Cached route, area and extent results were computed before the backfill
+    bump_data_version(conn)
+    conn.commit()
+    conn.close()
+    logger.info(f"Indexed {nb_routes} routes of {len(activities)} activities")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,132 @@
+import math
+from typing import NamedTuple
+
+import pandas as pd
+
+from db_schema import ACTIVITY_COLUMNS, get_data_version
+from query_cache import RESULT_CACHE
+
+# Size of each connection's prepared statement cache (sqlite3 keys it on the SQL text,
+# which only depends on a query's structure since values are bound parameters)
+STATEMENT_CACHE_SIZE = 256
+
+# Metres per degree of latitude
+METERS_PER_DEGREE = 111320.0
+
+AGGREGATE_FUNCTIONS = {"SUM", "AVG", "MIN", "MAX", "COUNT"}
+PERIOD_COLUMNS = {"Day", "Week", "Month", "week_start", "month_start"}
+ACTIVITY_COLUMN_NAMES = {name for name, _ in ACTIVITY_COLUMNS}
+
+# Sidebar filter type -> condition on its bound value
+FILTER_CONDITIONS = {
+    "week": "week_start = date(:filter_value, 'weekday 0', '-6 days')",
+    "month": "month_start = date(:filter_value, 'start of month')",
+    "year": "strftime('%Y', startTimeLocal) = :filter_value",
+    "race": "instr(trainingRace, :filter_value) > 0",
+}
+
+
+class Query(NamedTuple):
+    """SQL text with named placeholders, the values bound to them and the result dtypes."""
+    sql: str
+    params: dict
+    dtype: dict = None
+
+
+def _database_path(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def read_query(conn, query, cache=RESULT_CACHE):
+    """
+    Run a Query on `conn` and return its result as a DataFrame.
+    Results are cached per database, query, parameters and data version,
+    so they are reused across reruns until the next ingest.
+    """
+    version = get_data_version(conn) if cache is not None else None
+    if version is None:
+        return pd.read_sql(query.sql, conn, params=query.params, dtype=query.dtype)
+    key = (
+        _database_path(conn), query.sql, tuple(sorted(query.params.items())),
+        tuple(sorted((query.dtype or {}).items())), version
+    )
+    result = cache.get(key)
+    if result is None:
+        result = pd.read_sql(query.sql, conn, params=query.params, dtype=query.dtype)
+        cache.put(key, result)
+    # Callers may modify the frame, keep the cached one intact
+    return result.copy()
+
+
+def get_filter_condition(filter_type, filter_value):
+    """WHERE condition for the sidebar filter, matching everything without a value."""
+    if not filter_value:
+        return Query("1=1", {})
+    if filter_type not in FILTER_CONDITIONS:
+        raise ValueError(f"Unknown filter type: {filter_type}")
+    return Query(FILTER_CONDITIONS[filter_type], {"filter_value": filter_value})
+
+
+def _date_range_params(start_date, end_date):
+    """
+    Bounds of an inclusive date range. The exclusive end is computed here so
+    SQLite compares startTimeLocal to a constant instead of calling date() per row.
+    """
+    end_exclusive = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    return {"start_date": str(start_date), "end_date": str(end_date), "end_exclusive": end_exclusive.strftime("%Y-%m-%d")}
+
+
+def _check_identifier(value, allowed, kind):
+    """Identifiers cannot be bound, only whitelisted ones are put in the SQL text."""
+    if value not in allowed:
+        raise ValueError(f"Unknown {kind}: {value}")
+    return value
+
+
 def get_top_metrics_query(filter_condition):
-    return f"""
+    return Query(f"""
         SELECT
             SUM(duration) AS total_movingDuration,
             SUM(distance) AS total_distance
         FROM activities
-        WHERE {filter_condition};
-    """
+        WHERE {filter_condition.sql};
+    """, filter_condition.params)
 
 def get_activity_metrics_query(filter_condition):
-    return f"""
+    return Query(f"""
         SELECT
             activityTypeGrouped,
             SUM(distance) AS total_distance
         FROM activities
-        WHERE {filter_condition}
+        WHERE {filter_condition.sql}
         GROUP BY activityTypeGrouped;
-    """
+    """, filter_condition.params)
 
 def get_custom_metrics_query(filter_condition, column, aggregate_function):
-    return f"""
+    _check_identifier(column, ACTIVITY_COLUMN_NAMES, "column")
+    _check_identifier(aggregate_function.upper(), AGGREGATE_FUNCTIONS, "aggregate function")
+    return Query(f"""
         SELECT
             activityTypeGrouped,
             {aggregate_function}({column}) AS metric_value
         FROM activities
-        WHERE {filter_condition}
+        WHERE {filter_condition.sql}
         GROUP BY activityTypeGrouped;
-    """
+    """, filter_condition.params)
 
 def get_latest_activity_query(sport_type, limit=1):
-    return f"""
+    return Query(f"""
         SELECT *
         FROM activities
-        WHERE activityTypeGrouped = '{sport_type}'
+        WHERE activityTypeGrouped = :sport_type
         ORDER BY startTimeLocal DESC
-        LIMIT {limit};
-    """
+        LIMIT :limit;
+    """, {"sport_type": sport_type, "limit": limit})
     
     
 def get_metrics_for_period_query(sport_type, period_column, period_value):
-    return f"""
+    _check_identifier(period_column, PERIOD_COLUMNS, "period column")
+    return Query(f"""
         SELECT
             SUM(duration) AS total_duration,
             SUM(distance) AS total_distance,
@@ -56,12 +144,12 @@ def get_metrics_for_period_query(sport_type, period_column, period_value):
             SUM(waterEstimated) AS total_water_estimated,
             SUM(vigorousIntensityMinutes) AS total_vigorous_intensity
         FROM activities
-        WHERE activityTypeGrouped = '{sport_type}'
-        AND {period_column} = '{period_value}';
-    """
+        WHERE activityTypeGrouped = :sport_type
+        AND {period_column} = :period_value;
+    """, {"sport_type": sport_type, "period_value": period_value})
 
 def get_weekly_metrics_with_delta_query_overview():
-    return f"""
+    return Query(f"""
         WITH DistinctWeeks AS (
             SELECT
                 Week,
@@ -139,10 +227,10 @@ def get_weekly_metrics_with_delta_query_overview():
         WHERE first.week_rank = 1;
   
 
-    """
+    """, {})
     
 def get_weekly_metrics_with_delta_query(sport_type):
-    return f"""
+    return Query(f"""
        WITH WeeklyMetrics AS (
     SELECT
         Week,
@@ -163,7 +251,7 @@ def get_weekly_metrics_with_delta_query(sport_type):
         SUM(vigorousIntensityMinutes) as total_vigorous_intensity,
         AVG(vigorousIntensityMinutes) as avg_vigorous_intensity
     FROM activities
-    WHERE activityTypeGrouped = '{sport_type}'
+    WHERE activityTypeGrouped = :sport_type
     GROUP BY Week
     ORDER BY Week DESC
     LIMIT 2
@@ -199,7 +287,7 @@ LEFT JOIN (
     SELECT * FROM WeeklyMetrics LIMIT 1 OFFSET 1
 ) second ON 1=1;
 
-    """
+    """, {"sport_type": sport_type})
 
 
 def get_recent_activities_query(sport_type, timerange):
@@ -217,15 +305,15 @@ def get_recent_activities_query(sport_type, timerange):
             'end': 'date("now", "weekday 1")'  # End on Monday of current week
         },
         'all': {
-            'start': '(SELECT date(min(Week), "weekday 1") FROM activities WHERE activityTypeGrouped = "running")',
-            'end': '(SELECT date(max(Week), "weekday 1") FROM activities WHERE activityTypeGrouped = "running")'
+            'start': '(SELECT date(min(Week), "weekday 1") FROM activities WHERE activityTypeGrouped = :sport_type)',
+            'end': '(SELECT date(max(Week), "weekday 1") FROM activities WHERE activityTypeGrouped = :sport_type)'
         }
     }
 
     start_date = time_filters[timerange]['start']
     end_date = time_filters[timerange]['end']
     
-    return f"""
+    return Query(f"""
         WITH RECURSIVE date_series AS (
             SELECT {start_date} AS Week
             UNION ALL
@@ -265,12 +353,12 @@ def get_recent_activities_query(sport_type, timerange):
             act.activityName
         FROM activities act
         JOIN date_series ds
-            ON strftime('%Y-%m-%d', ds.Week) = act.Week
-        WHERE act.activityTypeGrouped = '{sport_type}'
+            ON act.week_start = ds.Week
+        WHERE act.activityTypeGrouped = :sport_type
         ORDER BY act.Day DESC;
 
       
-    """
+    """, {"sport_type": sport_type})
 
 
 def get_weekly_sport_query(sport_type, timerange):
@@ -288,8 +376,8 @@ def get_weekly_sport_query(sport_type, timerange):
             'end': 'date("now", "weekday 1")'
         },
         'all': {
-            'start': f'(SELECT date(min(Week), "weekday 1") FROM activities)',
-            'end': f'(SELECT date(max(Week), "weekday 1") FROM activities)'
+            'start': f'(SELECT min(week_start) FROM activity_rollup_week)',
+            'end': f'(SELECT max(week_start) FROM activity_rollup_week)'
         }
     }
 
@@ -309,49 +397,46 @@ def get_weekly_sport_query(sport_type, timerange):
 
     # ---------- CASE 1: duration → sum all sports ----------
     if sport_type == "duration":
-        return f"""
+        return Query(f"""
             {date_cte}
             SELECT
                 ds.Week,
-                COALESCE(SUM(a.duration), 0) AS total_duration
+                COALESCE(SUM(r.duration), 0) AS total_duration
             FROM date_series ds
-            LEFT JOIN activities a
-                ON strftime('%Y-%m-%d', ds.Week)
-                   = strftime('%Y-%m-%d', date(a.Week, 'weekday 1'))
+            LEFT JOIN activity_rollup_week r
+                ON r.week_start = ds.Week
             GROUP BY ds.Week
             ORDER BY ds.Week;
-        """
+        """, {}, {"total_duration": "float64"})
 
     # ---------- CASE 2: only physical_reinforcement → count(*) ----------
     if sport_type == "physical_reinforcement":
-        return f"""
+        return Query(f"""
             {date_cte}
             SELECT
                 ds.Week,
-                COALESCE(COUNT(a.Week), 0) AS nb_trainings
+                COALESCE(SUM(r.nb_trainings), 0) AS nb_trainings
             FROM date_series ds
-            LEFT JOIN activities a
-                ON strftime('%Y-%m-%d', ds.Week)
-                   = strftime('%Y-%m-%d', date(a.Week, 'weekday 1'))
-                AND a.activityTypeGrouped = 'physical_reinforcement'
+            LEFT JOIN activity_rollup_week r
+                ON r.week_start = ds.Week
+                AND r.activityTypeGrouped = 'physical_reinforcement'
             GROUP BY ds.Week
             ORDER BY ds.Week;
-        """
+        """, {}, {"nb_trainings": "int64"})
 
     # ---------- CASE 3: any sport → sum(distance) ----------
-    return f"""
+    return Query(f"""
         {date_cte}
         SELECT
             ds.Week,
-            COALESCE(SUM(a.distance), 0) AS total_distance
+            COALESCE(SUM(r.distance), 0) AS total_distance
         FROM date_series ds
-        LEFT JOIN activities a
-            ON strftime('%Y-%m-%d', ds.Week)
-               = strftime('%Y-%m-%d', date(a.Week, 'weekday 1'))
-            AND a.activityTypeGrouped = '{sport_type}'
+        LEFT JOIN activity_rollup_week r
+            ON r.week_start = ds.Week
+            AND r.activityTypeGrouped = :sport_type
         GROUP BY ds.Week
         ORDER BY ds.Week;
-    """
+    """, {"sport_type": sport_type}, {"total_distance": "float64"})
 
 
 
@@ -370,15 +455,15 @@ def get_biking_distance_by_timerange_query(timerange):
             'end': 'date("now", "weekday 1")'  # End on Monday of current week
         },
         'all': {
-            'start': '(SELECT date(min(Week), "weekday 1") FROM activities WHERE activityTypeGrouped = "cycling")',
-            'end': '(SELECT date(max(Week), "weekday 1") FROM activities WHERE activityTypeGrouped = "cycling")'
+            'start': '(SELECT min(week_start) FROM activity_rollup_week WHERE activityTypeGrouped = "cycling")',
+            'end': '(SELECT max(week_start) FROM activity_rollup_week WHERE activityTypeGrouped = "cycling")'
         }
     }
 
     start_date = time_filters[timerange]['start']
     end_date = time_filters[timerange]['end']
 
-    return f"""
+    return Query(f"""
     WITH RECURSIVE date_series AS (
         SELECT {start_date} AS Week
         UNION ALL
@@ -388,20 +473,20 @@ def get_biking_distance_by_timerange_query(timerange):
     )
     SELECT
         ds.Week,
-        COALESCE(SUM(a.distance), 0) as total_distance
+        COALESCE(SUM(r.distance), 0) as total_distance
     FROM date_series ds
-    LEFT JOIN activities a ON strftime('%Y-%m-%d', ds.Week) = strftime('%Y-%m-%d', date(a.Week, 'weekday 1'))
-                          AND a.activityTypeGrouped = 'cycling'
+    LEFT JOIN activity_rollup_week r ON r.week_start = ds.Week
+                                    AND r.activityTypeGrouped = 'cycling'
     GROUP BY ds.Week
     ORDER BY ds.Week;
-    """
+    """, {}, {"total_distance": "float64"})
 
 
 def get_volume_metrics_query_overview():
     """
     Get race metrics for a specific training period
     """
-    return f"""
+    return Query(f"""
         -- 1. Generate all weeks in the year
         WITH RECURSIVE date_series AS (
     SELECT date(strftime('%Y', 'now') || '-01-01') AS week
@@ -421,7 +506,7 @@ week_data_raw AS (
         SUM(elevationGain) AS elevationGain,
         CAST(SUM(duration * averageHR) / SUM(duration) AS INTEGER) AS averageHR
     FROM activities
-    WHERE date(startTimeLocal) >= date(strftime('%Y', 'now') || '-01-01')
+    WHERE startTimeLocal >= strftime('%Y', 'now') || '-01-01'
     GROUP BY week
 ),
 
@@ -514,27 +599,27 @@ week_data AS (
             SUM(elevationGain) AS elevationGain,
             CAST(SUM(duration * averageHR) / SUM(duration) AS INTEGER) AS averageHR
         FROM week_data 
-    """   
+    """, {})   
 
 def get_volume_metrics_query(sport):
     """
     Get race metrics for a specific training period
     """
-    return f"""
+    return Query(f"""
         WITH week_data AS (
             SELECT
-                week,
-                SUM(duration) AS duration,
-                COUNT(*) AS nb_trainings,
-                SUM(distance) AS distance,
-                SUM(calories) AS calories,
-                SUM(totalNumberOfStrokes) AS totalNumberOfStrokes,
-                CAST(SUM(duration * averageHR) / SUM(duration) AS INTEGER) AS averageHR,
-                RANK() OVER (ORDER BY week DESC) AS rank_week
-            FROM activities
-            WHERE activityTypeGrouped = '{sport}'
-            AND date(startTimeLocal) >= date(strftime('%Y','now') || '-01-01')
-            GROUP BY week
+                week_start AS week,
+                duration,
+                nb_trainings,
+                distance,
+                calories,
+                totalNumberOfStrokes,
+                elevationGain,
+                CAST(hr_duration / duration AS INTEGER) AS averageHR,
+                RANK() OVER (ORDER BY week_start DESC) AS rank_week
+            FROM activity_rollup_week
+            WHERE activityTypeGrouped = :sport
+            AND week_start >= date(strftime('%Y','now') || '-01-01', 'weekday 1')
         ),
         -- Recursive weekly date generator from Jan 1st to today
         week_series AS (
@@ -557,6 +642,7 @@ def get_volume_metrics_query(sport):
                 COALESCE(wd.distance, 0) AS distance,
                 COALESCE(wd.calories, 0) AS calories,
                 COALESCE(wd.totalNumberOfStrokes, 0) AS totalNumberOfStrokes,
+                COALESCE(wd.elevationGain, 0) AS elevationGain,
                 COALESCE(wd.averageHR, 0) AS averageHR,
                 wd.rank_week
             FROM week_series ws
@@ -582,6 +668,7 @@ def get_volume_metrics_query(sport):
             SUM(distance) / (SELECT cnt_last_1 FROM week_counts) AS distance_avg,
             SUM(calories) AS calories,
             SUM(totalNumberOfStrokes) AS totalNumberOfStrokes,
+            SUM(elevationGain) AS elevationGain,
             CAST(SUM(duration * averageHR) / NULLIF(SUM(duration),0) AS INTEGER) AS averageHR
         FROM full_weeks
         WHERE rank_week = 1
@@ -598,6 +685,7 @@ def get_volume_metrics_query(sport):
             SUM(distance) / (SELECT cnt_last_4 FROM week_counts) AS distance_avg,
             SUM(calories) AS calories,
             SUM(totalNumberOfStrokes) AS totalNumberOfStrokes,
+            SUM(elevationGain) AS elevationGain,
             CAST(SUM(duration * averageHR) / NULLIF(SUM(duration),0) AS INTEGER) AS averageHR
         FROM full_weeks
         WHERE rank_week <= 4
@@ -614,6 +702,7 @@ def get_volume_metrics_query(sport):
             SUM(distance) / (SELECT cnt_last_12 FROM week_counts) AS distance_avg,
             SUM(calories) AS calories,
             SUM(totalNumberOfStrokes) AS totalNumberOfStrokes,
+            SUM(elevationGain) AS elevationGain,
             CAST(SUM(duration * averageHR) / NULLIF(SUM(duration),0) AS INTEGER) AS averageHR
         FROM full_weeks
         WHERE rank_week <= 12
@@ -630,6 +719,7 @@ def get_volume_metrics_query(sport):
             SUM(distance) / (SELECT cnt_last_18 FROM week_counts) AS distance_avg,
             SUM(calories) AS calories,
             SUM(totalNumberOfStrokes) AS totalNumberOfStrokes,
+            SUM(elevationGain) AS elevationGain,
             CAST(SUM(duration * averageHR) / NULLIF(SUM(duration),0) AS INTEGER) AS averageHR
         FROM full_weeks
         WHERE rank_week <= 18
@@ -646,21 +736,22 @@ def get_volume_metrics_query(sport):
             SUM(distance) / (SELECT cnt_last_all FROM week_counts) AS distance_avg,
             SUM(calories) AS calories,
             SUM(totalNumberOfStrokes) AS totalNumberOfStrokes,
+            SUM(elevationGain) AS elevationGain,
             CAST(SUM(duration * averageHR) / NULLIF(SUM(duration),0) AS INTEGER) AS averageHR
         FROM full_weeks;
 
-    """
+    """, {"sport": sport})
 
    
 def get_race_metrics_query(start_date, end_date):
     """
     Get race metrics for a specific training period
     """
-    return f"""
+    return Query(f"""
         WITH race_activities AS (
             SELECT *
             FROM activities
-            WHERE date(startTimeLocal) BETWEEN '{start_date}' AND '{end_date}'
+            WHERE startTimeLocal >= :start_date AND startTimeLocal < :end_exclusive
         ),
         weekly_stats AS (
             SELECT 
@@ -714,70 +805,72 @@ def get_race_metrics_query(start_date, end_date):
             -- Average durations
             COALESCE((SELECT AVG(week_duration) FROM weekly_stats), 0) AS average_duration_per_week,
             COALESCE((SELECT avg_duration_8w FROM last_8_weeks), 0) AS average_duration_last_8_weeks;
-    """
+    """, _date_range_params(start_date, end_date))
 
 def get_race_distance_by_timerange_query(start_date, end_date, granularity, sport_type):
     """
     Get distance data for graphs by sport and granularity, filling missing periods with 0
     """
     if granularity.lower() == 'week':
-        return f"""
+        return Query(f"""
         WITH RECURSIVE date_series AS (
-            SELECT date('{start_date}', 'weekday 0', '-6 days') AS week_start  -- Align start_date to the previous Monday
+            SELECT date(:start_date, 'weekday 0', '-6 days') AS week_start  -- Align start_date to the previous Monday
             UNION ALL
             SELECT date(week_start, '+7 days')
             FROM date_series
-            WHERE date(week_start, '+7 days') <= date('{end_date}')
+            WHERE date(week_start, '+7 days') <= date(:end_date)
         )
         SELECT
             ds.week_start AS time_period,
             COALESCE(SUM(a.distance), 0) AS total_distance
         FROM date_series ds
-        LEFT JOIN activities a ON date(a.startTimeLocal, 'weekday 0', '-6 days') = ds.week_start
-                              AND date(a.startTimeLocal) BETWEEN '{start_date}' AND '{end_date}'
-                              AND a.activityTypeGrouped = '{sport_type}'
+        LEFT JOIN activities a ON a.week_start = ds.week_start
+                              AND a.startTimeLocal >= :start_date AND a.startTimeLocal < :end_exclusive
+                              AND a.activityTypeGrouped = :sport_type
         GROUP BY ds.week_start
         ORDER BY ds.week_start;
-        """
+        """, {**_date_range_params(start_date, end_date), "sport_type": sport_type}, {"total_distance": "float64"})
     else:  # month
-        return f"""
+        return Query(f"""
         WITH RECURSIVE date_series AS (
-            SELECT date('{start_date}', 'start of month') AS month_start
+            SELECT date(:start_date, 'start of month') AS month_start
             UNION ALL
             SELECT date(month_start, '+1 month')
             FROM date_series
-            WHERE date(month_start, '+1 month') <= date('{end_date}', 'start of month')
+            WHERE date(month_start, '+1 month') <= date(:end_date, 'start of month')
         )
         SELECT
             ds.month_start AS time_period,
             COALESCE(SUM(a.distance), 0) AS total_distance
         FROM date_series ds
-        LEFT JOIN activities a ON date(a.startTimeLocal, 'start of month') = ds.month_start
-                              AND date(a.startTimeLocal) BETWEEN '{start_date}' AND '{end_date}'
-                              AND a.activityTypeGrouped = '{sport_type}'
+        LEFT JOIN activities a ON a.month_start = ds.month_start
+                              AND a.startTimeLocal >= :start_date AND a.startTimeLocal < :end_exclusive
+                              AND a.activityTypeGrouped = :sport_type
         GROUP BY ds.month_start
         ORDER BY ds.month_start;
-        """
+        """, {**_date_range_params(start_date, end_date), "sport_type": sport_type}, {"total_distance": "float64"})
 
 
 def get_activity_duration_by_granularity_query(start_date, end_date, granularity):
     if granularity == "week":
-        # Calculate the first day of the week (Monday) for each record
-        time_group = "date(startTimeLocal, 'weekday 0', '-6 days')"
+        # First day of the week (Monday) of each record
+        time_group = "week_start"
     elif granularity == "month":
-        time_group = "strftime('%Y-%m-01', startTimeLocal)"
-    
+        time_group = "month_start"
+    else:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
     query = f"""
     SELECT 
         {time_group} AS TimePeriod,
         activityTypeGrouped,
         SUM(duration) AS Duration
     FROM activities
-    WHERE date(startTimeLocal) BETWEEN '{start_date}' AND '{end_date}'
+    WHERE startTimeLocal >= :start_date AND startTimeLocal < :end_exclusive
     GROUP BY TimePeriod, activityTypeGrouped
     ORDER BY TimePeriod
     """
-    return query
+    return Query(query, _date_range_params(start_date, end_date), {"Duration": "float64"})
 
 def activities_stats():
     """
@@ -785,7 +878,7 @@ def activities_stats():
     If activity_type is provided → filter by activityTypeGrouped.
     """
 
-    return f"""
+    return Query(f"""
         SELECT 
             activityId,
             activityName,
@@ -806,4 +899,97 @@ def activities_stats():
             waterEstimated,
             activityTypeGrouped
         FROM activities
-     """
\ No newline at end of file
+     """, {})
+
+
+def get_activity_route_query(activity_id):
+    """Route summary of an activity (see db_schema.ROUTE_COLUMNS), empty without a GPX track."""
+    return Query("""
+        SELECT *
+        FROM activity_routes
+        WHERE activityId = :activity_id;
+    """, {"activity_id": int(activity_id)})
+
+
+def get_activities_in_bbox_query(min_lat, min_lon, max_lat, max_lon):
+    """Activities whose route bounding box intersects the given box."""
+    return Query("""
+        SELECT
+            a.activityId,
+            a.activityName,
+            a.activityTypeGrouped,
+            a.startTimeLocal,
+            a.distance,
+            r.centroid_lat,
+            r.centroid_lon,
+            r.start_lat,
+            r.start_lon
+        FROM activity_routes r
+        JOIN activities a ON a.activityId = r.activityId
+        WHERE r.min_lat <= :max_lat AND r.max_lat >= :min_lat
+          AND r.min_lon <= :max_lon AND r.max_lon >= :min_lon
+        ORDER BY a.startTimeLocal DESC;
+    """, {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon})
+
+
+def get_activities_near_query(latitude, longitude, radius_km):
+    """Activities whose route bounding box comes within `radius_km` of a location."""
+    lat_delta = radius_km * 1000 / METERS_PER_DEGREE
+    lon_delta = lat_delta / max(math.cos(math.radians(latitude)), 1e-6)
+    return get_activities_in_bbox_query(latitude - lat_delta, longitude - lon_delta, latitude + lat_delta, longitude + lon_delta)
+
+
+def _through_activities_query(segment_condition, params):
+    return Query(f"""
+        SELECT
+            activityId,
+            activityName,
+            activityTypeGrouped,
+            startTimeLocal,
+            distance
+        FROM activities
+        WHERE activityId IN (
+            SELECT activityId
+            FROM route_segments
+            WHERE min_lat <= :max_lat AND max_lat >= :min_lat
+              AND min_lon <= :max_lon AND max_lon >= :min_lon
+              AND {segment_condition}
+        )
+        ORDER BY startTimeLocal DESC;
+    """, params)
+
+
+def get_activities_through_bbox_query(min_lat, min_lon, max_lat, max_lon):
+    """Activities whose track passes through the box, from the route segment R*-tree."""
+    return _through_activities_query("1=1", {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon})
+
+
+def get_activities_through_radius_query(latitude, longitude, radius_km):
+    """Activities whose track passes within `radius_km` of a location."""
+    lat_delta = radius_km * 1000 / METERS_PER_DEGREE
+    lon_scale = max(math.cos(math.radians(latitude)), 1e-6)
+    lon_delta = lat_delta / lon_scale
+    # The R*-tree narrows on the enclosing box, segments whose box stays outside the circle are then dropped
+    distance_condition = """
+        (max(min_lat - :latitude, 0, :latitude - max_lat) * max(min_lat - :latitude, 0, :latitude - max_lat)
+         + max(min_lon - :longitude, 0, :longitude - max_lon) * max(min_lon - :longitude, 0, :longitude - max_lon)
+           * :lon_scale * :lon_scale) <= :lat_delta * :lat_delta
+    """
+    return _through_activities_query(distance_condition, {
+        "min_lat": latitude - lat_delta, "min_lon": longitude - lon_delta,
+        "max_lat": latitude + lat_delta, "max_lon": longitude + lon_delta,
+        "latitude": latitude, "longitude": longitude, "lon_scale": lon_scale, "lat_delta": lat_delta,
+    })
+
+
+def get_routes_extent_query():
+    """Box around every indexed route, to frame the heatmap."""
+    return Query("""
+        SELECT
+            min(min_lat) AS min_lat,
+            min(min_lon) AS min_lon,
+            max(max_lat) AS max_lat,
+            max(max_lon) AS max_lon,
+            count(*) AS nb_routes
+        FROM activity_routes;
+    """, {})
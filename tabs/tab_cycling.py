@@ -8,7 +8,8 @@ import numpy as np
 import sql_queries as sql
 
 from actions.display_map import display_gpx_map
-from actions.parse_tcx_csv import parse_tcx_to_dataframe
+from actions.trackpoint_cache import load_tcx_trackpoints
+from actions.decimation import downsample_series
 from actions.display_pace_bar_plot import plot_running_bar  # This may be replaced with a cycling pace plot if needed
 import plotly.express as px
 from plotly.subplots import make_subplots
@@ -19,9 +20,9 @@ def show(conn):
     st.subheader("Cycling Metrics")
 
     # Fetch race metrics for cycling
-    race_metrics = pd.read_sql(
-        sql.get_volume_metrics_query("cycling"),
-        conn
+    race_metrics = sql.read_query(
+        conn,
+        sql.get_volume_metrics_query("cycling")
     )
 
     if not race_metrics.empty:
@@ -102,7 +103,7 @@ def show(conn):
             st.rerun()
 
     # Récupération des données et affichage du graphique
-    cycling_data = pd.read_sql(sql.get_weekly_sport_query('cycling', st.session_state.time_range_metrics), conn)
+    cycling_data = sql.read_query(conn, sql.get_weekly_sport_query('cycling', st.session_state.time_range_metrics))
 
     if not cycling_data.empty:
         # Adaptation du titre selon la sélection
@@ -128,7 +129,7 @@ def show(conn):
     st.subheader("Recent Cycling Activities")
 
     # Fetch activities data based on the selected time range for activities
-    cycling_table = pd.read_sql(sql.get_recent_activities_query('cycling', st.session_state.time_range_metrics), conn)
+    cycling_table = sql.read_query(conn, sql.get_recent_activities_query('cycling', st.session_state.time_range_metrics))
 
     if not cycling_table.empty:
         # Define column configurations for cycling data
@@ -256,7 +257,9 @@ def show(conn):
                 activity_output_dir = os.path.join(project_root, "data", "raw", activity_month, str(selected_row_id))
                 gpx_file_path = os.path.join(activity_output_dir, f"{str(selected_row_id)}.gpx")
                 if os.path.exists(gpx_file_path):
-                    display_gpx_map(gpx_file_path) 
+                    # Framed from the route index, filled at ingest
+                    route = sql.read_query(conn, sql.get_activity_route_query(selected_row_id))
+                    display_gpx_map(gpx_file_path, route.iloc[0] if not route.empty else None)
                 else:
                     st.error("GPX file not found.")
 
@@ -274,8 +277,8 @@ def show(conn):
                 # Check for TCX file
                 tcx_file_path = os.path.join(activity_output_dir, f"{str(selected_row_id)}.tcx")
                 if os.path.exists(tcx_file_path):
-                    # Parse TCX file to DataFrame
-                    df = parse_tcx_to_dataframe(tcx_file_path)
+                    # Trackpoints of the TCX file, from its columnar cache
+                    df = load_tcx_trackpoints(tcx_file_path)
                     # Create some space in the app layout for better visibility
                     st.markdown("<h2 style='text-align: center;'>Choose Metrics to Display</h2>", unsafe_allow_html=True)
                     
@@ -311,10 +314,12 @@ def show(conn):
 
                     # Function to add traces
                     def add_trace(name, data, color, hovertemplate, secondary_y):
+                        # LTTB keeps the shape of the trace with a few points per pixel
+                        x, y = downsample_series(df["Time"], data)
                         fig.add_trace(
                             go.Scatter(
-                                x=df["Time"],
-                                y=data,
+                                x=x,
+                                y=y,
                                 name=name,
                                 line=dict(color=color),
                                 hovertemplate=hovertemplate + "<extra></extra>",
@@ -0,0 +1,40 @@
+import os
+import streamlit as st
+import sql_queries as sql
+
+from heatmap import MAX_ZOOM, MIN_ZOOM, TILES_DIR
+
+# Served by Streamlit's static file serving (see .streamlit/config.toml)
+TILES_URL = "/app/static/heatmap/{z}/{x}/{y}.png"
+
+
+def show(conn):
+    # Imported here so the dashboard only loads folium once the heatmap is shown
+    import folium
+    from streamlit_folium import st_folium
+
+    st.title("Heatmap")
+
+    if not os.path.isdir(TILES_DIR):
+        st.info("No heatmap tiles yet. Render them with `python heatmap.py`.")
+        return
+
+    extent = sql.read_query(conn, sql.get_routes_extent_query()).iloc[0]
+
+    m = folium.Map(tiles="cartodbdark_matter", min_zoom=MIN_ZOOM, width='100%', height='700')
+    # Pre-rendered tiles of every track, stretched past the deepest rendered zoom
+    folium.TileLayer(
+        tiles=TILES_URL,
+        attr="Activity heatmap",
+        name="Heatmap",
+        overlay=True,
+        min_zoom=MIN_ZOOM,
+        max_native_zoom=MAX_ZOOM,
+        max_zoom=MAX_ZOOM + 3,
+    ).add_to(m)
+
+    # Framed on the indexed routes, the whole world without them
+    if extent["nb_routes"]:
+        m.fit_bounds([[extent["min_lat"], extent["min_lon"]], [extent["max_lat"], extent["max_lon"]]])
+
+    st_folium(m, width="100%", height=700, returned_objects=[])
@@ -15,9 +15,9 @@ def format_duration(seconds):
 def show(conn):
     st.subheader("🏁 Last week Metrics")
 
-    weekly_metrics = pd.read_sql(
-        sql.get_weekly_metrics_with_delta_query_overview(),
+    weekly_metrics = sql.read_query(
         conn,
+        sql.get_weekly_metrics_with_delta_query_overview()
     )
 
     # ----- Global totals -----
@@ -54,9 +54,9 @@ def show(conn):
      # ----- Display Metrics as Table -----  
     st.header("Weekly Metrics by Sport")
     # Fetch race metrics
-    race_metrics = pd.read_sql(
-        sql.get_volume_metrics_query_overview(),
-        conn
+    race_metrics = sql.read_query(
+        conn,
+        sql.get_volume_metrics_query_overview()
     )
 
     if not race_metrics.empty:
@@ -182,13 +182,13 @@ def show(conn):
 
     if st.session_state.sport == 'duration':
         print('st.session_state.granularity', st.session_state.granularity)
-        activity_duration_data = pd.read_sql(
+        activity_duration_data = sql.read_query(
+            conn,
             sql.get_activity_duration_by_granularity_query(
                 st.session_state.start_date, 
                 st.session_state.end_date,
                 st.session_state.granularity
-            ),
-            conn
+            )
         )
         ut.plot_week_volume(
             activity_duration_data,
@@ -197,7 +197,7 @@ def show(conn):
     # Use a unique key for the plotly chart
     else:
         # Récupération des données et affichage du graphique
-        sport_data = pd.read_sql(sql.get_weekly_sport_query(st.session_state.sport, st.session_state.time_range_metrics), conn)
+        sport_data = sql.read_query(conn, sql.get_weekly_sport_query(st.session_state.sport, st.session_state.time_range_metrics))
         ut.plot_week_area(
             running_data=sport_data,
             y_column=y_column,
@@ -39,9 +39,9 @@ def show(conn):
     st.subheader("📊 Distance Metrics (km)")
 
     # Fetch race metrics
-    race_metrics = pd.read_sql(
-        sql.get_race_metrics_query(selected_race_data['start'], selected_race_data['end']),
-        conn
+    race_metrics = sql.read_query(
+        conn,
+        sql.get_race_metrics_query(selected_race_data['start'], selected_race_data['end'])
     )
 
     if not race_metrics.empty:
@@ -143,14 +143,14 @@ def show(conn):
         
         for sport in sports:
             st.subheader(f"{sport['emoji']} {sport['display']} Distance Over Time")
-            sport_data = pd.read_sql(
+            sport_data = sql.read_query(
+                conn,
                 sql.get_race_distance_by_timerange_query(
                     selected_race_data['start'], 
                     selected_race_data['end'], 
                     granularity, 
                     sport['name']
-                ),
-                conn
+                )
             )
             if not sport_data.empty:
                 fig = px.area(
@@ -178,13 +178,13 @@ def show(conn):
     # Fetch activity duration data based on the selected granularity and race dates
    
 
-    activity_duration_data = pd.read_sql(
+    activity_duration_data = sql.read_query(
+            conn,
             sql.get_activity_duration_by_granularity_query(
                 selected_race_data['start'], 
                 selected_race_data['end'], 
                 st.session_state.granularity
-            ),
-            conn
+            )
         )
     if not activity_duration_data.empty:
         ut.plot_week_volume(
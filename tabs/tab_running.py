@@ -9,7 +9,8 @@ import sql_queries as sql
 
 
 from actions.display_map import display_gpx_map
-from actions.parse_tcx_csv import parse_tcx_to_dataframe
+from actions.trackpoint_cache import load_tcx_trackpoints
+from actions.decimation import downsample_series
 from actions.display_pace_bar_plot import plot_running_bar
 import plotly.express as px
 from plotly.subplots import make_subplots
@@ -20,9 +21,9 @@ def show(conn):
     st.subheader("Running Metrics")
 
     # Fetch race metrics
-    race_metrics = pd.read_sql(
-        sql.get_volume_metrics_query("running"),
-        conn
+    race_metrics = sql.read_query(
+        conn,
+        sql.get_volume_metrics_query("running")
     )
 
     if not race_metrics.empty:
@@ -103,7 +104,7 @@ def show(conn):
             st.rerun()
 
     # Récupération des données et affichage du graphique
-    running_data = pd.read_sql(sql.get_weekly_sport_query('running', st.session_state.time_range_metrics), conn)
+    running_data = sql.read_query(conn, sql.get_weekly_sport_query('running', st.session_state.time_range_metrics))
 
     if not running_data.empty:
         # Adaptation du titre selon la sélection
@@ -131,7 +132,7 @@ def show(conn):
 
 
     # Fetch activities data based on the selected time range for activities
-    running_table = pd.read_sql(sql.get_recent_activities_query('running', st.session_state.time_range_metrics), conn)
+    running_table = sql.read_query(conn, sql.get_recent_activities_query('running', st.session_state.time_range_metrics))
 
     if not running_table.empty:
         # Define column configurations
@@ -214,7 +215,9 @@ def show(conn):
                 activity_output_dir = os.path.join(project_root, "data", "raw", activity_month, str(selected_row_id))
                 gpx_file_path = os.path.join(activity_output_dir, f"{str(selected_row_id)}.gpx")
                 if os.path.exists(gpx_file_path):
-                    display_gpx_map(gpx_file_path) 
+                    # Framed from the route index, filled at ingest
+                    route = sql.read_query(conn, sql.get_activity_route_query(selected_row_id))
+                    display_gpx_map(gpx_file_path, route.iloc[0] if not route.empty else None)
                     pass
                 else:
                     st.error("GPX file not found.")
@@ -230,8 +233,8 @@ def show(conn):
                 # Check for TCX file
                 tcx_file_path = os.path.join(activity_output_dir, f"{str(selected_row_id)}.tcx")
                 if os.path.exists(tcx_file_path):
-                    # Parse TCX file to DataFrame
-                    df = parse_tcx_to_dataframe(tcx_file_path)
+                    # Trackpoints of the TCX file, from its columnar cache
+                    df = load_tcx_trackpoints(tcx_file_path)
                     # Create some space in the app layout for better visibility
                     st.markdown("<h2 style='text-align: center;'>Choose Metrics to Display</h2>", unsafe_allow_html=True)
                     
@@ -267,10 +270,12 @@ def show(conn):
 
                     # Function to add traces
                     def add_trace(name, data, color, hovertemplate, secondary_y):
+                        # LTTB keeps the shape of the trace with a few points per pixel
+                        x, y = downsample_series(df["Time"], data)
                         fig.add_trace(
                             go.Scatter(
-                                x=df["Time"],
-                                y=data,
+                                x=x,
+                                y=y,
                                 name=name,
                                 line=dict(color=color),
                                 hovertemplate=hovertemplate + "<extra></extra>",
@@ -130,7 +130,7 @@ def sport_bottom_metrics(sport_name, df):
 def show(conn):
     st.title("🏅 Training Records")
 
-    df_stats = pd.read_sql(sql.activities_stats(), conn)
+    df_stats = sql.read_query(conn, sql.activities_stats())
     df_stats["startTimeLocal"] = pd.to_datetime(df_stats["startTimeLocal"], errors="coerce")
 
     # Sport filtering
@@ -21,9 +21,9 @@ def show(conn):
     st.subheader("Swimming Metrics")
 
     # Fetch race metrics
-    race_metrics = pd.read_sql(
-        sql.get_volume_metrics_query("swimming"),
-        conn
+    race_metrics = sql.read_query(
+        conn,
+        sql.get_volume_metrics_query("swimming")
     )
 
     if not race_metrics.empty:
@@ -101,8 +101,9 @@ def show(conn):
             st.session_state.time_range_metrics = "all"
             st.rerun()
 
-    swimming_data = pd.read_sql(
-        sql.get_weekly_sport_query("swimming", st.session_state.time_range_metrics), conn
+    swimming_data = sql.read_query(
+        conn,
+        sql.get_weekly_sport_query("swimming", st.session_state.time_range_metrics)
     )
 
     if not swimming_data.empty:
@@ -129,8 +130,9 @@ def show(conn):
 
     st.subheader("Recent Swimming Activities")
 
-    swimming_table = pd.read_sql(
-        sql.get_recent_activities_query("swimming", st.session_state.time_range_metrics), conn
+    swimming_table = sql.read_query(
+        conn,
+        sql.get_recent_activities_query("swimming", st.session_state.time_range_metrics)
     )
 
     if not swimming_table.empty:
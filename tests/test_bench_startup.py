@@ -0,0 +1,18 @@
+import os
+import ast
+
+from benchmarks.bench_startup import DEFAULT_MODULES, REPO_ROOT
+
+
+def app_tab_modules():
+    """app.TAB_MODULES, read from the source: importing app needs Streamlit."""
+    with open(os.path.join(REPO_ROOT, "app.py")) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "TAB_MODULES" for target in node.targets):
+            return ast.literal_eval(node.value)
+    raise AssertionError("app.TAB_MODULES not found")
+
+
+def test_startup_benchmark_measures_every_tab():
+    assert DEFAULT_MODULES == ["app", *app_tab_modules().values()]
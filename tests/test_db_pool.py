@@ -0,0 +1,95 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import sql_queries as sql
+from db_pool import ConnectionPool
+from db_schema import ACTIVITY_COLUMNS, MIGRATIONS, get_schema_version
+
+SPORTS = ["running", "cycling", "swimming", "hiking"]
+TIMERANGES = ["8_weeks", "6_months", "ytd", "all"]
+RACE_START, RACE_END = "2024-01-01", "2024-06-30"
+
+
+def write_baseline_database(path, nb_activities=40):
+    """activities.db as the ingest wrote it before the schema migrations: an untyped `to_sql` table."""
+    start_times = pd.date_range(end=pd.Timestamp.now().floor("D"), periods=nb_activities, freq="5D") + pd.Timedelta(hours=7)
+    df = pd.DataFrame({name: [None] * nb_activities for name, _ in ACTIVITY_COLUMNS})
+    df["activityId"] = range(nb_activities)
+    df["activityName"] = "Morning activity"
+    df["activityType"] = "synthetic"
+    df["activityTypeGrouped"] = [SPORTS[i % len(SPORTS)] for i in range(nb_activities)]
+    df["startTimeLocal"] = start_times
+    df["Day"] = start_times.normalize()
+    df["Week"] = start_times.normalize() - pd.to_timedelta(start_times.dayofweek, unit="D")
+    df["Month"] = start_times.to_period("M").to_timestamp()
+    df["duration"] = 3600.0
+    df["distance"] = 10.0
+    df["calories"] = 500.0
+    df["averageHR"] = 140.0
+    df["elevationGain"] = 120.0
+    df["trainingRace"] = ""
+    conn = sqlite3.connect(path)
+    df.to_sql("activities", conn, if_exists="replace", index=False)
+    conn.close()
+
+
+def tab_queries():
+    """Every query the tabs reading activities.db run, for each option they offer."""
+    queries = [
+        sql.get_weekly_metrics_with_delta_query_overview(),
+        sql.get_volume_metrics_query_overview(),
+        sql.get_race_metrics_query(RACE_START, RACE_END),
+        sql.activities_stats(),
+        sql.get_routes_extent_query(),
+        sql.get_activity_route_query(0),
+    ]
+    for sport in ["running", "cycling", "swimming"]:
+        queries.append(sql.get_volume_metrics_query(sport))
+        for timerange in TIMERANGES:
+            queries.append(sql.get_weekly_sport_query(sport, timerange))
+            queries.append(sql.get_recent_activities_query(sport, timerange))
+    for timerange in TIMERANGES:
+        queries.append(sql.get_weekly_sport_query("duration", timerange))
+    for granularity in ["week", "month"]:
+        queries.append(sql.get_activity_duration_by_granularity_query(RACE_START, RACE_END, granularity))
+        for sport in ["running", "cycling", "swimming"]:
+            queries.append(sql.get_race_distance_by_timerange_query(RACE_START, RACE_END, granularity, sport))
+    return queries
+
+
+@pytest.fixture
+def baseline_path(tmp_path):
+    path = str(tmp_path / "activities.db")
+    write_baseline_database(path)
+    return path
+
+
+def test_pool_migrates_baseline_database(baseline_path):
+    pool = ConnectionPool(baseline_path, migrate_schema=True)
+    try:
+        with pool.connection() as conn:
+            assert get_schema_version(conn) == len(MIGRATIONS)
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        pool.close()
+
+
+@pytest.mark.parametrize("query", tab_queries())
+def test_tab_queries_run_on_migrated_baseline(baseline_path, query):
+    pool = ConnectionPool(baseline_path, migrate_schema=True)
+    try:
+        with pool.connection() as conn:
+            sql.read_query(conn, query, cache=None)
+    finally:
+        pool.close()
+
+
+def test_pool_without_migration_leaves_schema(baseline_path):
+    pool = ConnectionPool(baseline_path)
+    try:
+        with pool.connection() as conn:
+            assert get_schema_version(conn) == 0
+    finally:
+        pool.close()
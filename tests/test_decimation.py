@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from actions.decimation import lttb, downsample_series
+
+
+def heart_rate_series(nb_points, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.Series(pd.date_range("2024-06-01 08:00:00", periods=nb_points, freq="s"))
+    heart_rate = pd.Series(140 + np.cumsum(rng.normal(0, 1, nb_points)))
+    return times, heart_rate
+
+
+def test_lttb_keeps_endpoints_and_budget():
+    x = np.arange(10000, dtype="float64")
+    y = np.sin(x / 50)
+    indices = lttb(x, y, 500)
+    assert len(indices) == 500
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert (np.diff(indices) > 0).all()
+
+
+def test_short_series_is_unchanged():
+    times, heart_rate = heart_rate_series(100)
+    heart_rate[40:50] = np.nan
+    x, y = downsample_series(times, heart_rate)
+    pd.testing.assert_series_equal(x, times)
+    pd.testing.assert_series_equal(y, heart_rate)
+
+
+def test_series_is_reduced_to_its_budget():
+    times, heart_rate = heart_rate_series(20000)
+    x, y = downsample_series(times, heart_rate, max_points=1000)
+    assert len(x) == len(y) == 1000
+    assert x.is_monotonic_increasing
+    assert not y.isna().any()
+
+
+def test_nan_gap_survives_decimation():
+    times, heart_rate = heart_rate_series(20000)
+    # The sensor dropped out for five minutes
+    heart_rate[8000:8300] = np.nan
+    x, y = downsample_series(times, heart_rate, max_points=1000)
+    assert y.isna().sum() == 1
+    gap = y.index[y.isna()][0]
+    assert 8000 <= gap < 8300
+    # The points on each side of the gap are the last and first readings around it
+    assert y.index[y.index < gap].max() == 7999
+    assert y.index[y.index > gap].min() == 8300
+    assert len(x) <= 1000 + 1
+    assert x.is_monotonic_increasing
+
+
+def test_missing_times_are_gaps_too():
+    times, heart_rate = heart_rate_series(20000)
+    times[12000:12010] = pd.NaT
+    x, y = downsample_series(times, heart_rate, max_points=1000)
+    assert x.isna().sum() == 1
@@ -0,0 +1,132 @@
+import os
+import json
+import stat
+
+import pytest
+import requests
+from garminconnect import GarminConnectAuthenticationError
+
+import garmin_cookies
+from garmin_cookies import ReauthClient, login, save_session
+
+
+class StubServer:
+    """Garmin Connect stand-in: counts full logins and the tokens it accepts."""
+    def __init__(self):
+        self.full_logins = 0
+        self.resumed_logins = 0
+        self.api_calls = 0
+        self.valid_tokens = set()
+
+    def issue_token(self):
+        self.full_logins += 1
+        token = f"token-{self.full_logins}"
+        self.valid_tokens.add(token)
+        return token
+
+
+class StubTokens:
+    def __init__(self, client):
+        self._client = client
+
+    def dump(self, tokenstore):
+        with open(os.path.join(tokenstore, "oauth.json"), "w") as f:
+            json.dump({"token": self._client.token}, f)
+
+
+class StubClient:
+    """Enough of `garminconnect.Garmin` for login, session dumps and one API call."""
+    def __init__(self, server, email, password):
+        self.server = server
+        self.token = None
+        self.client = StubTokens(self)
+
+    def login(self, tokenstore=None):
+        if tokenstore is None:
+            self.token = self.server.issue_token()
+            return
+        with open(os.path.join(tokenstore, "oauth.json")) as f:
+            token = json.load(f)["token"]
+        if token not in self.server.valid_tokens:
+            raise GarminConnectAuthenticationError("token rejected")
+        self.server.resumed_logins += 1
+        self.token = token
+
+    def get_activities(self, start, limit):
+        self.server.api_calls += 1
+        if self.token not in self.server.valid_tokens:
+            response = requests.Response()
+            response.status_code = 401
+            raise requests.HTTPError("401 Client Error: Unauthorized", response=response)
+        return [{"activityId": i} for i in range(start, start + limit)]
+
+
+@pytest.fixture
+def server():
+    return StubServer()
+
+
+@pytest.fixture
+def client_cls(server):
+    return lambda email, password: StubClient(server, email, password)
+
+
+@pytest.fixture
+def tokenstore(tmp_path):
+    return str(tmp_path / "data" / ".garmin_tokens")
+
+
+def test_first_login_saves_private_session(server, client_cls, tokenstore):
+    login("me@example.com", "secret", tokenstore, client_cls)
+    assert server.full_logins == 1
+    assert garmin_cookies.session_is_fresh(tokenstore)
+    assert stat.S_IMODE(os.stat(tokenstore).st_mode) == 0o700
+
+
+def test_fresh_session_is_resumed_without_login(server, client_cls, tokenstore):
+    login("me@example.com", "secret", tokenstore, client_cls)
+    client = login("me@example.com", "secret", tokenstore, client_cls)
+    assert server.full_logins == 1
+    assert server.resumed_logins == 1
+    assert client.token == "token-1"
+
+
+def test_expired_session_triggers_full_login(server, client_cls, tokenstore):
+    client = login("me@example.com", "secret", tokenstore, client_cls)
+    save_session(client, tokenstore, max_age=-1)
+    assert not garmin_cookies.session_is_fresh(tokenstore)
+    client = login("me@example.com", "secret", tokenstore, client_cls)
+    assert server.full_logins == 2
+    assert server.resumed_logins == 0
+    assert garmin_cookies.session_is_fresh(tokenstore)
+
+
+def test_rejected_session_falls_back_to_full_login(server, client_cls, tokenstore):
+    login("me@example.com", "secret", tokenstore, client_cls)
+    server.valid_tokens.clear()
+    client = login("me@example.com", "secret", tokenstore, client_cls)
+    assert server.full_logins == 2
+    assert client.token == "token-2"
+
+
+def test_401_logs_in_again_once_and_retries(server, client_cls, tokenstore):
+    client = ReauthClient("me@example.com", "secret", tokenstore, client_cls)
+    assert server.full_logins == 1
+    # The server revokes the session between two calls
+    server.valid_tokens.clear()
+    assert client.get_activities(0, 2) == [{"activityId": 0}, {"activityId": 1}]
+    assert server.full_logins == 2
+    assert server.api_calls == 2
+    # The new session is used from then on
+    client.get_activities(2, 2)
+    assert server.full_logins == 2
+    assert server.api_calls == 3
+
+
+def test_401_after_login_again_is_raised(server, client_cls, tokenstore):
+    client = ReauthClient("me@example.com", "secret", tokenstore, client_cls)
+    server.issue_token = lambda: "revoked"
+    server.valid_tokens.clear()
+    with pytest.raises(requests.HTTPError):
+        client.get_activities(0, 2)
+    assert server.api_calls == 2
@@ -0,0 +1,150 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+from garminconnect import GarminConnectAuthenticationError
+
+from garmin_retry import CircuitBreaker, RetryingClient, get_retry_after, is_retryable
+
+
+class FakeClock:
+    """Monotonic clock advanced by the sleeps it is given."""
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_error(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+class FakeClient:
+    """Garmin client whose get_activity raises the scripted errors, then succeeds."""
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+        self.display_name = "me"
+
+    def get_activity(self, activity_id):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"activityId": activity_id}
+
+    def get_user_summary(self, day):
+        raise http_error(503)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def retrying(client, clock, **kwargs):
+    breaker = CircuitBreaker(clock=clock, sleep=clock.sleep, **kwargs.pop("breaker", {}))
+    return RetryingClient(client, circuit_breaker=breaker, sleep=clock.sleep, **kwargs)
+
+
+def test_transient_errors_are_retried_with_backoff(clock):
+    client = FakeClient([http_error(500), requests.exceptions.ConnectionError(), http_error(429)])
+    garmin = retrying(client, clock, base_delay=1.0, max_delay=120.0)
+    assert garmin.get_activity(7) == {"activityId": 7}
+    assert client.calls == 4
+    assert garmin.stats == {"calls": 4, "retries": 3}
+    # Full jitter under the exponential cap of each attempt
+    assert len(clock.sleeps) == 3
+    assert all(0 <= delay <= 2 ** attempt for attempt, delay in enumerate(clock.sleeps))
+
+
+def test_backoff_is_capped(clock):
+    garmin = retrying(FakeClient(), clock, base_delay=10.0, max_delay=15.0)
+    assert all(0 <= garmin.backoff_delay(attempt, http_error(503)) <= 15.0 for attempt in range(10))
+
+
+def test_retry_after_seconds_replaces_backoff(clock):
+    client = FakeClient([http_error(429, retry_after="7")])
+    garmin = retrying(client, clock)
+    garmin.get_activity(1)
+    assert clock.sleeps == [7.0]
+
+
+def test_retry_after_date_is_capped(clock):
+    soon = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(hours=1), usegmt=True)
+    assert 25 <= get_retry_after(http_error(429, retry_after=soon)) <= 30
+    client = FakeClient([http_error(503, retry_after=later)])
+    garmin = retrying(client, clock, max_delay=120.0)
+    garmin.get_activity(1)
+    assert clock.sleeps == [120.0]
+
+
+def test_permanent_errors_are_not_retried(clock):
+    for error in [http_error(404), http_error(401), GarminConnectAuthenticationError("bad password")]:
+        assert not is_retryable(error)
+        client = FakeClient([error])
+        garmin = retrying(client, clock)
+        with pytest.raises(type(error)):
+            garmin.get_activity(1)
+        assert client.calls == 1
+    assert clock.sleeps == []
+
+
+def test_gives_up_after_max_retries(clock):
+    client = FakeClient([http_error(502)] * 10)
+    garmin = retrying(client, clock, max_retries=3)
+    with pytest.raises(requests.HTTPError):
+        garmin.get_activity(1)
+    assert client.calls == 4
+    assert garmin.stats["failures"] == 1 and garmin.stats["retries"] == 3
+
+
+def test_other_methods_pass_through(clock):
+    garmin = retrying(FakeClient(), clock)
+    assert garmin.display_name == "me"
+    with pytest.raises(requests.HTTPError):
+        garmin.get_user_summary("2024-06-01")
+    assert garmin.stats == {}
+
+
+def test_circuit_opens_half_opens_and_closes(clock):
+    breaker = CircuitBreaker(window=4, failure_threshold=0.5, min_calls=4, cooldown=60.0, clock=clock, sleep=clock.sleep)
+    for success in [True, False, True]:
+        assert not breaker.record(success)
+    assert breaker.state == "closed"
+    assert breaker.record(False)
+    assert breaker.state == "open"
+    # Callers wait out the cooldown
+    breaker.wait()
+    assert clock.sleeps == [60.0]
+    assert breaker.state == "half_open"
+    # A failed trial call opens the circuit again at once
+    assert breaker.record(False)
+    assert breaker.state == "open"
+    breaker.wait()
+    # A successful trial call closes it, and failures are counted from scratch
+    assert not breaker.record(True)
+    assert breaker.state == "closed"
+    for _ in range(3):
+        assert not breaker.record(False)
+    assert breaker.record(False)
+
+
+def test_circuit_pauses_retrying_client(clock):
+    client = FakeClient([http_error(503)] * 4)
+    garmin = retrying(client, clock, base_delay=0.0, breaker={"window": 4, "min_calls": 4, "cooldown": 30.0})
+    assert garmin.get_activity(1) == {"activityId": 1}
+    assert garmin.stats["circuit_opens"] == 1
+    assert 30.0 in clock.sleeps
+    assert garmin.circuit_breaker.state == "closed"
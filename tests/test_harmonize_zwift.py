@@ -0,0 +1,74 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bench_harmonize_zwift import harmonize_zwift_activities_loop, synthetic_activities
+from preprocess_activities import harmonize_zwift_activities
+
+
+def activities(rows):
+    """Activities from (day, name, averageHR, maxHR) tuples."""
+    df = pd.DataFrame(rows, columns=["Day", "activityName", "averageHR", "maxHR"])
+    df["Day"] = [datetime.date.fromisoformat(day) for day in df["Day"]]
+    df["startTimeLocal"] = pd.to_datetime(df["Day"].astype(str)) + pd.to_timedelta(np.arange(len(df)), unit="h")
+    df[["averageHR", "maxHR"]] = df[["averageHR", "maxHR"]].astype(float)
+    return df
+
+
+CASES = {
+    "several days": activities([
+        ("2024-03-04", "Zwift - Watopia", 110, 150),
+        ("2024-03-04", "Cardio Zwift", 142, 171),
+        ("2024-03-05", "Morning Run", 150, 180),
+        ("2024-03-06", "Cardio Zwift", 135, 165),
+        ("2024-03-06", "Zwift - London", 100, 140),
+        ("2024-03-06", "Zwift - Makuri Islands", 105, 145),
+    ]),
+    "zwift without cardio": activities([
+        ("2024-03-04", "Zwift - Watopia", 110, 150),
+        ("2024-03-04", "Morning Run", 150, 180),
+        ("2024-03-05", "Cardio Zwift", 140, 170),
+    ]),
+    "cardio without zwift": activities([
+        ("2024-03-04", "Cardio Zwift", 140, 170),
+        ("2024-03-04", "Lap Swimming", 120, 150),
+    ]),
+    "duplicate cardio": activities([
+        ("2024-03-04", "Cardio Zwift", 130, 175),
+        ("2024-03-04", "Zwift - Watopia", 110, 150),
+        ("2024-03-04", "Cardio Zwift", 145, 168),
+        ("2024-03-04", None, 90, 120),
+    ]),
+    "synthetic year": synthetic_activities(1),
+}
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_matches_reference_loop(name):
+    df = CASES[name]
+    expected = harmonize_zwift_activities_loop(df.copy())
+    result = harmonize_zwift_activities(df.copy())
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_zwift_takes_the_day_cardio_maxima():
+    result = harmonize_zwift_activities(CASES["duplicate cardio"].copy())
+    assert result["activityName"].iloc[0] == "Zwift - Watopia"
+    assert pd.isna(result["activityName"].iloc[1])
+    assert result.iloc[0][["averageHR", "maxHR"]].tolist() == [145.0, 175.0]
+    assert result.iloc[1][["averageHR", "maxHR"]].tolist() == [90.0, 120.0]
+
+
+def test_zwift_without_cardio_loses_heart_rate():
+    result = harmonize_zwift_activities(CASES["zwift without cardio"].copy())
+    assert list(result["activityName"]) == ["Zwift - Watopia", "Morning Run"]
+    assert result.iloc[0][["averageHR", "maxHR"]].isna().all()
+    assert result.iloc[1][["averageHR", "maxHR"]].tolist() == [150.0, 180.0]
+
+
+def test_cardio_without_zwift_is_dropped():
+    result = harmonize_zwift_activities(CASES["cardio without zwift"].copy())
+    assert list(result["activityName"]) == ["Lap Swimming"]
+    assert result.iloc[0][["averageHR", "maxHR"]].tolist() == [120.0, 150.0]
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+
+from heatmap import update_heatmap
+
+ZOOMS = range(3, 12)
+
+
+def write_track(raw_dir, activity_id, seed, nb_points=300):
+    """Random walk GPX track around Montreal, laid out like the downloads."""
+    rng = np.random.default_rng(seed)
+    latitudes = 45.5 + rng.uniform(-0.05, 0.05) + np.cumsum(rng.normal(0, 1e-4, nb_points))
+    longitudes = -73.6 + rng.uniform(-0.05, 0.05) + np.cumsum(rng.normal(0, 1e-4, nb_points))
+    path = os.path.join(raw_dir, "2024-06", str(activity_id), f"{activity_id}.gpx")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>\n')
+        for latitude, longitude in zip(latitudes, longitudes):
+            f.write(f'<trkpt lat="{latitude:.7f}" lon="{longitude:.7f}"></trkpt>\n')
+        f.write('</trkseg></trk></gpx>\n')
+
+
+def render(raw_dir, out_dir):
+    dirs = {"counts_dir": str(out_dir / "counts"), "tiles_dir": str(out_dir / "tiles")}
+    return update_heatmap(raw_dir, workers=1, zooms=ZOOMS, **dirs), dirs
+
+
+def tree_files(root, suffix):
+    return {
+        os.path.relpath(os.path.join(folder, name), root)
+        for folder, _, files in os.walk(root) for name in files if name.endswith(suffix)
+    }
+
+
+def assert_same_pyramid(dirs, expected_dirs):
+    files = tree_files(dirs["counts_dir"], ".npz")
+    assert files and files == tree_files(expected_dirs["counts_dir"], ".npz")
+    for name in files:
+        with np.load(os.path.join(dirs["counts_dir"], name)) as a, np.load(os.path.join(expected_dirs["counts_dir"], name)) as b:
+            np.testing.assert_array_equal(a["counts"], b["counts"], err_msg=name)
+    assert tree_files(dirs["tiles_dir"], ".png") == tree_files(expected_dirs["tiles_dir"], ".png")
+
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    raw_dir = str(tmp_path / "raw")
+    for activity_id in range(1, 4):
+        write_track(raw_dir, activity_id, seed=activity_id)
+    return raw_dir
+
+
+def test_added_track_matches_clean_rebuild(raw_dir, tmp_path):
+    render(raw_dir, tmp_path / "incremental")
+    write_track(raw_dir, 4, seed=4)
+    added, dirs = render(raw_dir, tmp_path / "incremental")
+    rebuilt, rebuild_dirs = render(raw_dir, tmp_path / "rebuild")
+    assert_same_pyramid(dirs, rebuild_dirs)
+    # Only the tiles the new track crosses were written again
+    assert 0 < sum(added.values()) < sum(rebuilt.values())
+    unchanged, _ = render(raw_dir, tmp_path / "incremental")
+    assert unchanged == {}
+
+
+def test_changed_track_matches_clean_rebuild(raw_dir, tmp_path):
+    _, dirs = render(raw_dir, tmp_path / "incremental")
+    # Rewritten with another path: its former pixels must not keep their counts
+    write_track(raw_dir, 2, seed=20)
+    _, dirs = render(raw_dir, tmp_path / "incremental")
+    _, rebuild_dirs = render(raw_dir, tmp_path / "rebuild")
+    assert_same_pyramid(dirs, rebuild_dirs)
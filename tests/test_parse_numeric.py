@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocess_activities import parse_numeric
+
+
+def baseline_parse(series):
+    """How load_and_clean_data parsed numeric columns before the declared schema."""
+    return pd.to_numeric(series.astype(str).str.replace(',', '.').str.replace('--', '0'), errors='coerce')
+
+
+CASES = {
+    "floats": pd.Series([1.5, np.nan, 3.0]),
+    "integers": pd.Series([1, 2, 3]),
+    "numeric strings": pd.Series(["1.5", "2", None]),
+    "decimal commas and placeholders": pd.Series(["1,5", "--", " 7 ", "n/a"], dtype=object),
+    "mixed objects": pd.Series([4, "5,25", 6.5, "--", None], dtype=object),
+    "bools": pd.Series([True, False, True]),
+    "nullable bools": pd.Series([True, None, False], dtype="boolean"),
+    "bools among numbers": pd.Series([True, "3", 2.5, np.False_], dtype=object),
+}
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_matches_baseline_parsing(name):
+    series = CASES[name]
+    expected = baseline_parse(series).astype("float64")
+    pd.testing.assert_series_equal(parse_numeric(series), expected)
+
+
+def test_bools_are_not_numbers():
+    assert parse_numeric(pd.Series([True, False])).isna().all()
+    assert parse_numeric(pd.Series([True, "3"], dtype=object)).tolist()[1] == 3.0
+    assert np.isnan(parse_numeric(pd.Series([True, "3"], dtype=object)).tolist()[0])
+
+
+def test_placeholder_stands_for_zero():
+    assert parse_numeric(pd.Series(["--", "12,5"])).tolist() == [0.0, 12.5]
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from actions.parse_tcx_csv import parse_tcx_to_dataframe
+from benchmarks.bench_parse_tcx import former_parse_tcx_to_dataframe, write_tcx
+
+TCX = """<?xml version="1.0" encoding="UTF-8"?>
+<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"
+    xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2">
+  <Activities><Activity Sport="Running"><Id>2024-06-01T08:00:00.000Z</Id>
+    <Lap StartTime="2024-06-01T08:00:00.000Z"><TotalTimeSeconds>2</TotalTimeSeconds><Track>
+      <Trackpoint>
+        <Time>2024-06-01T08:00:00.000Z</Time>
+        <Position><LatitudeDegrees>45.5</LatitudeDegrees><LongitudeDegrees>-73.6</LongitudeDegrees></Position>
+        <AltitudeMeters>30.2</AltitudeMeters><DistanceMeters>0.0</DistanceMeters>
+        <HeartRateBpm><Value>120</Value></HeartRateBpm>
+        <Extensions><ns3:TPX><ns3:Speed>4.0</ns3:Speed><ns3:RunCadence>85</ns3:RunCadence><ns3:Watts>250</ns3:Watts></ns3:TPX></Extensions>
+      </Trackpoint>
+      <Trackpoint>
+        <Time>2024-06-01T08:00:01.000Z</Time>
+        <AltitudeMeters>30.4</AltitudeMeters><DistanceMeters>3.0</DistanceMeters>
+        <HeartRateBpm><Value>122</Value></HeartRateBpm>
+        <Extensions><ns3:TPX><ns3:Speed>3.0</ns3:Speed><ns3:RunCadence>86</ns3:RunCadence><ns3:Watts>260</ns3:Watts></ns3:TPX></Extensions>
+      </Trackpoint>
+    </Track></Lap>
+    <Lap StartTime="2024-06-01T08:00:02.000Z"><TotalTimeSeconds>1</TotalTimeSeconds><Track>
+      <Trackpoint>
+        <Time>2024-06-01T08:00:02.000Z</Time>
+        <Position><LatitudeDegrees>45.50003</LatitudeDegrees><LongitudeDegrees>-73.60004</LongitudeDegrees></Position>
+        <AltitudeMeters>30.5</AltitudeMeters><DistanceMeters>6.0</DistanceMeters>
+        <HeartRateBpm><Value>125</Value></HeartRateBpm>
+        <Extensions><ns3:TPX><ns3:Speed>0.0</ns3:Speed><ns3:RunCadence>0</ns3:RunCadence><ns3:Watts>0</ns3:Watts></ns3:TPX></Extensions>
+      </Trackpoint>
+    </Track></Lap>
+  </Activity></Activities>
+</TrainingCenterDatabase>
+"""
+
+COLUMNS = [
+    "Time", "Latitude", "Longitude", "Altitude", "Distance", "HeartRate", "Speed", "Cadence", "Watts",
+    "Pace", "Pace_seconds", "Pace_formatted",
+]
+
+
+@pytest.fixture
+def tcx_path(tmp_path):
+    path = tmp_path / "activity.tcx"
+    path.write_text(TCX)
+    return str(path)
+
+
+def test_columns_and_dtypes(tcx_path):
+    df = parse_tcx_to_dataframe(tcx_path)
+    assert list(df.columns) == COLUMNS
+    assert len(df) == 3
+    assert isinstance(df["Time"].dtype, pd.DatetimeTZDtype) and str(df["Time"].dt.tz) == "UTC"
+    for name in ["Latitude", "Longitude", "Altitude", "Distance", "Speed", "Pace_seconds"]:
+        assert df[name].dtype == "float64", name
+    # Whole numbers present on every trackpoint stay integers
+    for name in ["HeartRate", "Cadence", "Watts"]:
+        assert df[name].dtype == "int64", name
+    assert pd.api.types.is_timedelta64_dtype(df["Pace"])
+
+
+def test_values_and_paces(tcx_path):
+    df = parse_tcx_to_dataframe(tcx_path)
+    assert df["Time"].tolist() == list(pd.date_range("2024-06-01 08:00:00", periods=3, freq="s", tz="UTC"))
+    # The second trackpoint has no position
+    assert df["Latitude"].isna().tolist() == [False, True, False]
+    assert df["HeartRate"].tolist() == [120, 122, 125]
+    # 1000 m at 4 m/s and 3 m/s; a speed of 0 has no pace
+    assert df["Speed"].isna().tolist() == [False, False, True]
+    np.testing.assert_allclose(df["Pace_seconds"][:2], [250.0, 1000 / 3])
+    assert df["Pace"][0] == pd.Timedelta(seconds=250)
+    assert df["Pace_formatted"].tolist() == ["04:10", "05:33", "No Data"]
+
+
+def test_missing_heart_rate_is_float(tmp_path):
+    path = tmp_path / "no_hr.tcx"
+    path.write_text(TCX.replace("<HeartRateBpm><Value>122</Value></HeartRateBpm>", ""))
+    df = parse_tcx_to_dataframe(str(path))
+    assert df["HeartRate"].dtype == "float64"
+    assert df["HeartRate"].isna().tolist() == [False, True, False]
+
+
+@pytest.mark.parametrize("nb_points", [10, 2500])
+def test_matches_former_parser(tmp_path, nb_points):
+    path = str(tmp_path / f"synthetic_{nb_points}.tcx")
+    write_tcx(path, nb_points)
+    pd.testing.assert_frame_equal(parse_tcx_to_dataframe(path), former_parse_tcx_to_dataframe(path))
+
+
+def test_fixture_matches_former_parser(tcx_path):
+    pd.testing.assert_frame_equal(parse_tcx_to_dataframe(tcx_path), former_parse_tcx_to_dataframe(tcx_path))
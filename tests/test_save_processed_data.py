@@ -0,0 +1,132 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import preprocess_activities
+from db_schema import get_data_version
+from preprocess_activities import save_processed_data
+from rollups import ROLLUP_MEASURES, ROLLUP_TABLES
+
+
+def activities(rows):
+    """Preprocessed activities, as save_processed_data receives them, from (id, type, group, start, distance) tuples."""
+    df = pd.DataFrame(rows, columns=["activityId", "activityType", "activityTypeGrouped", "startTimeLocal", "distance"])
+    df["startTimeLocal"] = pd.to_datetime(df["startTimeLocal"])
+    df["Day"] = df["startTimeLocal"].dt.date
+    df["Week"] = (df["startTimeLocal"].dt.normalize() - pd.to_timedelta(df["startTimeLocal"].dt.dayofweek, unit="D")).dt.date
+    df["Month"] = df["startTimeLocal"].to_numpy().astype("datetime64[M]")
+    df["activityName"] = df["activityTypeGrouped"].str.title()
+    df["duration"] = df["distance"] * 300.0
+    df["averageHR"] = 140.0
+    df["calories"] = df["distance"] * 60.0
+    df["trainingRace"] = [[] for _ in range(len(df))]
+    return df
+
+
+FIRST_BATCH = [
+    (1, "running", "running", "2024-03-04 07:00:00", 10.0),
+    (2, "cycling", "cycling", "2024-03-06 18:00:00", 40.0),
+    (3, "running", "running", "2024-03-11 07:00:00", 12.0),
+    (4, "lap_swimming", "swimming", "2024-03-30 12:00:00", 2.0),
+]
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    # The processed CSVs are written next to the database, not in the repo
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(preprocess_activities, "script_dir", str(tmp_path))
+    conn = sqlite3.connect(str(tmp_path / "activities.db"))
+    yield conn
+    conn.close()
+
+
+def ingest(conn, rows, last_week_date="2024-04-01"):
+    save_processed_data(conn, activities(rows), last_week_date)
+
+
+def assert_rollups_match_activities(conn):
+    """Rollup tables equal an aggregation of activities from scratch."""
+    for table, period in ROLLUP_TABLES.items():
+        aggregates = ", ".join(f"{aggregate} AS {name}" for name, (_, aggregate) in ROLLUP_MEASURES.items())
+        expected = pd.read_sql(f"""
+            SELECT {period}, activityTypeGrouped, {aggregates} FROM activities
+            GROUP BY {period}, activityTypeGrouped ORDER BY {period}, activityTypeGrouped
+        """, conn)
+        result = pd.read_sql(f"SELECT * FROM {table} ORDER BY {period}, activityTypeGrouped", conn)
+        pd.testing.assert_frame_equal(result, expected)
+
+
+def test_rollups_follow_ingest_corrections(conn):
+    ingest(conn, FIRST_BATCH)
+    assert_rollups_match_activities(conn)
+    assert len(pd.read_sql("SELECT * FROM activity_rollup_week", conn)) == 4
+    # Corrections: a longer distance, a ride moved to the next week and month, a new activity
+    ingest(conn, [
+        (1, "running", "running", "2024-03-04 07:00:00", 11.5),
+        (2, "cycling", "cycling", "2024-04-02 18:00:00", 40.0),
+        (5, "hiking", "hiking", "2024-03-05 09:00:00", 8.0),
+    ])
+    assert_rollups_match_activities(conn)
+    weeks = conn.execute("SELECT week_start FROM activity_rollup_week WHERE activityTypeGrouped = 'cycling'").fetchall()
+    assert weeks == [("2024-04-01",)]
+
+
+def test_failed_ingest_leaves_database_unchanged(conn, monkeypatch):
+    ingest(conn, FIRST_BATCH)
+    version = get_data_version(conn)
+    before = pd.read_sql("SELECT * FROM activities ORDER BY activityId", conn)
+
+    def broken_refresh(*args, **kwargs):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(preprocess_activities, "refresh_rollups", broken_refresh)
+    with pytest.raises(sqlite3.OperationalError):
+        ingest(conn, [(1, "running", "running", "2024-03-04 07:00:00", 42.0)])
+    pd.testing.assert_frame_equal(pd.read_sql("SELECT * FROM activities ORDER BY activityId", conn), before)
+    assert get_data_version(conn) == version
+    assert not conn.in_transaction
+    assert_rollups_match_activities(conn)
+
+
+def stored(conn):
+    return conn.execute(
+        "SELECT activityId, activityType, activityTypeGrouped, distance FROM activities ORDER BY activityId, activityType"
+    ).fetchall()
+
+
+def test_same_activity_ingested_twice_is_updated_in_place(conn):
+    ingest(conn, FIRST_BATCH)
+    ingest(conn, FIRST_BATCH[:1])
+    ingest(conn, [(1, "running", "running", "2024-03-04 07:00:00", 10.5)])
+    assert stored(conn) == [
+        (1, "running", "running", 10.5),
+        (2, "cycling", "cycling", 40.0),
+        (3, "running", "running", 12.0),
+        (4, "lap_swimming", "swimming", 2.0),
+    ]
+    assert_rollups_match_activities(conn)
+
+
+def test_activity_whose_type_changed_replaces_its_stale_row(conn):
+    ingest(conn, FIRST_BATCH)
+    # Recorded as a run, corrected to a hike on Garmin Connect
+    ingest(conn, [(3, "hiking", "hiking", "2024-03-11 07:00:00", 12.0)])
+    assert [row for row in stored(conn) if row[0] == 3] == [(3, "hiking", "hiking", 12.0)]
+    assert conn.execute("SELECT count(*) FROM activity_rollup_week WHERE week_start = '2024-03-11'").fetchone() == (1,)
+    assert_rollups_match_activities(conn)
+
+
+def test_split_activity_keeps_both_rows(conn):
+    # split_biking_musculation_activities_2023 stores one activity as two rows of different types
+    ingest(conn, [
+        (6, "cycling", "cycling", "2023-05-02 18:00:00", 30.0),
+        (6, "strength_training", "musculation", "2023-05-02 18:00:00", 0.0),
+    ])
+    ingest(conn, [
+        (6, "cycling", "cycling", "2023-05-02 18:00:00", 31.0),
+        (6, "strength_training", "musculation", "2023-05-02 18:00:00", 0.0),
+    ])
+    assert stored(conn) == [(6, "cycling", "cycling", 31.0), (6, "strength_training", "musculation", 0.0)]
+    assert_rollups_match_activities(conn)
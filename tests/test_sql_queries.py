@@ -0,0 +1,159 @@
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sql_queries as sql
+from benchmarks.bench_route_segments import synthetic_rides
+from db_schema import migrate
+from rollups import refresh_rollups
+from routes import METERS_PER_DEGREE, SEGMENT_LENGTH_M, save_route
+
+SPORTS = ["running", "cycling", "swimming", "hiking"]
+TIMERANGES = ["8_weeks", "6_months", "ytd", "all"]
+RACE_START, RACE_END = "2023-01-06", "2024-06-21"
+
+# The activities table under the names the queries give it
+ACTIVITY_TABLES = {"activities", "a", "act", "activity_rollup_week", "activity_rollup_month", "r"}
+
+# Queries rewritten to join and filter on week_start / month_start or plain startTimeLocal ranges
+REWRITTEN_QUERIES = {
+    **{f"weekly_sport({sport}, {timerange})": sql.get_weekly_sport_query(sport, timerange)
+       for sport in ["running", "duration"] for timerange in TIMERANGES},
+    **{f"recent_activities({timerange})": sql.get_recent_activities_query("running", timerange)
+       for timerange in TIMERANGES},
+    **{f"biking_distance({timerange})": sql.get_biking_distance_by_timerange_query(timerange)
+       for timerange in TIMERANGES},
+    **{f"race_distance({granularity})": sql.get_race_distance_by_timerange_query(RACE_START, RACE_END, granularity, "cycling")
+       for granularity in ["week", "month"]},
+    **{f"activity_duration({granularity})": sql.get_activity_duration_by_granularity_query(RACE_START, RACE_END, granularity)
+       for granularity in ["week", "month"]},
+    "race_metrics": sql.get_race_metrics_query(RACE_START, RACE_END),
+    "volume_metrics": sql.get_volume_metrics_query("running"),
+    "top_metrics(week)": sql.get_top_metrics_query(sql.get_filter_condition("week", "2024-03-06")),
+    "top_metrics(month)": sql.get_top_metrics_query(sql.get_filter_condition("month", "2024-03-06")),
+    "metrics_for_period(week_start)": sql.get_metrics_for_period_query("running", "week_start", "2024-03-04"),
+    "metrics_for_period(month_start)": sql.get_metrics_for_period_query("running", "month_start", "2024-03-01"),
+}
+
+
+def build_database(df):
+    """In-memory activities database with the migrated schema, `df` as its activities and their rollups."""
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    df.to_sql("activities", conn, if_exists="append", index=False)
+    refresh_rollups(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+def synthetic_activities(start_times, sports, seed=0):
+    rng = np.random.default_rng(seed)
+    start_times = pd.DatetimeIndex(start_times)
+    week_start = start_times.normalize() - pd.to_timedelta(start_times.dayofweek, unit="D")
+    return pd.DataFrame({
+        "activityId": np.arange(len(start_times)),
+        "activityType": "synthetic",
+        "activityTypeGrouped": sports,
+        "startTimeLocal": start_times.strftime("%Y-%m-%d %H:%M:%S"),
+        "Day": start_times.strftime("%Y-%m-%d"),
+        "Week": week_start.strftime("%Y-%m-%d"),
+        "Month": start_times.strftime("%Y-%m-01 00:00:00"),
+        "week_start": week_start.strftime("%Y-%m-%d"),
+        "month_start": start_times.strftime("%Y-%m-01"),
+        "duration": rng.uniform(600, 14400, len(start_times)),
+        "distance": rng.uniform(1, 120, len(start_times)),
+        "elevationGain": rng.uniform(0, 1500, len(start_times)),
+    })
+
+
+@pytest.fixture(scope="module")
+def conn():
+    rng = np.random.default_rng(0)
+    nb_activities = 2000
+    start_times = pd.to_datetime(np.sort(rng.integers(
+        pd.Timestamp("2020-01-01").value, pd.Timestamp.now().value, nb_activities
+    ))).floor("s")
+    conn = build_database(synthetic_activities(start_times, rng.choice(SPORTS, nb_activities)))
+    yield conn
+    conn.close()
+
+
+def query_plan(conn, query):
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query.sql}", query.params)]
+
+
+@pytest.mark.parametrize("name", list(REWRITTEN_QUERIES))
+def test_rewritten_query_uses_index(conn, name):
+    plan = query_plan(conn, REWRITTEN_QUERIES[name])
+    assert any(re.search(r"USING (COVERING )?INDEX", step) for step in plan), plan
+    scans = [step for step in plan if step.startswith("SCAN") and step.split()[1] in ACTIVITY_TABLES]
+    assert not scans, scans
+
+
+@pytest.mark.parametrize("name", list(REWRITTEN_QUERIES))
+def test_rewritten_query_runs(conn, name):
+    sql.read_query(conn, REWRITTEN_QUERIES[name], cache=None)
+
+
+@pytest.fixture(scope="module")
+def route_index():
+    """Indexed synthetic rides around Montreal, with their trackpoints."""
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    tracks = {}
+    for activity_id, latitudes, longitudes in synthetic_rides(40):
+        conn.execute(
+            "INSERT INTO activities (activityId, activityType, startTimeLocal) VALUES (?, 'synthetic', ?)",
+            (activity_id, f"2024-01-01 {activity_id % 24:02d}:00:00")
+        )
+        save_route(conn, activity_id, latitudes, longitudes)
+        tracks[activity_id] = (latitudes, longitudes)
+    conn.commit()
+    yield conn, tracks
+    conn.close()
+
+
+def area_searches(tracks, nb_searches=60, seed=2):
+    """(kind, centre latitude, centre longitude, half side or radius in metres), centred on trackpoints or anywhere."""
+    rng = np.random.default_rng(seed)
+    ids = sorted(tracks)
+    for i in range(nb_searches):
+        if i % 3:
+            latitudes, longitudes = tracks[ids[rng.integers(len(ids))]]
+            point = rng.integers(len(latitudes))
+            latitude, longitude = latitudes[point], longitudes[point]
+        else:
+            latitude, longitude = 45.5 + rng.uniform(-0.2, 0.2), -73.6 + rng.uniform(-0.3, 0.3)
+        yield "bbox" if i % 2 else "radius", latitude, longitude, [100, 250, 1000][i % 3]
+
+
+def test_through_area_queries_match_trackpoint_scan(route_index):
+    conn, tracks = route_index
+    for kind, latitude, longitude, half_size_m in area_searches(tracks):
+        lat_delta = half_size_m / METERS_PER_DEGREE
+        lon_scale = np.cos(np.radians(latitude))
+
+        def distance_m(latitudes, longitudes):
+            """Distance to the searched box or circle, 0 inside it."""
+            dy = np.abs(latitudes - latitude) * METERS_PER_DEGREE
+            dx = np.abs(longitudes - longitude) * METERS_PER_DEGREE * lon_scale
+            if kind == "bbox":
+                return np.hypot(np.maximum(dy - half_size_m, 0), np.maximum(dx - half_size_m, 0))
+            return np.maximum(np.hypot(dy, dx) - half_size_m, 0)
+
+        if kind == "bbox":
+            query = sql.get_activities_through_bbox_query(
+                latitude - lat_delta, longitude - lat_delta / lon_scale, latitude + lat_delta, longitude + lat_delta / lon_scale
+            )
+        else:
+            query = sql.get_activities_through_radius_query(latitude, longitude, half_size_m / 1000)
+        result = set(sql.read_query(conn, query, cache=None)["activityId"])
+        closest = {activity_id: distance_m(*track).min() for activity_id, track in tracks.items()}
+        expected = {activity_id for activity_id, distance in closest.items() if distance <= 1e-6}
+        assert expected <= result, f"{kind} at ({latitude:.5f}, {longitude:.5f}) misses {sorted(expected - result)}"
+        # Extra activities only come from a segment box touching the area: their track passes within a segment of it
+        assert all(closest[activity_id] <= 2 * SEGMENT_LENGTH_M for activity_id in result - expected)
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import sql_queries as sql
+from test_sql_queries import SPORTS, build_database, synthetic_activities
+
+
+def next_monday(day):
+    """The Monday on or after `day`, as SQLite's date(day, "weekday 1")."""
+    return day + pd.Timedelta(days=(7 - day.dayofweek) % 7)
+
+
+@pytest.fixture(scope="module")
+def activities():
+    rng = np.random.default_rng(3)
+    nb_activities = 1500
+    start_times = pd.to_datetime(np.sort(rng.integers(
+        (pd.Timestamp.now() - pd.Timedelta(days=3 * 365)).value, pd.Timestamp.now().value, nb_activities
+    ))).floor("s")
+    return synthetic_activities(start_times, rng.choice(SPORTS, nb_activities))
+
+
+@pytest.fixture(scope="module")
+def conn(activities):
+    conn = build_database(activities)
+    yield conn
+    conn.close()
+
+
+def recent_weeks(activities, sport, timerange):
+    """[first, last) Monday of the weeks the recent list covers."""
+    today = pd.Timestamp.now(tz="UTC").tz_localize(None).normalize()
+    if timerange == "8_weeks":
+        return next_monday(today - pd.Timedelta(days=84)), next_monday(today)
+    if timerange == "ytd":
+        return next_monday(today.replace(month=1, day=1)), next_monday(today)
+    weeks = pd.to_datetime(activities.loc[activities["activityTypeGrouped"] == sport, "Week"])
+    return weeks.min(), weeks.max()
+
+
+@pytest.mark.parametrize("sport", ["running", "cycling", "swimming"])
+@pytest.mark.parametrize("timerange", ["8_weeks", "ytd", "all"])
+def test_recent_activities_match_week_filter(conn, activities, sport, timerange):
+    first, last = recent_weeks(activities, sport, timerange)
+    week_start = pd.to_datetime(activities["week_start"])
+    expected = activities.loc[
+        (activities["activityTypeGrouped"] == sport) & (week_start >= first) & (week_start < last), "activityId"
+    ]
+    result = sql.read_query(conn, sql.get_recent_activities_query(sport, timerange), cache=None)
+    assert len(expected) > 0
+    assert sorted(result["activityId"]) == sorted(expected)
+
+
+@pytest.mark.parametrize("sport", ["running", "cycling", "swimming"])
+def test_volume_metrics_include_elevation_gain(conn, sport):
+    # The Running and Cycling tabs show the elevation gain of each period
+    result = sql.read_query(conn, sql.get_volume_metrics_query(sport), cache=None)
+    assert "elevationGain" in result.columns
+    assert result["elevationGain"].notna().all()
+
+
+def test_recent_activities_all_time_spans_the_tab_sport():
+    # Cycling only before 2022, running only after: the All Time range must follow the tab's sport
+    start_times = pd.date_range("2020-01-06 07:00", periods=20, freq="7D").append(
+        pd.date_range("2023-01-02 07:00", periods=20, freq="7D")
+    )
+    conn = build_database(synthetic_activities(start_times, ["cycling"] * 20 + ["running"] * 20))
+    try:
+        for sport in ["cycling", "running"]:
+            result = sql.read_query(conn, sql.get_recent_activities_query(sport, "all"), cache=None)
+            assert (result["activityTypeGrouped"] == sport).all()
+            # Every week but the last one of the range is listed
+            assert len(result) == 19
+    finally:
+        conn.close()
@@ -0,0 +1,101 @@
+import os
+import json
+
+import numpy as np
+import pytest
+
+import actions.trackpoint_cache as trackpoint_cache
+from actions.parse_tcx_csv import parse_gpx_to_dataframe
+from actions.trackpoint_cache import META_FILE, cache_path, is_cache_valid, load_gpx_track
+
+
+def write_gpx(path, latitudes, longitudes):
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>\n')
+        for i, (latitude, longitude) in enumerate(zip(latitudes, longitudes)):
+            f.write(f'<trkpt lat="{latitude:.7f}" lon="{longitude:.7f}"><ele>100.0</ele>'
+                    f'<time>2024-06-01T08:00:{i:02d}.000Z</time></trkpt>\n')
+        f.write('</trkseg></trk></gpx>\n')
+
+
+def cache_mtime(path):
+    return os.stat(os.path.join(cache_path(path), "Latitude.npy")).st_mtime_ns
+
+
+def touch(path, seconds=10):
+    """Move the mtime of `path` forward without changing its content."""
+    stamp = os.stat(path).st_mtime_ns + seconds * 10**9
+    os.utime(path, ns=(stamp, stamp))
+
+
+@pytest.fixture
+def gpx_path(tmp_path):
+    path = str(tmp_path / "123.gpx")
+    write_gpx(path, 45.5 + np.arange(20) * 1e-4, -73.6 + np.arange(20) * 1e-4)
+    load_gpx_track(path)
+    return path
+
+
+def assert_matches_source(path):
+    latitudes, longitudes = load_gpx_track(path)
+    expected = parse_gpx_to_dataframe(path)
+    np.testing.assert_allclose(latitudes, expected["Latitude"], rtol=1e-6)
+    np.testing.assert_allclose(longitudes, expected["Longitude"], rtol=1e-6)
+
+
+def test_cache_is_built_and_reused(gpx_path):
+    assert is_cache_valid(gpx_path)
+    built = cache_mtime(gpx_path)
+    assert_matches_source(gpx_path)
+    assert cache_mtime(gpx_path) == built
+    assert isinstance(load_gpx_track(gpx_path)[0], np.memmap)
+
+
+def test_touched_source_keeps_its_cache(gpx_path):
+    built = cache_mtime(gpx_path)
+    touch(gpx_path)
+    assert is_cache_valid(gpx_path)
+    load_gpx_track(gpx_path)
+    assert cache_mtime(gpx_path) == built
+    # The new mtime is stamped, so the next check skips hashing
+    with open(os.path.join(cache_path(gpx_path), META_FILE)) as f:
+        assert json.load(f)["mtime_ns"] == os.stat(gpx_path).st_mtime_ns
+
+
+def test_rewritten_source_is_rebuilt(gpx_path):
+    write_gpx(gpx_path, 46.8 + np.arange(30) * 1e-4, -71.2 + np.arange(30) * 1e-4)
+    assert not is_cache_valid(gpx_path)
+    assert_matches_source(gpx_path)
+    assert is_cache_valid(gpx_path)
+
+
+def test_same_size_new_content_is_rebuilt(gpx_path):
+    size = os.path.getsize(gpx_path)
+    write_gpx(gpx_path, 45.6 + np.arange(20) * 1e-4, -73.6 + np.arange(20) * 1e-4)
+    assert os.path.getsize(gpx_path) == size
+    touch(gpx_path)
+    assert not is_cache_valid(gpx_path)
+    assert_matches_source(gpx_path)
+
+
+@pytest.mark.parametrize("meta", [None, "{not json", json.dumps({"version": -1})])
+def test_missing_or_corrupt_meta_is_rebuilt(gpx_path, meta):
+    meta_file = os.path.join(cache_path(gpx_path), META_FILE)
+    if meta is None:
+        os.remove(meta_file)
+    else:
+        with open(meta_file, "w") as f:
+            f.write(meta)
+    assert not is_cache_valid(gpx_path)
+    assert_matches_source(gpx_path)
+    assert is_cache_valid(gpx_path)
+
+
+def test_unwritable_cache_falls_back_to_parsing(gpx_path, monkeypatch):
+    def read_only(*args):
+        raise PermissionError("read-only file system")
+
+    os.remove(os.path.join(cache_path(gpx_path), META_FILE))
+    monkeypatch.setattr(trackpoint_cache, "_write_cache", read_only)
+    assert_matches_source(gpx_path)